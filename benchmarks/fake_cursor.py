@@ -0,0 +1,243 @@
+"""A stand-in for a pymssql cursor that serves the catalog of some tables and a recorded log.
+
+The log is a list of rows with the columns the parser selects from fn_dblog, either generated with
+`synthetic_log` or recorded from a real server with `record_log` and served with `FakeCursor.load`.
+"""
+
+import pickle
+import random
+import typing
+from pathlib import Path
+from typing import Optional
+
+from watcher.column_schema import ColumnSchema
+from watcher.lsn import LSN
+from watcher.parser import Parser
+from watcher.schema_cache import SchemaCache, TableKey
+
+from .rowgen import RowGenerator
+
+# Allocation unit of the first table, the next tables get the following ids
+FIRST_ALLOC_UNIT_ID = 72057594043105280
+
+
+class FakeCursor:
+    """Answers the catalog queries of the parser for `tables`, and the log queries with `log`."""
+
+    def __init__(
+        self,
+        tables: dict[TableKey, list[ColumnSchema]],
+        log: list[tuple],
+        alloc_units: Optional[dict[int, TableKey]] = None,
+    ) -> None:
+        """Creates a cursor for the log of `tables`, whose allocation units are numbered from
+        FIRST_ALLOC_UNIT_ID unless they are given."""
+
+        self.tables = tables
+        self.log = log
+        self.alloc_units = alloc_units or {
+            FIRST_ALLOC_UNIT_ID + idx: key for idx, key in enumerate(tables)
+        }
+        self.queries = 0
+        self._rows: list[tuple] = []
+        self._position = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "FakeCursor":
+        """A cursor that serves a log saved with `record_log`."""
+
+        with open(path, "rb") as f:
+            recording = pickle.load(f)
+
+        return cls(recording["tables"], recording["log"], recording["alloc_units"])
+
+    def execute(self, query: str, params: Optional[tuple] = None) -> None:
+        self.queries += 1
+        self._position = 0
+
+        if "FROM sys.tables t\nJOIN sys.schemas" in query:
+            self._rows = [
+                (schema, table, object_id, "2024-01-01T00:00:00")
+                for object_id, (schema, table) in enumerate(self.tables, start=1)
+            ]
+        elif "sys.allocation_units" in query:
+            self._rows = [
+                (alloc_unit_id, schema, table, 1)
+                for alloc_unit_id, (schema, table) in self.alloc_units.items()
+            ]
+        elif "INFORMATION_SCHEMA.COLUMNS" in query:
+            self._rows = [
+                (
+                    schema,
+                    table,
+                    col.COLUMN_NAME,
+                    # The schema cache builds decimal(p,s) from the precision and scale
+                    "decimal" if col.DATA_TYPE.startswith("decimal") else col.DATA_TYPE,
+                    col.CHARACTER_MAXIMUM_LENGTH,
+                    col.NUMERIC_PRECISION,
+                    col.DATETIME_PRECISION,
+                    col.NUMERIC_SCALE,
+                    col.CHARACTER_OCTET_LENGTH,
+                    col.ORDINAL_POSITION,
+                )
+                for (schema, table), columns in self.tables.items()
+                for col in sorted(columns, key=lambda col: col.ORDINAL_POSITION)
+            ]
+        elif "is_primary_key" in query:
+            self._rows = [
+                (schema, table, columns[0].COLUMN_NAME)
+                for (schema, table), columns in self.tables.items()
+            ]
+        elif "[Operation] = 'LOP_BEGIN_XACT'" in query:
+            # Bounds of a time window, the synthetic log is never filtered by time
+            self._rows = [(None, None, None)]
+        elif "fn_dblog" in query:
+            self._rows = self._log_after(params)
+        else:
+            self._rows = []
+
+    def _log_after(self, params: Optional[tuple]) -> list[tuple]:
+        """Rows of the log between the LSN bounds of the query.
+
+        The parameters are (scan start, start, start, end, end, ...), the LSNs are compared as the
+        fixed width strings they are.
+        """
+
+        start = params[1] if params and len(params) > 1 else None
+        end = params[3] if params and len(params) > 3 else None
+        return [
+            row
+            for row in self.log
+            if (start is None or row[3] > start) and (end is None or row[3] < end)
+        ]
+
+    def fetchmany(self, size: int) -> list[tuple]:
+        rows = self._rows[self._position : self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self) -> list[tuple]:
+        rows = self._rows[self._position :]
+        self._position = len(self._rows)
+        return rows
+
+    def close(self) -> None:
+        pass
+
+
+def synthetic_log(
+    tables: dict[TableKey, list[ColumnSchema]],
+    rows: int,
+    rows_per_transaction: int = 10,
+    seed: int = 0,
+) -> list[tuple]:
+    """A log of `rows` inserts and deletes spread over `tables`, in transactions of up to
+    `rows_per_transaction` changes that commit in LSN order."""
+
+    rand = random.Random(seed)
+    generators = {
+        key: RowGenerator(columns, seed=seed + idx)
+        for idx, (key, columns) in enumerate(tables.items())
+    }
+    alloc_units = {key: FIRST_ALLOC_UNIT_ID + idx for idx, key in enumerate(tables)}
+    keys = list(tables)
+
+    log: list[tuple] = []
+    position = 0
+
+    def add(operation: str, transaction_id: str, **fields: typing.Any) -> None:
+        nonlocal position
+        position += 1
+        lsn = LSN(0x2A << 48 | position << 16 | 1)
+        log.append(
+            (
+                operation,
+                fields.get("context", "LCX_NULL"),
+                transaction_id,
+                str(lsn),
+                None,
+                fields.get("alloc_unit"),
+                fields.get("raw"),
+                None,
+                None,
+                None,
+                fields.get("begin_time"),
+                fields.get("end_time"),
+                "sa",
+                fields.get("alloc_unit_id"),
+                1 if "alloc_unit_id" in fields else None,
+                fields.get("page_id"),
+                fields.get("slot_id"),
+                None,
+                None,
+            )
+        )
+
+    written = 0
+    transaction = 0
+    while written < rows:
+        transaction += 1
+        transaction_id = f"0000:{transaction:08x}"
+        minutes, seconds = divmod(transaction, 60)
+        timestamp = f"2024/11/22 {minutes // 60 % 24:02d}:{minutes % 60:02d}:{seconds:02d}:000"
+
+        add("LOP_BEGIN_XACT", transaction_id, begin_time=timestamp)
+        for _ in range(min(rand.randint(1, rows_per_transaction), rows - written)):
+            key = rand.choice(keys)
+            written += 1
+            add(
+                "LOP_INSERT_ROWS" if rand.random() < 0.8 else "LOP_DELETE_ROWS",
+                transaction_id,
+                context="LCX_HEAP",
+                alloc_unit=f"{key[0]}.{key[1]}",
+                alloc_unit_id=alloc_units[key],
+                raw=generators[key].image(written),
+                page_id=f"0001:{written // 100:08x}",
+                slot_id=written % 100,
+            )
+        add("LOP_COMMIT_XACT", transaction_id, end_time=timestamp)
+
+    return log
+
+
+def record_log(cursor: typing.Any, database: str, path: Path) -> int:
+    """Saves the log of a real database as the parser reads it and its catalog, returns the rows saved.
+
+    `cursor` is a pymssql cursor connected to the database.
+    """
+
+    class Recorder:
+        """Passes everything to the cursor, keeping a copy of the rows of the log queries."""
+
+        def __init__(self) -> None:
+            self.log: list[tuple] = []
+            self._recording = False
+
+        def __getattr__(self, name: str) -> typing.Any:
+            return getattr(cursor, name)
+
+        def execute(self, query: str, params: Optional[tuple] = None) -> None:
+            self._recording = "fn_dblog" in query and "[Operation] = 'LOP_BEGIN_XACT'" not in query
+            cursor.execute(query, params)
+
+        def fetchmany(self, size: int) -> list[tuple]:
+            rows = cursor.fetchmany(size)
+            if self._recording:
+                self.log.extend(rows)
+            return rows
+
+    recorder = Recorder()
+    schema_cache = SchemaCache(None)
+    parser = Parser(typing.cast(typing.Any, recorder), database, schema_cache=schema_cache)
+    for _ in parser.iter_changes():
+        pass
+
+    recording = {
+        "tables": schema_cache.tables,
+        "alloc_units": schema_cache.load_allocation_units(cursor)[0],
+        "log": recorder.log,
+    }
+    with open(path, "wb") as f:
+        pickle.dump(recording, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return len(recorder.log)
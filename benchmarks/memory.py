@@ -0,0 +1,123 @@
+"""Measures the memory held by decoded changes, reported per million changes.
+
+    python -m benchmarks.memory [changes]
+
+Builds the changes the way the parser does, from row images of a small table with the LSN packed
+in an int, and compares them with the dict per change representation used before.
+"""
+
+import struct
+import sys
+import tracemalloc
+import typing
+
+from watcher.change import Change, intern
+from watcher.column_schema import ColumnSchema
+from watcher.decoder import TableDecoder
+from watcher.lsn import LSN
+
+SCHEMA = [
+    ColumnSchema("id", "int", None, 10, None, 0, None, 1),
+    ColumnSchema("quantity", "int", None, 10, None, 0, None, 2),
+    ColumnSchema("name", "nvarchar", 50, None, None, None, 100, 3),
+]
+
+
+def row_image(idx: int) -> bytes:
+    """Row image of (idx, idx % 100, "name <idx % 1000>") with a null bitmap and a variable column."""
+
+    fixed = struct.pack("<ii", idx, idx % 100)
+    name = f"name {idx % 1000}".encode("utf-16-le")
+    fixed_end = 4 + len(fixed)
+    variable_start = fixed_end + 2 + 1 + 2 + 2
+
+    return (
+        bytes([0x30, 0])
+        + struct.pack("<H", fixed_end)
+        + fixed
+        + struct.pack("<HB", len(SCHEMA), 0)
+        + struct.pack("<HH", 1, variable_start + len(name))
+        + name
+    )
+
+
+def log_row(idx: int) -> tuple[str, str, str, str, str]:
+    """Fields of a log record, built as new strings like the rows of the database driver."""
+
+    return (
+        "".join(("LOP_INSERT", "_ROWS")),
+        f"0000:{idx // 10:08x}",
+        f"{idx // 10 % 60:02d}".join(("2024/11/22 10:", ":00:000")),
+        "".join(("s", "a")),
+        f"0000002a:{idx:08x}:0001",
+    )
+
+
+def build_dicts(count: int) -> list[dict[str, typing.Any]]:
+    decoder = TableDecoder(SCHEMA)
+
+    changes = []
+    for idx in range(count):
+        operation, transaction_id, begin_time, username, lsn = log_row(idx)
+        changes.append(
+            {
+                "data": decoder.decode(row_image(idx)),
+                "transaction_id": transaction_id,
+                "schema": "dbo",
+                "table": "Orders",
+                "begin_time": begin_time,
+                "username": username,
+                "end_time": begin_time,
+                "lsn": lsn,
+            }
+        )
+
+    return changes
+
+
+def build_changes(count: int) -> list[Change]:
+    decoder = TableDecoder(SCHEMA)
+
+    changes = []
+    for idx in range(count):
+        operation, transaction_id, begin_time, username, lsn = log_row(idx)
+        begin_time = intern(begin_time)
+        changes.append(
+            Change(
+                operation=intern(operation),
+                schema="dbo",
+                table="Orders",
+                transaction_id=intern(transaction_id),
+                begin_time=begin_time,
+                end_time=begin_time,
+                username=intern(username),
+                lsn=LSN.parse(lsn),
+                columns=decoder.names,
+                values=decoder.decode_values(row_image(idx)),
+            )
+        )
+
+    return changes
+
+
+def measure(build: typing.Callable[[int], list], count: int) -> float:
+    """Bytes held by `count` changes, scaled to a million."""
+
+    tracemalloc.start()
+    changes = build(count)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del changes
+    return held * 1_000_000 / count
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    for name, build in (("dict", build_dicts), ("Change", build_changes)):
+        print(f"{name:>8}: {measure(build, count) / 2**20:,.1f} MiB per million changes")
+
+
+if __name__ == "__main__":
+    main()
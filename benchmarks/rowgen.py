@@ -0,0 +1,248 @@
+"""Synthetic row images, in the format of [RowLog Contents 0], for any list of columns.
+
+Every type the decoder supports can be generated, so the benchmarks run without a SQL Server.
+"""
+
+import random
+import struct
+import typing
+from datetime import date
+
+from watcher.column_schema import ColumnSchema
+from watcher.decoder import VARIABLE_LENGTH_TYPES
+
+# Status bits A of a row with a null bitmap and variable length columns
+_STATUS = 0x30
+
+_DAYS_TO_1900 = date(1900, 1, 1).toordinal()
+
+# Tables used by the benchmarks, see `column`
+SCHEMAS: dict[str, list[ColumnSchema]] = {}
+
+
+def column(name: str, data_type: str, ordinal: int, **kwargs: typing.Any) -> ColumnSchema:
+    """A column as the schema cache loads it, decimal types are given as decimal(p,s)."""
+
+    return ColumnSchema(
+        COLUMN_NAME=name,
+        DATA_TYPE=data_type,
+        CHARACTER_MAXIMUM_LENGTH=kwargs.get("length"),
+        NUMERIC_PRECISION=kwargs.get("precision"),
+        DATETIME_PRECISION=kwargs.get("datetime_precision"),
+        NUMERIC_SCALE=kwargs.get("scale"),
+        CHARACTER_OCTET_LENGTH=kwargs.get("length"),
+        ORDINAL_POSITION=ordinal,
+    )
+
+
+SCHEMAS["narrow"] = [
+    column("id", "int", 1),
+    column("quantity", "int", 2),
+    column("name", "nvarchar", 3, length=50),
+]
+
+# Every supported type, fixed and variable columns interleaved like a real table
+SCHEMAS["wide"] = [
+    column("id", "bigint", 1),
+    column("code", "char", 2, length=8),
+    column("small", "smallint", 3),
+    column("description", "varchar", 4, length=200),
+    column("tiny", "tinyint", 5),
+    column("amount", "decimal(18,2)", 6, precision=18, scale=2),
+    column("big_amount", "decimal(38,6)", 7, precision=38, scale=6),
+    column("ratio", "real", 8),
+    column("score", "float", 9),
+    column("title", "nvarchar", 10, length=100),
+    column("price", "money", 11),
+    column("fee", "smallmoney", 12),
+    column("born", "date", 13),
+    column("starts", "time", 14, datetime_precision=7),
+    column("created", "datetime", 15),
+    column("updated", "smalldatetime", 16),
+    column("hash", "binary", 17, length=16),
+    column("version", "rowversion", 18),
+    column("label", "nchar", 19, length=10),
+    column("count", "int", 20),
+]
+
+# Mostly variable length columns, some of them NULL or left out of the offset array
+SCHEMAS["text"] = [
+    column("id", "int", 1),
+    column("first_name", "nvarchar", 2, length=50),
+    column("last_name", "nvarchar", 3, length=50),
+    column("email", "varchar", 4, length=120),
+    column("notes", "varchar", 5, length=1000),
+    column("city", "nvarchar", 6, length=60),
+]
+
+_WORDS = ("alfa", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india")
+
+
+class RowGenerator:
+    """Builds random but reproducible row images of a table, the same seed gives the same rows."""
+
+    def __init__(
+        self, table_schema: list[ColumnSchema], seed: int = 0, null_ratio: float = 0.1
+    ) -> None:
+        self.columns = table_schema
+        self.null_ratio = null_ratio
+        self._random = random.Random(seed)
+
+        self._fixed = [
+            col for col in table_schema if col.DATA_TYPE.lower() not in VARIABLE_LENGTH_TYPES
+        ]
+        self._variable = [
+            col for col in table_schema if col.DATA_TYPE.lower() in VARIABLE_LENGTH_TYPES
+        ]
+
+    def images(self, count: int) -> list[bytes]:
+        return [self.image(idx) for idx in range(count)]
+
+    def image(self, idx: int) -> bytes:
+        """A row image whose first integer column is `idx`."""
+
+        rand = self._random
+        nulls = 0
+
+        fixed = bytearray()
+        for position, col in enumerate(self._fixed):
+            # The first column is the key, it is never NULL
+            if position and rand.random() < self.null_ratio:
+                nulls |= _null_bit(col, self.columns)
+                fixed += bytes(_fixed_size(col))
+            else:
+                fixed += _fixed_value(col, idx if position == 0 else None, rand)
+
+        chunks: list[bytes] = []
+        for col in self._variable:
+            if rand.random() < self.null_ratio:
+                nulls |= _null_bit(col, self.columns)
+                chunks.append(b"")
+            else:
+                chunks.append(_variable_value(col, rand))
+
+        # Trailing NULL columns are left out of the offset array
+        while chunks and nulls & _null_bit(self._variable[len(chunks) - 1], self.columns):
+            chunks.pop()
+
+        column_count = len(self.columns)
+        fixed_end = 4 + len(fixed)
+        image = bytearray([_STATUS, 0])
+        image += struct.pack("<H", fixed_end)
+        image += fixed
+        image += struct.pack("<H", column_count)
+        image += nulls.to_bytes((column_count + 7) // 8, "little")
+
+        image += struct.pack("<H", len(chunks))
+        end = len(image) + 2 * len(chunks)
+        for chunk in chunks:
+            end += len(chunk)
+            image += struct.pack("<H", end)
+        for chunk in chunks:
+            image += chunk
+
+        return bytes(image)
+
+
+def _null_bit(col: ColumnSchema, columns: list[ColumnSchema]) -> int:
+    return 1 << ((col.ORDINAL_POSITION or columns.index(col) + 1) - 1)
+
+
+def _decimal_size(col: ColumnSchema) -> int:
+    precision = col.NUMERIC_PRECISION or 18
+    if precision <= 9:
+        return 5
+    if precision <= 19:
+        return 9
+    if precision <= 28:
+        return 13
+    return 17
+
+
+def _time_size(col: ColumnSchema) -> int:
+    precision = 7 if col.DATETIME_PRECISION is None else col.DATETIME_PRECISION
+    return 3 if precision <= 2 else 4 if precision <= 4 else 5
+
+
+def _fixed_size(col: ColumnSchema) -> int:
+    data_type = col.DATA_TYPE.lower()
+    sizes = {
+        "int": 4,
+        "smallint": 2,
+        "tinyint": 1,
+        "bigint": 8,
+        "real": 4,
+        "float": 8,
+        "money": 8,
+        "smallmoney": 4,
+        "date": 3,
+        "datetime": 8,
+        "smalldatetime": 4,
+        "rowversion": 8,
+        "timestamp": 8,
+    }
+    if data_type in sizes:
+        return sizes[data_type]
+    if "decimal" in data_type or data_type == "numeric":
+        return _decimal_size(col)
+    if data_type == "time":
+        return _time_size(col)
+    if data_type in ("char", "binary"):
+        return col.CHARACTER_MAXIMUM_LENGTH or 1
+
+    # Types the decoder doesn't handle are skipped as 4 bytes
+    return 4
+
+
+def _fixed_value(col: ColumnSchema, key: typing.Optional[int], rand: random.Random) -> bytes:
+    data_type = col.DATA_TYPE.lower()
+
+    if data_type == "int":
+        return struct.pack("<i", key if key is not None else rand.randint(-(2**31), 2**31 - 1))
+    if data_type == "smallint":
+        return struct.pack("<h", rand.randint(-(2**15), 2**15 - 1))
+    if data_type == "tinyint":
+        return struct.pack("<B", rand.randint(0, 255))
+    if data_type == "bigint":
+        return struct.pack("<q", key if key is not None else rand.randint(-(2**63), 2**63 - 1))
+    if data_type == "real":
+        return struct.pack("<f", rand.uniform(-1e6, 1e6))
+    if data_type == "float":
+        return struct.pack("<d", rand.uniform(-1e12, 1e12))
+    if "decimal" in data_type or data_type == "numeric":
+        size = _decimal_size(col)
+        digits = min(col.NUMERIC_PRECISION or 18, 38)
+        value = rand.randrange(10**digits)
+        return bytes([rand.random() < 0.9]) + value.to_bytes(size - 1, "little")
+    if data_type == "char":
+        length = col.CHARACTER_MAXIMUM_LENGTH or 1
+        return rand.choice(_WORDS).ljust(length)[:length].encode("latin1")
+    if data_type == "money":
+        return struct.pack("<q", rand.randint(-(10**12), 10**12))
+    if data_type == "smallmoney":
+        return struct.pack("<i", rand.randint(-(2**31), 2**31 - 1))
+    if data_type == "date":
+        return rand.randint(_DAYS_TO_1900, _DAYS_TO_1900 + 60000).to_bytes(3, "little")
+    if data_type == "time":
+        size = _time_size(col)
+        precision = 7 if col.DATETIME_PRECISION is None else col.DATETIME_PRECISION
+        return rand.randrange(86400 * 10**precision).to_bytes(size, "little")
+    if data_type == "datetime":
+        return struct.pack("<Ii", rand.randrange(86400 * 300), rand.randint(0, 60000))
+    if data_type == "smalldatetime":
+        return struct.pack("<HH", rand.randrange(1440), rand.randint(0, 60000))
+    if data_type in ("binary", "rowversion", "timestamp"):
+        return rand.randbytes(_fixed_size(col))
+
+    return bytes(_fixed_size(col))
+
+
+def _variable_value(col: ColumnSchema, rand: random.Random) -> bytes:
+    length = col.CHARACTER_MAXIMUM_LENGTH or 50
+    words = [rand.choice(_WORDS) for _ in range(rand.randint(1, 12))]
+    text = " ".join(words)[: max(1, min(length, 400))]
+
+    if col.DATA_TYPE.lower() in ("nvarchar", "nchar"):
+        return text.encode("utf-16-le")
+
+    return text.encode("latin1")
@@ -0,0 +1,250 @@
+"""Rows per second and peak memory of the decoder, the whole pipeline and the change table.
+
+    python -m benchmarks.run [--rows N] [--only decode,pipeline,table] [--json FILE]
+                             [--baseline FILE] [--log FILE]
+    python -m benchmarks.run --record DATABASE --log FILE [--server HOST] [--user U --password P]
+
+Runs without a SQL Server: the row images come from `benchmarks.rowgen` and the log is served by
+`benchmarks.fake_cursor`, either synthetic or recorded from a real database with --record. With
+--baseline the results are compared with a previous --json run, and the exit status is 1 when a
+benchmark got more than 20% slower.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+import typing
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from watcher.decoder import TableDecoder
+from watcher.parser import Parser
+from watcher.schema_cache import SchemaCache
+
+from .fake_cursor import FakeCursor, record_log, synthetic_log
+from .rowgen import SCHEMAS, RowGenerator
+
+# Slowdown against the baseline reported as a regression
+TOLERANCE = 0.2
+
+
+@dataclass
+class Result:
+    name: str
+    rows: int
+    seconds: float
+    peak_bytes: int
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<20} {self.rows_per_second:>12,.0f} rows/s"
+            f"  peak {self.peak_bytes / 2**20:>8,.1f} MiB"
+        )
+
+
+def measure(name: str, rows: int, run: typing.Callable[[], typing.Any]) -> Result:
+    """Times `run` on its own, then runs it again under tracemalloc for the peak memory."""
+
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Result(name, rows, seconds, peak)
+
+
+def bench_decode(rows: int) -> list[Result]:
+    """Decoding of generated row images, one result per table of `rowgen.SCHEMAS`."""
+
+    results = []
+    for name, table_schema in SCHEMAS.items():
+        images = RowGenerator(table_schema).images(rows)
+        decoder = TableDecoder(table_schema)
+
+        # Every image must decode, a benchmark of failing rows measures nothing
+        for image in images[:100]:
+            decoder.decode_values(image)
+
+        def run() -> list[tuple[typing.Any, ...]]:
+            # The values are kept, like the changes hold them, so the peak includes them
+            decode = decoder.decode_values
+            return [decode(image) for image in images]
+
+        results.append(measure(f"decode/{name}", rows, run))
+
+    return results
+
+
+def _tables() -> dict[tuple[str, str], list]:
+    return {("dbo", name.capitalize()): table_schema for name, table_schema in SCHEMAS.items()}
+
+
+def bench_pipeline(rows: int, log_path: typing.Optional[Path] = None) -> list[Result]:
+    """Reading, assembling and decoding the log through `Parser.iter_changes`."""
+
+    if log_path:
+        recorded = FakeCursor.load(log_path)
+        tables, log, alloc_units = recorded.tables, recorded.log, recorded.alloc_units
+    else:
+        tables = _tables()
+        log, alloc_units = synthetic_log(tables, rows), None
+
+    changes = 0
+
+    def run() -> None:
+        nonlocal changes
+        parser = Parser(
+            typing.cast(typing.Any, FakeCursor(tables, log, alloc_units)),
+            "bench",
+            schema_cache=SchemaCache(None),
+        )
+        changes = sum(1 for _ in parser.iter_changes())
+
+    result = measure("pipeline", 0, run)
+    result.rows = changes
+    return [result]
+
+
+def bench_table(rows: int) -> list[Result]:
+    """Mounting the dashboard with `rows` changes, and refiltering it with `populate_table`."""
+
+    from textual.app import App
+    from textual.widgets import Switch
+
+    from watcher.screens.dashboard import Dashboard
+
+    parsed: dict[str, typing.Any] = {}
+    parser = Parser(
+        typing.cast(typing.Any, FakeCursor(_tables(), synthetic_log(_tables(), rows))),
+        "bench",
+        schema_cache=SchemaCache(None),
+    )
+    for operation, table_name, change in parser.iter_changes():
+        parsed.setdefault(operation, {}).setdefault(table_name, []).append(change)
+
+    async def mount() -> None:
+        app = App()
+        async with app.run_test() as pilot:
+            await app.push_screen(Dashboard(parsed))
+            await pilot.pause()
+
+    async def populate() -> Result:
+        app = App()
+        async with app.run_test() as pilot:
+            dashboard = Dashboard(parsed)
+            await app.push_screen(dashboard)
+            await pilot.pause()
+
+            switch = dashboard.query_one("#delete-switch", expect_type=Switch)
+
+            def swap_view() -> None:
+                for _ in range(10):
+                    switch.value = not switch.value
+                    dashboard.populate_table()
+
+            # Mounted once, only swapping the view is timed
+            return measure("table/populate", rows * 10, swap_view)
+
+    return [
+        measure("table/mount", rows, lambda: asyncio.run(mount())),
+        asyncio.run(populate()),
+    ]
+
+
+BENCHMARKS: dict[str, typing.Callable[..., list[Result]]] = {
+    "decode": bench_decode,
+    "pipeline": bench_pipeline,
+    "table": bench_table,
+}
+
+
+def compare(results: list[Result], baseline_path: Path) -> list[str]:
+    """Benchmarks more than TOLERANCE slower than in the baseline."""
+
+    with open(baseline_path) as f:
+        baseline = {result["name"]: result for result in json.load(f)}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if not previous or not previous["seconds"] or not previous["rows"]:
+            continue
+
+        before = previous["rows"] / previous["seconds"]
+        if result.rows_per_second < before * (1 - TOLERANCE):
+            regressions.append(
+                f"{result.name}: {result.rows_per_second:,.0f} rows/s, "
+                f"{before:,.0f} rows/s in the baseline"
+            )
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--only", default=",".join(BENCHMARKS))
+    parser.add_argument("--json", type=Path, help="saves the results")
+    parser.add_argument("--baseline", type=Path, help="results of a previous --json run")
+    parser.add_argument("--log", type=Path, help="log recorded with --record, for the pipeline")
+    parser.add_argument("--record", metavar="DATABASE", help="records the log of DATABASE to --log")
+    parser.add_argument("--server", default="localhost", help="server of --record")
+    parser.add_argument("--user", help="login of --record, Windows authentication without it")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.log:
+            parser.error("--record needs --log")
+
+        import pymssql
+
+        login = {"user": args.user, "password": args.password} if args.user else {}
+        with pymssql.connect(
+            server=args.server, database=args.record, autocommit=True, **login
+        ) as conn:
+            saved = record_log(conn.cursor(), args.record, args.log)
+        print(f"{saved:,} log rows saved to {args.log}")
+        return
+
+    results: list[Result] = []
+    for name in args.only.split(","):
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name}, choose from {', '.join(BENCHMARKS)}")
+
+        if name == "pipeline":
+            ran = bench_pipeline(args.rows, args.log)
+        else:
+            ran = BENCHMARKS[name](args.rows)
+
+        for result in ran:
+            print(result)
+        results.extend(ran)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
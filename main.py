@@ -1,4 +1,18 @@
+import os
+import sys
+
 from watcher import WatcherApp
+from watcher.pool import DEFAULT_POOL_SIZE
 
 if __name__ == "__main__":
-    WatcherApp().run()
+    # With arguments it runs a headless command, e.g. `python main.py export --help`
+    if len(sys.argv) > 1:
+        from watcher.cli import main
+
+        sys.exit(main())
+
+    WatcherApp(
+        decode_workers=int(os.environ.get("WATCHER_DECODE_WORKERS", "0")),
+        pool_size=int(os.environ.get("WATCHER_POOL_SIZE", str(DEFAULT_POOL_SIZE))),
+        stats=os.environ.get("WATCHER_STATS", "0") not in ("", "0"),
+    ).run()
@@ -0,0 +1,97 @@
+import threading
+import unittest
+from contextlib import contextmanager
+from operator import itemgetter
+from typing import Iterator, Optional
+
+from watcher import backup
+from watcher.backup import BackupSource
+from watcher.lsn import LSN
+
+
+def log_rows(first: int, count: int) -> list[tuple]:
+    """Rows of a log backup with consecutive LSNs, the LSN is the 4th column like in the log query."""
+
+    return [
+        (None, None, None, str(LSN(0x2A << 48 | slot << 16 | 1)))
+        for slot in range(first, first + count)
+    ]
+
+
+class FakeBackupCursor:
+    def __init__(
+        self, files: dict[str, list[tuple]], exhausted: dict[str, threading.Event]
+    ) -> None:
+        self.files = files
+        self.exhausted = exhausted
+        self.file = ""
+        self.rows: list[tuple] = []
+
+    def execute(self, query: str, params: Optional[tuple] = None) -> None:
+        self.file = params[1]
+        rows = self.files[self.file]
+        self.rows = [min(rows, key=itemgetter(3))] if "MIN([Current LSN])" in query else list(rows)
+
+    def fetchall(self) -> list[tuple]:
+        rows, self.rows = self.rows, []
+        return [(row[3],) for row in rows]
+
+    def fetchmany(self, size: int) -> list[tuple]:
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        if not rows:
+            self.exhausted[self.file].set()
+        return rows
+
+
+class FakeBackupConnection:
+    def __init__(self, files: dict[str, list[tuple]]) -> None:
+        self.files = files
+        self.exhausted = {file: threading.Event() for file in files}
+
+    @contextmanager
+    def connection(self) -> Iterator["FakeBackupConnection"]:
+        yield self
+
+    def cursor(self) -> FakeBackupCursor:
+        return FakeBackupCursor(self.files, self.exhausted)
+
+
+class BackupSourceTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.batch_size = backup.BATCH_SIZE
+        backup.BATCH_SIZE = 10
+
+    def tearDown(self) -> None:
+        backup.BATCH_SIZE = self.batch_size
+
+    def test_files_are_read_in_lsn_order_without_repeats(self) -> None:
+        # Given out of order, and the full backup repeats the start of the first log backup
+        files = {
+            "log2.trn": log_rows(200, 100),
+            "full.bak": log_rows(0, 120),
+            "log1.trn": log_rows(100, 100),
+        }
+        source = BackupSource(list(files), FakeBackupConnection(files).connection, workers=2)
+
+        lsns = [row[3] for rows in source.iter_batches("{source}", None, ()) for row in rows]
+
+        self.assertEqual(lsns, [row[3] for row in log_rows(0, 300)])
+
+    def test_next_files_are_prefetched(self) -> None:
+        files = {f"log{idx}.trn": log_rows(idx * 1000, 1000) for idx in range(3)}
+        connection = FakeBackupConnection(files)
+        source = BackupSource(list(files), connection.connection, workers=3)
+
+        batches = source.iter_batches("{source}", None, ())
+        next(batches)
+
+        # The later files are read to the end, far past the batches kept in memory, while the
+        # first one has barely been consumed
+        for file in ("log1.trn", "log2.trn"):
+            self.assertTrue(connection.exhausted[file].wait(5))
+
+        self.assertEqual(sum(len(rows) for rows in batches), 2990)
+
+
+if __name__ == "__main__":
+    unittest.main()
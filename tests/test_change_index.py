@@ -0,0 +1,60 @@
+import random
+import unittest
+
+from watcher.change import Change
+from watcher.change_index import ChangeIndex
+from watcher.lsn import LSN
+
+
+def change(lsn: int, source: str = "a") -> Change:
+    return Change(
+        operation="LOP_INSERT_ROWS",
+        schema="dbo",
+        table="T",
+        transaction_id="0000:00000001",
+        begin_time=None,
+        end_time=None,
+        username="sa",
+        lsn=LSN(lsn),
+        columns=(),
+        values=(),
+        source=source,
+    )
+
+
+class ExtendTest(unittest.TestCase):
+    def test_out_of_order_batches_are_merged(self) -> None:
+        rand = random.Random(0)
+        index = ChangeIndex()
+        added: dict[tuple[int, str], Change] = {}
+
+        for _ in range(200):
+            batch = [
+                change(rand.randint(1, 2000), rand.choice("ab"))
+                for _ in range(rand.randint(1, 20))
+            ]
+            new_ids = index.extend(batch)
+
+            for change_id in new_ids:
+                indexed = index[change_id]
+                self.assertNotIn((indexed.lsn, indexed.source), added)
+                added[indexed.lsn, indexed.source] = indexed
+
+        self.assertEqual(len(index), len(added))
+        self.assertEqual(list(index.ids), sorted(index.ids, key=lambda change_id: index[change_id].lsn))
+        self.assertEqual(index.lsns, sorted(lsn for lsn, _ in added))
+        for (lsn, source), indexed in added.items():
+            self.assertIs(index.get(lsn, source), indexed)
+
+    def test_indexed_change_keeps_its_id(self) -> None:
+        index = ChangeIndex()
+        first = change(10)
+        index.extend([change(5), first, change(20)])
+
+        self.assertEqual(index.extend([change(15), change(10), change(10, "b"), change(1)]), [3, 4, 5])
+        self.assertIs(index.get(LSN(10), "a"), first)
+        self.assertEqual([indexed.lsn for indexed in index], [1, 5, 10, 10, 15, 20])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+import typing
+import unittest
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from watcher import cli
+from watcher.change import Change
+from watcher.lsn import LSN
+from watcher.parser import ChangeEntry
+from watcher.schema_cache import SchemaCache
+
+COLUMNS = ("id", "hash", "amount")
+
+
+def change(lsn: int, operation: str = "LOP_INSERT_ROWS") -> Change:
+    return Change(
+        operation=operation,
+        schema="dbo",
+        table="Pedidos",
+        transaction_id="0000:00000001",
+        begin_time="2024/01/01 10:00:00:000",
+        end_time="2024/01/01 10:00:01:000",
+        username="sa",
+        lsn=LSN(lsn),
+        columns=COLUMNS,
+        values=(lsn, b"\x0a\xff", Decimal("12.50")),
+    )
+
+
+def entries(changes: list[Change]) -> list[ChangeEntry]:
+    return [(change.operation, "dbo.Pedidos", change) for change in changes]
+
+
+def export(output_format: str, changes: list[Change]) -> tuple[str, int]:
+    schema_cache = SchemaCache()
+    schema_cache.primary_keys[("dbo", "Pedidos")] = ["id"]
+    parser = typing.cast(typing.Any, SimpleNamespace(schema_cache=schema_cache))
+
+    output = io.StringIO()
+    count = cli.write_changes(output, output_format, entries(changes), parser)
+    return output.getvalue(), count
+
+
+class NewestFirstTest(unittest.TestCase):
+    def test_changes_are_reversed_across_chunks(self) -> None:
+        changes = [change(lsn) for lsn in range(1, 12)]
+
+        with mock.patch.object(cli, "UNDO_CHUNK_SIZE", 3):
+            reversed_changes = list(cli._newest_first(iter(changes)))
+
+        self.assertEqual([c.lsn for c in reversed_changes], list(range(11, 0, -1)))
+        self.assertEqual(reversed_changes[0].values, changes[-1].values)
+
+
+class WriteChangesTest(unittest.TestCase):
+    def test_ndjson(self) -> None:
+        # Operations that aren't changes of a row are left out
+        text, count = export("ndjson", [change(1), change(2, "LOP_EXPUNGE_ROWS"), change(3)])
+
+        records = [json.loads(line) for line in text.splitlines()]
+        self.assertEqual(count, 2)
+        self.assertEqual([record["lsn"] for record in records], [str(LSN(1)), str(LSN(3))])
+        self.assertEqual(list(records[0]), list(cli.FIELDS))
+        self.assertEqual(records[0]["action"], "INSERT")
+        self.assertEqual(records[0]["data"], {"id": 1, "hash": "0x0AFF", "amount": "12.50"})
+
+    def test_csv(self) -> None:
+        text, count = export("csv", [change(1), change(2, "LOP_DELETE_ROWS")])
+
+        header, *rows = list(csv.reader(io.StringIO(text)))
+        self.assertEqual(count, 2)
+        self.assertEqual(header, list(cli.FIELDS))
+        self.assertEqual([row[1] for row in rows], ["INSERT", "DELETE"])
+        self.assertEqual(json.loads(rows[1][-1])["id"], 2)
+
+    def test_undo_reverts_the_newest_first(self) -> None:
+        changes = [change(1), change(2), change(3, "LOP_DELETE_ROWS"), change(4)]
+        with mock.patch.object(cli, "UNDO_CHUNK_SIZE", 2):
+            text, count = export("undo", changes)
+
+        self.assertEqual(count, 4)
+        self.assertIn(
+            "DELETE FROM [dbo].[Pedidos] WHERE [id] IN (4);\n"
+            "INSERT INTO [dbo].[Pedidos] ([id], [hash], [amount]) VALUES\n"
+            "    (3, 0x0AFF, 12.50);\n"
+            "DELETE FROM [dbo].[Pedidos] WHERE [id] IN (2, 1);\n",
+            text,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from watcher.change import Change
+from watcher.change_index import ChangeIndex
+from watcher.column_schema import ColumnSchema
+from watcher.history import RowHistory
+from watcher.lsn import LSN
+from watcher.schema_cache import SchemaCache
+
+COLUMNS = ("id", "name")
+
+
+def change(lsn: int, operation: str, columns: tuple[str, ...], values: tuple) -> Change:
+    return Change(
+        operation=operation,
+        schema="dbo",
+        table="T",
+        transaction_id="0000:00000001",
+        begin_time=None,
+        end_time=None,
+        username="sa",
+        lsn=LSN(lsn),
+        columns=columns,
+        values=values,
+    )
+
+
+def column(name: str, position: int) -> ColumnSchema:
+    return ColumnSchema(name, "int", 0, 10, 0, 0, 0, position)
+
+
+class KeylessTableTest(unittest.TestCase):
+    def history(self, schema_cache: SchemaCache) -> list[int]:
+        changes = ChangeIndex()
+        history = RowHistory(changes, schema_cache)
+        history.add(
+            changes.extend(
+                [
+                    change(1, "LOP_INSERT_ROWS", COLUMNS, (1, "a")),
+                    change(2, "LOP_INSERT_ROWS", COLUMNS, (2, "b")),
+                    change(
+                        3,
+                        "LOP_MODIFY_ROW",
+                        ("old", "new"),
+                        ({"id": 1, "name": "a"}, {"id": 1, "name": "c"}),
+                    ),
+                    change(4, "LOP_DELETE_ROWS", COLUMNS, (1, "c")),
+                ]
+            )
+        )
+
+        # The update links the row before and after it
+        return history.history(2)
+
+    def test_whole_row_identifies_it(self) -> None:
+        schema_cache = SchemaCache()
+        schema_cache.tables[("dbo", "T")] = [column("id", 1), column("name", 2)]
+
+        self.assertEqual(self.history(schema_cache), [0, 2, 3])
+
+    def test_columns_not_loaded(self) -> None:
+        self.assertEqual(self.history(SchemaCache()), [0, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
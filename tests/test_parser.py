@@ -0,0 +1,300 @@
+import tempfile
+import typing
+import unittest
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import pymssql
+
+from benchmarks.fake_cursor import FakeCursor, synthetic_log
+from benchmarks.rowgen import SCHEMAS
+from watcher.log_filter import LogFilter
+from watcher.lsn import LSN
+from watcher.parser import Parser
+from watcher.schema_cache import SchemaCache
+from watcher.stats import PipelineStats
+from watcher.store import ChangeStore
+
+
+def bind(query: str, params: Optional[tuple]) -> str:
+    """The query as pymssql sends it, with every parameter quoted in place of its placeholder."""
+
+    return query % tuple("NULL" if param is None else f"'{param}'" for param in params or ())
+
+
+class WindowCursor(FakeCursor):
+    """Fake cursor that keeps the time window queries it ran, bound, and answers them with `window`."""
+
+    def __init__(self) -> None:
+        tables = {("dbo", "Narrow"): SCHEMAS["narrow"]}
+        super().__init__(tables, synthetic_log(tables, 20))
+        self.window: tuple = (None, None, None)
+        self._window_queries: list[str] = []
+
+    def execute(self, query: str, params: Optional[tuple] = None) -> None:
+        super().execute(query, params)
+        if "[Operation] = 'LOP_BEGIN_XACT'" in query:
+            self._window_queries.append(bind(query, params))
+            self._rows = [self.window]
+
+    def window_queries(self) -> list[str]:
+        return self._window_queries
+
+
+def parser_for(cursor: FakeCursor, log_filter: LogFilter) -> Parser:
+    return Parser(
+        typing.cast(typing.Any, cursor), "test", schema_cache=SchemaCache(None), log_filter=log_filter
+    )
+
+
+class TimeWindowTest(unittest.TestCase):
+    def test_window_bounds_are_bound_in_order(self) -> None:
+        cursor = WindowCursor()
+        parser = parser_for(
+            cursor, LogFilter(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 3))
+        )
+        list(parser.iter_changes())
+
+        (query,) = cursor.window_queries()
+        self.assertIn("FROM sys.fn_dblog(NULL, NULL) l", query)
+        self.assertIn(
+            "SELECT '2024/01/01 00:00:00:000' AS start_time, '2024/01/03 00:00:00:000' AS end_time",
+            query,
+        )
+
+    def test_window_is_resolved_once(self) -> None:
+        cursor = WindowCursor()
+        start, end = LSN.parse("0000002a:00000001:0001"), LSN.parse("0000002a:00000009:0001")
+        cursor.window = (str(start), str(end), str(end))
+        parser = parser_for(
+            cursor, LogFilter(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 3))
+        )
+
+        list(parser.iter_changes())
+        parser.poll()
+        parser.poll()
+
+        self.assertEqual(len(cursor.window_queries()), 1)
+        self.assertEqual(parser._time_window_lsns(), (start, end))
+
+    def test_open_window_only_reads_the_new_records(self) -> None:
+        cursor = WindowCursor()
+        start, scanned = LSN.parse("0000002a:00000001:0001"), LSN.parse("0000002a:00000005:0001")
+        cursor.window = (str(start), None, str(scanned))
+        parser = parser_for(
+            cursor, LogFilter(start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 3))
+        )
+
+        list(parser.iter_changes())
+        end = LSN.parse("0000002a:00000007:0001")
+        cursor.window = (None, str(end), str(end))
+        parser.poll()
+
+        first, second = cursor.window_queries()
+        self.assertIn("fn_dblog(NULL, NULL)", first)
+        self.assertIn(f"fn_dblog('{scanned.decimal}', NULL)", second)
+        self.assertEqual(parser._time_window_lsns(), (start, end))
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "changes.sqlite"
+
+        # The last transaction is still open when the log is first read
+        tables = {("dbo", "Narrow"): SCHEMAS["narrow"]}
+        log = synthetic_log(tables, 50)
+        self.commit = log.pop()
+        self.cursor = FakeCursor(tables, log)
+
+    def parser(self, log_filter: LogFilter = LogFilter()) -> Parser:
+        parser = Parser(
+            typing.cast(typing.Any, self.cursor),
+            "test",
+            schema_cache=SchemaCache(None),
+            log_filter=log_filter,
+            store=ChangeStore(self.path),
+        )
+        self.addCleanup(parser.close)
+        return parser
+
+    def open_transaction(self) -> list[LSN]:
+        """LSNs of the records of the last transaction, from its LOP_BEGIN_XACT on."""
+
+        transaction_id = self.commit[2]
+        return [LSN.parse(row[3]) for row in self.cursor.log if row[2] == transaction_id]
+
+    def test_open_transaction_is_not_stored(self) -> None:
+        parser = self.parser()
+        changes = list(parser._initial_changes())
+
+        begin, *open_changes = self.open_transaction()
+        stored = {change[2].lsn for change in parser.store.iter_changes()}
+        self.assertEqual(stored, {change[2].lsn for change in changes})
+        self.assertTrue(stored.isdisjoint(open_changes))
+        self.assertLess(parser.store.checkpoint(), begin)
+
+        # Once committed the next poll stores it, and the checkpoint moves past it
+        self.cursor.log.append(self.commit)
+        polled = [change[2].lsn for change in parser.iter_new_changes()]
+        self.assertEqual(polled, open_changes)
+        self.assertEqual(parser.store.checkpoint(), LSN.parse(self.commit[3]))
+
+    def test_every_filter_has_its_own_checkpoint(self) -> None:
+        self.cursor.log.append(self.commit)
+        middle = LSN.parse(self.cursor.log[len(self.cursor.log) // 2][3])
+        later = LogFilter(start_lsn=middle)
+
+        filtered = self.parser(later)
+        self.assertTrue(all(change[2].lsn > middle for change in filtered._initial_changes()))
+        self.assertEqual(filtered.store.checkpoint(later.key), LSN.parse(self.commit[3]))
+        self.assertIsNone(filtered.store.checkpoint())
+
+        # Without the filter the log is read again, the records left out before are not lost
+        changes = list(self.parser()._initial_changes())
+        self.assertEqual(
+            len(changes),
+            sum(row[0] in ("LOP_INSERT_ROWS", "LOP_DELETE_ROWS") for row in self.cursor.log),
+        )
+        self.assertEqual(len({change[2].lsn for change in changes}), len(changes))
+
+        # The stored changes shown with the filter are only the ones it lets through
+        shown = list(self.parser(later)._initial_changes())
+        self.assertTrue(shown)
+        self.assertTrue(all(change[2].lsn > middle for change in shown))
+
+
+class OperationsCursor(FakeCursor):
+    """Fake cursor that applies the operations the parser asks the server for."""
+
+    def _log_after(self, params: Optional[tuple]) -> list[tuple]:
+        operations = set(params[5:]) if params and len(params) > 5 else None
+        return [
+            row
+            for row in super()._log_after(params)
+            if operations is None
+            or row[0] in ("LOP_BEGIN_XACT", "LOP_COMMIT_XACT", "LOP_ABORT_XACT")
+            or row[0] in operations
+        ]
+
+
+class OperationsFilterTest(unittest.TestCase):
+    def test_filtered_updates_keep_their_images(self) -> None:
+        tables = {("dbo", "Narrow"): SCHEMAS["narrow"]}
+        log = synthetic_log(tables, 1, seed=1)
+        begin, insert, commit = log
+        self.assertEqual(insert[0], "LOP_INSERT_ROWS")
+
+        # The quantity, the int after the row header and the id, goes from what was inserted to 7
+        offset = 8
+        before = insert[6][offset : offset + 4]
+        after = (7).to_bytes(4, "little")
+        log += [
+            (*begin[:2], "0000:00000002", "0000002a:00000010:0001", *begin[4:]),
+            (
+                "LOP_MODIFY_ROW",
+                *insert[1:2],
+                "0000:00000002",
+                "0000002a:00000010:0002",
+                *insert[4:6],
+                before,
+                after,
+                *insert[8:17],
+                offset,
+                len(before),
+            ),
+            (*commit[:2], "0000:00000002", "0000002a:00000010:0003", *commit[4:]),
+        ]
+
+        log_filter = LogFilter(operations=("LOP_MODIFY_ROW",))
+        parser = parser_for(OperationsCursor(tables, log), log_filter)
+        ((operation, _, update),) = list(parser.iter_changes())
+
+        self.assertEqual(operation, "LOP_MODIFY_ROW")
+        self.assertEqual(update.data["new"]["quantity"], 7)
+        self.assertEqual(
+            update.data["old"]["quantity"], int.from_bytes(before, "little", signed=True)
+        )
+
+
+class IndexCursor(FakeCursor):
+    """Fake cursor whose table also has a nonclustered index, in its own allocation unit."""
+
+    INDEX_ALLOC_UNIT_ID = 1
+
+    def execute(self, query: str, params: Optional[tuple] = None) -> None:
+        super().execute(query, params)
+        if "sys.allocation_units" in query:
+            schema, table = next(iter(self.tables))
+            self._rows.append((self.INDEX_ALLOC_UNIT_ID, schema, table, 0))
+
+
+class AllocationUnitTest(unittest.TestCase):
+    def test_index_records_are_skipped(self) -> None:
+        tables = {("dbo", "Narrow"): SCHEMAS["narrow"]}
+        log = synthetic_log(tables, 50)
+
+        # Every other change also writes an index entry, in the log like a row of the table
+        index_rows = [idx for idx, row in enumerate(log) if row[0] == "LOP_INSERT_ROWS"][::2]
+        for idx in index_rows:
+            log[idx] = (*log[idx][:13], IndexCursor.INDEX_ALLOC_UNIT_ID, *log[idx][14:])
+
+        stats = PipelineStats()
+        parser = Parser(
+            typing.cast(typing.Any, IndexCursor(tables, log)),
+            "test",
+            schema_cache=SchemaCache(None),
+            stats=stats,
+        )
+        changes = list(parser.iter_changes())
+
+        self.assertEqual(len(changes), 50 - len(index_rows))
+        self.assertNotIn("unknown_alloc_units", stats.to_dict()["counters"])
+
+
+class TruncatedCursor(FakeCursor):
+    """Fake cursor whose log was truncated by a backup, fn_dblog fails to start at a given LSN."""
+
+    def execute(self, query: str, params: Optional[tuple] = None) -> None:
+        if "fn_dblog(%s, NULL)" in query and params and params[0] is not None:
+            raise pymssql.OperationalError(
+                9003, b"The log scan number passed to log scan is not valid."
+            )
+
+        if "fn_dblog(NULL, NULL)" in query:
+            # The scan starts at the beginning of the log, the parameters of the query follow
+            params = (None, *(params or ()))
+
+        super().execute(query, params)
+
+
+class TruncatedLogTest(unittest.TestCase):
+    def test_poll_reads_from_the_start_of_a_truncated_log(self) -> None:
+        tables = {("dbo", "Narrow"): SCHEMAS["narrow"]}
+        log = synthetic_log(tables, 50)
+        first = next(idx for idx, row in enumerate(log) if row[0] == "LOP_COMMIT_XACT") + 1
+
+        cursor = TruncatedCursor(tables, log[:first])
+        stats = PipelineStats()
+        parser = Parser(
+            typing.cast(typing.Any, cursor), "test", schema_cache=SchemaCache(None), stats=stats
+        )
+        read = list(parser.iter_new_changes())
+
+        # A log backup removed the records already read, new ones were written after them
+        cursor.log = log[1:]
+        polled = list(parser.iter_new_changes())
+
+        self.assertEqual(
+            len(read) + len(polled),
+            sum(row[0] in ("LOP_INSERT_ROWS", "LOP_DELETE_ROWS") for row in log),
+        )
+        last_read = max(change[2].lsn for change in read)
+        self.assertTrue(all(change[2].lsn > last_read for change in polled))
+        self.assertEqual(stats.to_dict()["counters"], {"truncated_log_restarts": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import typing
+import unittest
+from typing import Optional
+from unittest import mock
+
+import pymssql
+
+from benchmarks.fake_cursor import FakeCursor
+from watcher import pool
+from watcher.pool import ConnectionPool, PoolExhausted
+
+
+class FakeConnection:
+    """Connection whose cursors answer the health check, until it is broken."""
+
+    def __init__(self) -> None:
+        self.broken = False
+        self.closed = False
+
+    def cursor(self) -> "BrokenCursor":
+        return BrokenCursor(self)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class BrokenCursor(FakeCursor):
+    def __init__(self, conn: FakeConnection) -> None:
+        super().__init__({}, [])
+        self.conn = conn
+
+    def execute(self, query: str, params: Optional[tuple] = None) -> None:
+        if self.conn.broken:
+            raise pymssql.OperationalError(20006, b"Write to the server failed")
+
+        super().execute(query, params)
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.opened: list[FakeConnection] = []
+
+    def connect(self) -> typing.Any:
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def test_connections_are_reused(self) -> None:
+        connections = ConnectionPool(self.connect, size=2)
+        for _ in range(3):
+            with connections.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+
+        self.assertEqual(len(self.opened), 1)
+
+    def test_dead_idle_connection_is_replaced(self) -> None:
+        connections = ConnectionPool(self.connect)
+        with connections.connection() as conn:
+            pass
+
+        conn.broken = True
+        with mock.patch.object(pool, "HEALTH_CHECK_AFTER_SECONDS", 0):
+            with connections.connection() as replaced:
+                pass
+
+        self.assertIsNot(replaced, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_recently_used_connection_is_not_checked(self) -> None:
+        connections = ConnectionPool(self.connect)
+        with connections.connection() as conn:
+            pass
+
+        # Within HEALTH_CHECK_AFTER_SECONDS the connection is handed out as is
+        conn.broken = True
+        with connections.connection() as reused:
+            pass
+
+        self.assertIs(reused, conn)
+
+    def test_connection_error_drops_the_connection(self) -> None:
+        connections = ConnectionPool(self.connect)
+        with self.assertRaises(pymssql.OperationalError):
+            with connections.cursor() as cursor:
+                typing.cast(BrokenCursor, cursor).conn.broken = True
+                cursor.execute("SELECT 1;")
+
+        with connections.connection() as conn:
+            pass
+
+        self.assertTrue(self.opened[0].closed)
+        self.assertIs(conn, self.opened[1])
+
+    def test_other_errors_return_the_connection(self) -> None:
+        connections = ConnectionPool(self.connect)
+        with self.assertRaises(ValueError):
+            with connections.connection():
+                raise ValueError("not a connection error")
+
+        with connections.connection() as conn:
+            pass
+
+        self.assertIs(conn, self.opened[0])
+        self.assertFalse(conn.closed)
+
+    def test_borrowing_more_than_the_size_times_out(self) -> None:
+        connections = ConnectionPool(self.connect, size=1)
+        with mock.patch.object(pool, "BORROW_TIMEOUT_SECONDS", 0.01):
+            with connections.connection():
+                with self.assertRaises(PoolExhausted):
+                    with connections.connection():
+                        pass
+
+            # The slot is free again once the first connection is returned
+            with connections.connection():
+                pass
+
+    def test_close(self) -> None:
+        connections = ConnectionPool(self.connect, size=2)
+        with connections.connection() as borrowed:
+            with connections.connection() as idle:
+                pass
+
+            connections.close()
+            self.assertTrue(idle.closed)
+            self.assertFalse(borrowed.closed)
+
+        self.assertTrue(borrowed.closed)
+        with self.assertRaises(PoolExhausted):
+            with connections.connection():
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from watcher.row_state import RowStateCache
+
+PAGE = "0001:00000010"
+
+
+class RowStateCacheTest(unittest.TestCase):
+    def test_update_patches_the_image(self) -> None:
+        rows = RowStateCache()
+        rows.insert(PAGE, 0, b"\x10\x00abcdef", shift=False)
+
+        self.assertEqual(
+            rows.modify(PAGE, 0, 4, b"cd", b"XY"), (b"\x10\x00abcdef", b"\x10\x00abXYef")
+        )
+
+        # The next update of the row starts from the patched image
+        self.assertEqual(
+            rows.modify(PAGE, 0, 2, b"ab", b"12"), (b"\x10\x00abXYef", b"\x10\x0012XYef")
+        )
+
+    def test_index_slots_shift(self) -> None:
+        rows = RowStateCache()
+        rows.insert(PAGE, 0, b"a", shift=True)
+        rows.insert(PAGE, 1, b"c", shift=True)
+
+        # A row inserted in between moves the next one up a slot
+        rows.insert(PAGE, 1, b"b", shift=True)
+        self.assertEqual(rows.modify(PAGE, 2, 0, b"c", b"C"), (b"c", b"C"))
+
+        # And removing it moves that one back
+        rows.delete(PAGE, 1, shift=True)
+        self.assertEqual(rows.modify(PAGE, 1, 0, b"C", b"c"), (b"C", b"c"))
+        self.assertEqual(len(rows), 2)
+
+    def test_heap_slots_stay_put(self) -> None:
+        rows = RowStateCache()
+        rows.insert(PAGE, 0, b"a", shift=False)
+        rows.insert(PAGE, 1, b"b", shift=False)
+        rows.delete(PAGE, 0, shift=False)
+
+        self.assertIsNone(rows.modify(PAGE, 0, 0, b"a", b"A"))
+        self.assertEqual(rows.modify(PAGE, 1, 0, b"b", b"B"), (b"b", b"B"))
+
+    def test_stale_image_is_rejected(self) -> None:
+        rows = RowStateCache()
+        rows.insert(PAGE, 0, b"abcd", shift=False)
+
+        # The logged bytes don't match what the cache has, e.g. after a change it didn't follow
+        self.assertIsNone(rows.modify(PAGE, 0, 1, b"xx", b"yy"))
+        self.assertEqual(len(rows), 0)
+        self.assertIsNone(rows.modify(PAGE, 0, 1, b"bc", b"yy"))
+
+    def test_least_recently_used_pages_are_evicted(self) -> None:
+        rows = RowStateCache(max_rows=2)
+        rows.insert("0001:00000001", 0, b"a", shift=False)
+        rows.insert("0001:00000002", 0, b"b", shift=False)
+        rows.modify("0001:00000001", 0, 0, b"a", b"A")
+        rows.insert("0001:00000003", 0, b"c", shift=False)
+
+        self.assertEqual(len(rows), 2)
+        self.assertIsNone(rows.modify("0001:00000002", 0, 0, b"b", b"B"))
+        self.assertEqual(rows.modify("0001:00000001", 0, 0, b"A", b"a"), (b"A", b"a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
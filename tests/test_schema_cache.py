@@ -0,0 +1,34 @@
+import tempfile
+import typing
+import unittest
+from pathlib import Path
+
+from benchmarks.fake_cursor import FakeCursor, synthetic_log
+from benchmarks.rowgen import SCHEMAS
+from watcher.parser import Parser
+from watcher.schema_cache import SchemaCache
+from watcher.stats import PipelineStats
+
+
+class SchemaCacheTest(unittest.TestCase):
+    def test_write_error_is_counted(self) -> None:
+        tables = {("dbo", "Narrow"): SCHEMAS["narrow"]}
+        stats = PipelineStats()
+
+        with tempfile.NamedTemporaryFile() as f:
+            # The directory of the cache is a file, so it can't be saved
+            schema_cache = SchemaCache(Path(f.name) / "schema.json")
+            parser = Parser(
+                typing.cast(typing.Any, FakeCursor(tables, synthetic_log(tables, 10))),
+                "test",
+                schema_cache=schema_cache,
+                stats=stats,
+            )
+            changes = list(parser.iter_changes())
+
+        self.assertEqual(len(changes), 10)
+        self.assertEqual(stats.to_dict()["counters"], {"schema_cache_write_errors": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import tempfile
+import unittest
+from decimal import Decimal
+from pathlib import Path
+
+from benchmarks.rowgen import SCHEMAS, RowGenerator
+from watcher.change import Change
+from watcher.decoder import TableDecoder
+from watcher.lsn import LSN
+from watcher.scripts import ScriptGenerator
+from watcher.store import ChangeStore
+
+KEY = ("dbo", "Pedidos")
+
+
+def change(
+    operation: str, columns: tuple[str, ...], values: tuple, key: tuple[str, str] = KEY
+) -> Change:
+    return Change(
+        operation=operation,
+        schema=key[0],
+        table=key[1],
+        transaction_id="0000:00000001",
+        begin_time=None,
+        end_time=None,
+        username="sa",
+        lsn=LSN(1),
+        columns=columns,
+        values=values,
+    )
+
+
+class DecodeTest(unittest.TestCase):
+    def test_values_keep_their_sql_types(self) -> None:
+        values = TableDecoder(SCHEMAS["wide"]).decode(RowGenerator(SCHEMAS["wide"]).image(1))
+
+        self.assertIsInstance(values["amount"], Decimal)
+        self.assertEqual(values["amount"].as_tuple().exponent, -2)
+        self.assertEqual(values["big_amount"].as_tuple().exponent, -6)
+        self.assertEqual(values["price"].as_tuple().exponent, -4)
+        self.assertEqual(values["fee"].as_tuple().exponent, -4)
+        self.assertIsInstance(values["hash"], bytes)
+        self.assertEqual(len(values["hash"]), 16)
+        self.assertIsInstance(values["version"], bytes)
+        self.assertEqual(len(values["version"]), 8)
+
+    def test_wide_decimals_are_exact(self) -> None:
+        decoder = TableDecoder([SCHEMAS["wide"][6]])
+        value = 12345678901234567890123456789012345678
+
+        # Status bits, fixed data length, the decimal, the column count and its null bitmap
+        fixed = bytes([1]) + value.to_bytes(16, "little")
+        image = bytes([0x10, 0]) + (4 + len(fixed)).to_bytes(2, "little") + fixed + bytes([1, 0, 0])
+
+        self.assertEqual(
+            decoder.decode(image)["big_amount"], Decimal("12345678901234567890123456789012.345678")
+        )
+
+
+class ScriptTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.generator = ScriptGenerator(
+            {KEY: ["id"]}, generated_columns={KEY: ["version", "total"]}
+        )
+
+    def test_binary_and_decimal_literals(self) -> None:
+        columns = ("id", "hash", "amount", "version", "total")
+        values = (1, b"\x0a\xff", Decimal("12.50"), b"\x00" * 8, Decimal("25.00"))
+        insert = change("LOP_INSERT_ROWS", columns, values)
+
+        (statement,) = self.generator.redo([insert])
+        self.assertEqual(
+            statement,
+            "INSERT INTO [dbo].[Pedidos] ([id], [hash], [amount]) VALUES\n    (1, 0x0AFF, 12.50);",
+        )
+
+    def test_generated_columns_are_not_updated(self) -> None:
+        old = {"id": 1, "amount": Decimal("1.00"), "version": b"\x01"}
+        new = {"id": 1, "amount": Decimal("2.00"), "version": b"\x02"}
+        update = change("LOP_MODIFY_ROW", ("old", "new"), (old, new))
+
+        # Only the rowversion changed, there is nothing to write back
+        only_generated = change(
+            "LOP_MODIFY_ROW", ("old", "new"), ({"id": 1, "version": b"\x01"}, {"id": 1, "version": b"\x02"})
+        )
+
+        self.assertEqual(
+            list(self.generator.undo([update, only_generated])),
+            ["UPDATE [dbo].[Pedidos] SET [amount] = 1.00 WHERE [id] = 1;"],
+        )
+
+    def test_only_changed_columns_are_updated(self) -> None:
+        lines = ("dbo", "Lineas")
+        generator = ScriptGenerator({lines: ["id"]}, {lines: "id"})
+
+        old = {"id": 7, "code": "A", "quantity": 1, "name": "x"}
+        new = {"id": 7, "code": "B", "quantity": 2, "name": "x"}
+        update = change("LOP_MODIFY_ROW", ("old", "new"), (old, new), lines)
+
+        # The identity column is never assigned, even if a table has no other key to find the row
+        keyless = ScriptGenerator(identity_columns={lines: "id"})
+
+        self.assertEqual(
+            list(generator.undo([update])),
+            ["UPDATE [dbo].[Lineas] SET [code] = N'A', [quantity] = 1 WHERE [id] = 7;"],
+        )
+        self.assertEqual(
+            list(keyless.redo([update])),
+            [
+                "UPDATE [dbo].[Lineas] SET [code] = N'B', [quantity] = 2 "
+                "WHERE [id] = 7 AND [code] = N'A' AND [quantity] = 1 AND [name] = N'x';"
+            ],
+        )
+
+    def test_changed_key_is_updated(self) -> None:
+        old = {"id": 1, "amount": Decimal("1.00")}
+        new = {"id": 2, "amount": Decimal("1.00")}
+        update = change("LOP_MODIFY_ROW", ("old", "new"), (old, new))
+
+        self.assertEqual(
+            list(self.generator.undo([update])),
+            ["UPDATE [dbo].[Pedidos] SET [id] = 1 WHERE [id] = 2;"],
+        )
+
+    def test_update_without_image_is_reported(self) -> None:
+        update = change("LOP_MODIFY_COLUMNS", ("old", "new"), ({}, {}))
+
+        self.assertEqual(
+            list(self.generator.undo([update])),
+            [
+                "-- No se puede deshacer el cambio de [dbo].[Pedidos] en el LSN "
+                f"{update.lsn}: falta la imagen de la fila"
+            ],
+        )
+        self.assertEqual(self.generator.unscripted, 1)
+
+    def test_stored_values_keep_their_types(self) -> None:
+        columns = ("id", "hash", "amount")
+        insert = change("LOP_INSERT_ROWS", columns, (1, b"\x0a\xff", Decimal("12.50")))
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = ChangeStore(Path(directory) / "changes.sqlite")
+            store.append([("LOP_INSERT_ROWS", "dbo.Pedidos", insert)], None)
+            ((_, _, stored),) = store.iter_changes()
+            store.close()
+
+        self.assertEqual(stored.values, insert.values)
+        self.assertEqual(list(self.generator.redo([stored])), list(self.generator.redo([insert])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from watcher.log_record import LogRecord
+from watcher.lsn import LSN
+from watcher.transactions import TransactionAssembler
+
+TABLE = "dbo.Pedidos"
+
+
+def record(transaction_id: str, lsn: int, operation: str = "LOP_INSERT_ROWS") -> LogRecord:
+    return LogRecord(
+        operation=operation,
+        context="LCX_HEAP",
+        transaction_id=transaction_id,
+        alloc_unit=TABLE,
+        raw_data=lsn.to_bytes(4, "little"),
+        raw_data2=b"",
+        begin_operation=None,
+        end_operation=None,
+        username="sa",
+        current_lsn=LSN(lsn),
+        alloc_unit_id=1,
+        partition_id=1,
+    )
+
+
+class TransactionAssemblerTest(unittest.TestCase):
+    def test_long_transaction_is_spilled(self) -> None:
+        transactions = TransactionAssembler(spill_threshold=3)
+        transactions.begin("1", "2024/01/01 10:00:00:000", LSN(1), None)
+        for lsn in range(2, 10):
+            transactions.add(record("1", lsn), TABLE, LSN(lsn - 1))
+
+        opened = transactions._open["1"]
+        self.assertIsNotNone(opened.spill)
+        self.assertEqual(len(opened.records), 2)
+
+        released = list(transactions.end("1", "2024/01/01 10:00:01:000", "COMMIT", LSN(10)))
+        self.assertEqual([r.current_lsn for r in released], list(range(2, 10)))
+        self.assertEqual(
+            [r.raw_data for r in released], [lsn.to_bytes(4, "little") for lsn in range(2, 10)]
+        )
+        self.assertTrue(all(r.end_operation == "2024/01/01 10:00:01:000" for r in released))
+        self.assertEqual(len(transactions), 0)
+
+    def test_abort_status(self) -> None:
+        transactions = TransactionAssembler()
+        transactions.begin("1", None, LSN(1), None)
+        transactions.add(record("1", 2), TABLE, LSN(1))
+        transactions.add(record("1", 3, "LOP_DELETE_ROWS"), TABLE, LSN(2))
+        list(transactions.end("1", None, "ABORT", LSN(4)))
+
+        transaction = transactions.get("1")
+        assert transaction is not None
+        self.assertEqual(transaction.status, "ABORT")
+        self.assertEqual(transaction.rows, {"INSERT": 1, "DELETE": 1})
+        self.assertEqual((transaction.begin_lsn, transaction.end_lsn), (LSN(1), LSN(4)))
+
+    def test_open_transactions_hold_the_checkpoint(self) -> None:
+        transactions = TransactionAssembler()
+        transactions.begin("1", None, LSN(2), LSN(1))
+        transactions.begin("2", None, LSN(3), LSN(2))
+        transactions.add(record("2", 4), TABLE, LSN(3))
+        transactions.add(record("1", 5), TABLE, LSN(4))
+        list(transactions.end("2", None, "COMMIT", LSN(6)))
+
+        self.assertEqual(transactions.open_since, {"1": LSN(1)})
+
+        # The records still open are handed over in LSN order when flushed
+        self.assertEqual([r.current_lsn for r in transactions.flush()], [LSN(5)])
+        self.assertEqual(transactions.open_since, {})
+
+    def test_only_the_last_completed_are_kept(self) -> None:
+        transactions = TransactionAssembler(max_completed=2)
+        for lsn, transaction_id in enumerate("123", start=1):
+            transactions.add(record(transaction_id, lsn * 10), TABLE, None)
+            list(transactions.end(transaction_id, None, "COMMIT", LSN(lsn * 10 + 1)))
+
+        self.assertEqual(list(transactions.completed), ["2", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,34 @@
 from textual.app import App, ComposeResult
 from textual.widgets import Footer, Header, Label, LoadingIndicator
 
+from .pool import DEFAULT_POOL_SIZE, ConnectionPool
 from .screens.auth import AuthScreen
 
 
 class WatcherApp(App):
+    def __init__(
+        self,
+        decode_workers: int = 0,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        stats: bool = False,
+    ) -> None:
+        """Creates the app. With more than one `decode_workers` the log is decoded in parallel.
+
+        The connections to every database are kept in a pool of up to `pool_size`, shared by every screen.
+        With `stats` every stage of the parse is timed, and shown in the Pipeline Stats tab.
+        """
+
+        super().__init__()
+        self.decode_workers = decode_workers
+        self.pool_size = pool_size
+        # A pool per watched database
+        self.pools: list[ConnectionPool] = []
+        self.collect_stats = stats
+
     def on_mount(self) -> None:
         self.app.title = "The Microsoft SQL Server Watcher"
         self.push_screen(AuthScreen())
+
+    def on_unmount(self) -> None:
+        for pool in self.pools:
+            pool.close()
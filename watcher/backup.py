@@ -0,0 +1,230 @@
+import os
+import pickle
+import tempfile
+import threading
+import typing
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import IO, ContextManager, Iterator, Optional
+
+from pymssql import Connection
+
+from .lsn import LSN, parse_lsn
+
+# fn_dump_dblog takes a start and end LSN, the device type, the backup set number and 64 file names
+DUMP_DBLOG_SOURCE = "sys.fn_dump_dblog(%s, NULL, N'DISK', 1, %s" + ", DEFAULT" * 63 + ")"
+
+# Batches of a backup file kept in memory, the ones its reader gets ahead of them are spilled to disk
+QUEUE_BATCHES = 4
+BATCH_SIZE = 5000
+
+
+class BackupSource:
+    """Reads the log records of a set of log backups (.trn/.bak) through concurrent connections."""
+
+    def __init__(
+        self,
+        files: list[str],
+        connection: typing.Callable[[], ContextManager[Connection]],
+        workers: int = 4,
+    ) -> None:
+        """Creates a source for `files`, borrowing up to `workers` connections at once with `connection`,
+        e.g. `ConnectionPool.connection`."""
+
+        self.files = files
+        self.connection = connection
+        self.workers = max(1, workers)
+        self._sorted_files: Optional[list[str]] = None
+
+    def query(
+        self, query: str, start_lsn: Optional[str], params: tuple
+    ) -> dict[str, list[tuple]]:
+        """Runs a small query (with a {source} placeholder) against every file, returns the rows of each file."""
+
+        def run(file: str) -> list[tuple]:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    query.format(source=DUMP_DBLOG_SOURCE), (start_lsn, file, *params)
+                )
+                return cursor.fetchall()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return dict(zip(self.files, executor.map(run, self.files)))
+
+    def iter_batches(
+        self, query: str, start_lsn: Optional[str], params: tuple
+    ) -> Iterator[list[tuple]]:
+        """Streams the rows of a query ordered by [Current LSN] (4th column) from every file, in LSN order.
+
+        A chain of log backups doesn't overlap, so the files are ordered by their first LSN and read
+        one after the other. Up to `workers` files are read at once: while the first one is consumed
+        the next ones are prefetched, each reader spilling what doesn't fit in memory instead of
+        waiting. Rows at or before an LSN already read, e.g. the log tail of a full backup that the
+        next log backup repeats, are dropped.
+        """
+
+        files = self._files_by_first_lsn()
+        source_query = query.format(source=DUMP_DBLOG_SOURCE)
+        readers: deque[_FileReader] = deque()
+        last_lsn: Optional[str] = None
+        next_file = 0
+
+        try:
+            while readers or next_file < len(files):
+                while next_file < len(files) and len(readers) < self.workers:
+                    readers.append(
+                        _FileReader(
+                            self.connection,
+                            source_query,
+                            (start_lsn, files[next_file], *params),
+                            files[next_file],
+                        )
+                    )
+                    next_file += 1
+
+                for rows in readers.popleft().batches():
+                    # [Current LSN] is a fixed width hex string, so it sorts as text
+                    if last_lsn is not None and rows[0][3] <= last_lsn:
+                        rows = rows[bisect_right(rows, last_lsn, key=itemgetter(3)) :]
+                        if not rows:
+                            continue
+
+                    last_lsn = rows[-1][3]
+                    yield rows
+        finally:
+            for reader in readers:
+                reader.stop()
+
+    def _files_by_first_lsn(self) -> list[str]:
+        """Sorts the files by the first LSN they contain, only done once."""
+
+        if self._sorted_files is None:
+            first_lsns = self.query("SELECT MIN([Current LSN]) FROM {source};", None, ())
+            self._sorted_files = sorted(
+                self.files,
+                key=lambda file: (
+                    parse_lsn(first_lsns[file][0][0]) if first_lsns[file] else None
+                )
+                or LSN(0),
+            )
+
+        return self._sorted_files
+
+
+class _FileReader:
+    """Reads a backup file in a background thread through its own connection.
+
+    The first QUEUE_BATCHES batches are kept in memory and the rest are spilled to a temporary
+    file, so the reader runs to the end of the file whether or not its batches are consumed.
+    """
+
+    def __init__(
+        self,
+        connection: typing.Callable[[], ContextManager[Connection]],
+        query: str,
+        params: tuple,
+        file: str,
+    ) -> None:
+        self._memory: deque[list[tuple]] = deque()
+
+        # Batches spilled and not read back yet, they are always newer than the ones in memory
+        self._spill: Optional[IO[bytes]] = None
+        self._spilled = 0
+        self._read_at = 0
+
+        self._done = False
+        self._error: Optional[Exception] = None
+        self._ready = threading.Condition()
+        self._stopped = threading.Event()
+
+        threading.Thread(
+            target=self._read, args=(connection, query, params), daemon=True, name=f"backup-{file}"
+        ).start()
+
+    def batches(self) -> Iterator[list[tuple]]:
+        """Yields the batches of the file as they are read, raises the error of the reader if any."""
+
+        try:
+            while True:
+                with self._ready:
+                    while not self._memory and not self._spilled and not self._done:
+                        self._ready.wait()
+
+                    if self._memory:
+                        rows = self._memory.popleft()
+                    elif self._spilled:
+                        rows = self._unspill()
+                    elif self._error is not None:
+                        raise self._error
+                    else:
+                        return
+
+                yield rows
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Stops reading and drops what was spilled."""
+
+        self._stopped.set()
+        with self._ready:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+            self._spilled = 0
+
+    def _read(
+        self,
+        connection: typing.Callable[[], ContextManager[Connection]],
+        query: str,
+        params: tuple,
+    ) -> None:
+        try:
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                while not self._stopped.is_set() and (rows := cursor.fetchmany(BATCH_SIZE)):
+                    self._put(rows)
+        except Exception as e:
+            with self._ready:
+                self._error = e
+        finally:
+            with self._ready:
+                self._done = True
+                self._ready.notify()
+
+    def _put(self, rows: list[tuple]) -> None:
+        with self._ready:
+            if self._stopped.is_set():
+                return
+
+            if not self._spilled and len(self._memory) < QUEUE_BATCHES:
+                self._memory.append(rows)
+            else:
+                if self._spill is None:
+                    self._spill = tempfile.TemporaryFile()
+                self._spill.seek(0, os.SEEK_END)
+                pickle.dump(rows, self._spill, protocol=pickle.HIGHEST_PROTOCOL)
+                self._spilled += 1
+
+            self._ready.notify()
+
+    def _unspill(self) -> list[tuple]:
+        """Reads back the oldest spilled batch, called with the lock held."""
+
+        spill = typing.cast(IO[bytes], self._spill)
+        spill.seek(self._read_at)
+        rows = pickle.load(spill)
+        self._read_at = spill.tell()
+        self._spilled -= 1
+
+        # Once it is read back, the file is reused from the start
+        if not self._spilled:
+            spill.seek(0)
+            spill.truncate()
+            self._read_at = 0
+
+        return rows
@@ -0,0 +1,85 @@
+import sys
+import typing
+from typing import Optional
+
+from .lsn import LSN
+
+
+def intern(value: typing.Any) -> typing.Any:
+    """Interns the strings repeated by many changes, so they are only kept once in memory."""
+
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def format_value(value: typing.Any) -> str:
+    """Text of a decoded value, binary values in their 0x form."""
+
+    if isinstance(value, bytes):
+        return f"0x{value.hex().upper()}"
+
+    return str(value)
+
+
+class Change:
+    """A decoded change of a row.
+
+    Slotted, and the values are stored as a tuple next to the column names of the table, a tuple
+    shared by every change of that table. Fields are also readable like the keys of a dict, e.g.
+    `change["table"]`, where `change["data"]` builds the {column: value} dict. `source` names the
+    database the change was read from when several are watched at once.
+    """
+
+    __slots__ = (
+        "operation",
+        "schema",
+        "table",
+        "transaction_id",
+        "begin_time",
+        "end_time",
+        "username",
+        "lsn",
+        "columns",
+        "values",
+        "source",
+    )
+
+    def __init__(
+        self,
+        operation: str,
+        schema: str,
+        table: str,
+        transaction_id: str,
+        begin_time: Optional[str],
+        end_time: Optional[str],
+        username: str,
+        lsn: LSN,
+        columns: tuple[str, ...],
+        values: tuple[typing.Any, ...],
+        source: Optional[str] = None,
+    ) -> None:
+        self.operation = operation
+        self.schema = schema
+        self.table = table
+        self.transaction_id = transaction_id
+        self.begin_time = begin_time
+        self.end_time = end_time
+        self.username = username
+        self.lsn = lsn
+        self.columns = columns
+        self.values = values
+        self.source = intern(source)
+
+    @property
+    def data(self) -> dict[str, typing.Any]:
+        """Column values of the row."""
+
+        return dict(zip(self.columns, self.values))
+
+    def __getitem__(self, key: str) -> typing.Any:
+        if key not in self.__slots__ and key != "data":
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"Change(operation={self.operation}, table={self.schema}.{self.table}, lsn={self.lsn}, data={self.data})"
@@ -0,0 +1,167 @@
+import heapq
+import typing
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from typing import Iterator, Optional
+
+from .change import Change
+from .lsn import LSN
+
+
+class ChangeIndex:
+    """Decoded changes, each with a stable integer id, also sorted by LSN for binary searches.
+
+    The id of a change is its position in `changes`, in the order they were added, so it never
+    changes and looking a change up by id is a list index. `lsns` is sorted and `ids` holds the id
+    of the change at every LSN. Changes of different sources can share an LSN, a change is only
+    a repeat of another one with the same LSN and source.
+    """
+
+    def __init__(self) -> None:
+        self.changes: list[Change] = []
+        self.lsns: list[LSN] = []
+        self.ids: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def __getitem__(self, change_id: int) -> Change:
+        return self.changes[change_id]
+
+    def __iter__(self) -> Iterator[Change]:
+        """Changes in LSN order."""
+
+        changes = self.changes
+        return (changes[change_id] for change_id in self.ids)
+
+    def add(self, change: Change) -> int:
+        """Adds a change, returns its id. A change whose LSN is already indexed keeps its id."""
+
+        lsn = change.lsn
+        if not self.lsns or lsn > self.lsns[-1]:
+            position = len(self.lsns)
+        else:
+            # Changes are released at the commit of their transaction, so older LSNs can still arrive
+            position = bisect_left(self.lsns, lsn)
+            indexed = self._find(position, lsn, change.source)
+            if indexed is not None:
+                # Already indexed, e.g. read again after resuming from a checkpoint
+                return indexed
+
+        change_id = len(self.changes)
+        self.changes.append(change)
+        self.lsns.insert(position, lsn)
+        self.ids.insert(position, change_id)
+        return change_id
+
+    def extend(self, changes: typing.Iterable[Change]) -> list[int]:
+        """Adds many changes, returns the ids of the ones that were not indexed yet.
+
+        An out of order batch is sorted on its own and merged into the index from the position of
+        its first LSN, the changes before it are left in place.
+        """
+
+        new_changes = list(changes)
+        lsns = [change.lsn for change in new_changes]
+
+        last = self.lsns[-1] if self.lsns else -1
+        if all(a < b for a, b in zip([last, *lsns], lsns)):
+            first_id = len(self.changes)
+            new_ids = list(range(first_id, first_id + len(new_changes)))
+
+            self.changes.extend(new_changes)
+            self.lsns.extend(lsns)
+            self.ids.extend(new_ids)
+            return new_ids
+
+        # Ids from first_id on stand for the position in the batch until a change is kept
+        first_id = len(self.changes)
+        batch = sorted(zip(lsns, range(first_id, first_id + len(new_changes))), key=itemgetter(0))
+        start = bisect_left(self.lsns, batch[0][0])
+
+        # The merge is stable, so the change already indexed wins when an LSN is repeated
+        merged = heapq.merge(zip(self.lsns[start:], self.ids[start:]), batch, key=itemgetter(0))
+        del self.lsns[start:]
+        del self.ids[start:]
+
+        new_ids: list[int] = []
+        for lsn, change_id in merged:
+            change = (
+                new_changes[change_id - first_id]
+                if change_id >= first_id
+                else self.changes[change_id]
+            )
+            if (
+                self.lsns
+                and lsn == self.lsns[-1]
+                and self._find_before(len(self.lsns) - 1, lsn, change.source) is not None
+            ):
+                continue
+
+            if change_id >= first_id:
+                # Ids stay dense, so a change that is kept gets the next free one
+                change_id = len(self.changes)
+                self.changes.append(change)
+                new_ids.append(change_id)
+
+            self.lsns.append(lsn)
+            self.ids.append(change_id)
+
+        return new_ids
+
+    def get(self, lsn: LSN, source: Optional[str] = None) -> Optional[Change]:
+        """The change of `source` at exactly `lsn`."""
+
+        change_id = self._find(bisect_left(self.lsns, lsn), lsn, source)
+        return self.changes[change_id] if change_id is not None else None
+
+    def _find(self, position: int, lsn: LSN, source: Optional[str]) -> Optional[int]:
+        """Id of the change of `source` at `lsn`, searching the changes at that LSN from `position` on."""
+
+        lsns = self.lsns
+        while position < len(lsns) and lsns[position] == lsn:
+            change_id = self.ids[position]
+            if self.changes[change_id].source == source:
+                return change_id
+            position += 1
+
+        return None
+
+    def _find_before(self, position: int, lsn: LSN, source: Optional[str]) -> Optional[int]:
+        """Like `_find`, searching back from `position`."""
+
+        lsns = self.lsns
+        while position >= 0 and lsns[position] == lsn:
+            change_id = self.ids[position]
+            if self.changes[change_id].source == source:
+                return change_id
+            position -= 1
+
+        return None
+
+    def seek(self, lsn: LSN) -> int:
+        """Position in LSN order of the first change at or after `lsn`."""
+
+        return bisect_left(self.lsns, lsn)
+
+    def range(
+        self, start: Optional[LSN] = None, end: Optional[LSN] = None
+    ) -> list[Change]:
+        """Changes with start <= LSN < end in LSN order, an open bound when None."""
+
+        first = bisect_left(self.lsns, start) if start is not None else 0
+        last = bisect_left(self.lsns, end) if end is not None else len(self.lsns)
+        return [self.changes[change_id] for change_id in self.ids[first:last]]
+
+    def after(self, lsn: LSN) -> list[Change]:
+        """Changes after `lsn`, e.g. the ones newer than a checkpoint."""
+
+        return [
+            self.changes[change_id] for change_id in self.ids[bisect_right(self.lsns, lsn) :]
+        ]
+
+    @staticmethod
+    def merge(*indexes: "ChangeIndex") -> Iterator[Change]:
+        """Merges the changes of several sources in LSN order."""
+
+        return heapq.merge(*indexes, key=lambda change: change.lsn)
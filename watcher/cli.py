@@ -0,0 +1,312 @@
+"""Headless export of the changes of a database, for jobs that don't need the UI.
+
+    python main.py export --server HOST --database DB [--user U --password P] [--port PORT]
+                          [--format ndjson|csv|undo|redo] [--output FILE]
+                          [--start-lsn LSN] [--end-lsn LSN] [--start-date D] [--end-date D]
+                          [--tables T1,T2] [--operations INSERT,UPDATE,DELETE]
+                          [--checkpoint [FILE]] [--decode-workers N] [--stats FILE]
+
+The changes are streamed from the parser to the output as they are decoded, so the memory used
+doesn't grow with the size of the log.
+"""
+
+import argparse
+import csv
+import json
+import pickle
+import sys
+import tempfile
+import typing
+from contextlib import nullcontext
+from functools import partial
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pymssql
+
+from .change import Change, format_value
+from .log_filter import ACTIONS, OPERATIONS, LogFilter
+from .lsn import LSN
+from .parser import ChangeEntry, Parser
+from .scripts import ScriptGenerator, stream_script
+from .stats import PipelineStats
+from .store import ChangeStore
+
+FORMATS = ("ndjson", "csv", "undo", "redo")
+
+# Fields of every exported change, the column values are exported as a JSON object in "data"
+FIELDS = (
+    "lsn",
+    "action",
+    "operation",
+    "schema",
+    "table",
+    "transaction_id",
+    "begin_time",
+    "end_time",
+    "username",
+    "data",
+)
+
+# Changes of an undo script held in memory at once, the rest are spilled to a temporary file
+UNDO_CHUNK_SIZE = 10_000
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="main.py", description="The Microsoft SQL Server Watcher")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="exporta los cambios del log sin abrir la interfaz")
+    export.add_argument("--server", required=True)
+    export.add_argument("--port", default="1433")
+    export.add_argument("--user", help="sin usuario se usa la autenticación de Windows")
+    export.add_argument("--password")
+    export.add_argument("--database", required=True)
+
+    export.add_argument("--format", choices=FORMATS, default="ndjson")
+    export.add_argument("--output", "-o", default="-", help="archivo de salida, - para stdout")
+
+    export.add_argument("--start-lsn", type=LSN.parse, help="solo los cambios después de este LSN")
+    export.add_argument("--end-lsn", type=LSN.parse, help="solo los cambios antes de este LSN")
+    export.add_argument("--start-date", default="", help="YYYY-MM-DD, inclusive")
+    export.add_argument("--end-date", default="", help="YYYY-MM-DD, inclusive")
+    export.add_argument("--tables", default="", help="schema.tabla o schema, separados por comas")
+    export.add_argument(
+        "--operations",
+        default="",
+        help=f"acciones a exportar, separadas por comas: {', '.join(OPERATIONS)}",
+    )
+
+    export.add_argument(
+        "--checkpoint",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help=(
+            "continúa desde el último checkpoint de los mismos filtros y guarda los cambios en el "
+            "almacén, el mismo que usa la interfaz a menos que se indique otro archivo"
+        ),
+    )
+    export.add_argument("--decode-workers", type=int, default=0)
+    export.add_argument("--stats", type=Path, help="guarda las estadísticas de la exportación")
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "export":
+        return export(args)
+
+    return 2
+
+
+def export(args: argparse.Namespace) -> int:
+    """Runs an export, returns the exit status."""
+
+    try:
+        log_filter = _log_filter(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    if args.user:
+        connect = partial(
+            pymssql.connect,
+            server=args.server,
+            port=args.port,
+            user=args.user,
+            password=args.password,
+            database=args.database,
+            autocommit=True,
+        )
+    else:
+        connect = partial(
+            pymssql.connect, server=args.server, database=args.database, autocommit=True
+        )
+
+    store: Optional[ChangeStore] = None
+    if args.checkpoint is not None:
+        store = (
+            ChangeStore(Path(args.checkpoint))
+            if args.checkpoint
+            else ChangeStore.for_database(args.server, args.database)
+        )
+
+    stats = PipelineStats() if args.stats else None
+
+    try:
+        conn = connect()
+    except pymssql.Error as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    parser = Parser(
+        conn.cursor(),
+        args.database,
+        log_filter=log_filter,
+        decode_workers=args.decode_workers,
+        store=store,
+        stats=stats,
+    )
+
+    try:
+        if store is not None:
+            # Resumes after what was exported before, and keeps the open transactions for the next run
+            parser.last_lsn = store.checkpoint(log_filter.key)
+            changes = parser.iter_new_changes()
+        else:
+            changes = parser.iter_changes()
+
+        with _open_output(args.output, args.format) as output:
+            count = write_changes(output, args.format, changes, parser)
+
+        print(f"{count:,} cambios exportados", file=sys.stderr)
+        if store is not None:
+            print(f"Checkpoint: {store.checkpoint(log_filter.key) or '-'}", file=sys.stderr)
+
+        if stats is not None:
+            stats.save(args.stats)
+    except (pymssql.Error, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        # Also closes the store
+        parser.close()
+        conn.close()
+
+    return 0
+
+
+def write_changes(
+    output: typing.TextIO,
+    output_format: str,
+    changes: typing.Iterable[ChangeEntry],
+    parser: Parser,
+) -> int:
+    """Writes the changes in a format, returns how many were exported.
+
+    The changes come in the order their transactions committed, which is the order a redo script
+    replays them in. An undo script reverts them from the last one to the first.
+    """
+
+    exported = _CountedChanges(change for _, _, change in changes if change.operation in ACTIONS)
+
+    if output_format == "ndjson":
+        for change in exported:
+            output.write(json.dumps(_record(change), default=format_value))
+            output.write("\n")
+    elif output_format == "csv":
+        writer = csv.writer(output)
+        writer.writerow(FIELDS)
+        for change in exported:
+            record = _record(change)
+            record["data"] = json.dumps(record["data"], default=format_value)
+            writer.writerow(record.values())
+    else:
+        # The keys of the tables are known once the parser has read the catalog
+        first = next(exported, None)
+        if first is not None:
+            generator = ScriptGenerator.for_schema(parser.schema_cache)
+            scripted = _chain_first(first, exported)
+            stream_script(
+                output,
+                generator.redo(scripted)
+                if output_format == "redo"
+                else generator.undo_newest_first(_newest_first(scripted)),
+            )
+            if generator.unscripted:
+                print(
+                    f"Script parcial: {generator.unscripted:,} cambios sin imagen de la fila "
+                    "quedaron como comentarios",
+                    file=sys.stderr,
+                )
+
+    return exported.count
+
+
+class _CountedChanges:
+    """Iterator that counts the changes that went through it."""
+
+    def __init__(self, changes: typing.Iterable[Change]) -> None:
+        self._changes = iter(changes)
+        self.count = 0
+
+    def __iter__(self) -> "_CountedChanges":
+        return self
+
+    def __next__(self) -> Change:
+        change = next(self._changes)
+        self.count += 1
+        return change
+
+
+def _chain_first(first: Change, rest: typing.Iterable[Change]) -> Iterator[Change]:
+    yield first
+    yield from rest
+
+
+def _newest_first(changes: typing.Iterable[Change]) -> Iterator[Change]:
+    """Reverses the changes, only a chunk of them is held in memory, the others wait in a temporary file."""
+
+    with tempfile.TemporaryFile() as spill:
+        offsets: list[int] = []
+        chunk: list[Change] = []
+        for change in changes:
+            chunk.append(change)
+            if len(chunk) >= UNDO_CHUNK_SIZE:
+                offsets.append(spill.tell())
+                pickle.dump(chunk, spill, protocol=pickle.HIGHEST_PROTOCOL)
+                chunk = []
+
+        yield from reversed(chunk)
+
+        for offset in reversed(offsets):
+            spill.seek(offset)
+            yield from reversed(pickle.load(spill))
+
+
+def _record(change: Change) -> dict[str, typing.Any]:
+    return {
+        "lsn": str(change.lsn),
+        "action": ACTIONS[change.operation],
+        "operation": change.operation,
+        "schema": change.schema,
+        "table": change.table,
+        "transaction_id": change.transaction_id,
+        "begin_time": change.begin_time,
+        "end_time": change.end_time,
+        "username": change.username,
+        "data": change.data,
+    }
+
+
+def _log_filter(args: argparse.Namespace) -> LogFilter:
+    """Filter of the export, pushed down into the log query like the ones of the auth screen."""
+
+    log_filter = LogFilter.from_inputs(args.start_date, args.end_date, args.tables)
+    log_filter.start_lsn = args.start_lsn
+    log_filter.end_lsn = args.end_lsn
+
+    actions = [action.strip().upper() for action in args.operations.split(",") if action.strip()]
+    unknown = [action for action in actions if action not in OPERATIONS]
+    if unknown:
+        raise ValueError(f"Acciones desconocidas: {', '.join(unknown)}")
+    if actions:
+        log_filter.operations = LogFilter.operations_for(actions)
+
+    return log_filter
+
+
+def _open_output(path: str, output_format: str) -> typing.ContextManager[typing.TextIO]:
+    """The output file, or stdout for "-", which is left open."""
+
+    # The csv module writes its own line endings
+    newline = "" if output_format == "csv" else None
+    if path == "-":
+        if newline is not None:
+            typing.cast(typing.Any, sys.stdout).reconfigure(newline=newline)
+        return nullcontext(sys.stdout)
+
+    return open(path, "w", encoding="utf-8", newline=newline, buffering=1 << 20)
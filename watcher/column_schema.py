@@ -10,3 +10,4 @@ class ColumnSchema:
     DATETIME_PRECISION: int
     NUMERIC_SCALE: int
     CHARACTER_OCTET_LENGTH: int
+    ORDINAL_POSITION: int = 0
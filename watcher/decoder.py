@@ -0,0 +1,420 @@
+import struct
+import sys
+import threading
+import typing
+from dataclasses import astuple
+from datetime import date, datetime, time, timedelta
+from decimal import Context, Decimal
+from typing import Optional
+
+from .column_schema import ColumnSchema
+
+# Types that are put to the end of the RowLog because of their variable size.
+VARIABLE_LENGTH_TYPES = ("varchar", "nvarchar", "nchar")
+
+# A converter reads one column value from the row image at the given offset.
+Converter = typing.Callable[[memoryview, int], typing.Any]
+
+# A variable converter reads a column value from its slice of the row image.
+VariableConverter = typing.Callable[[memoryview], typing.Any]
+
+# Holds the 38 digits of the widest decimal, the default context rounds to 28
+_DECIMAL_CONTEXT = Context(prec=38)
+
+# Called with the data type of a value that could not be decoded, the value is left as None.
+ErrorHandler = typing.Callable[[str], None]
+
+# Status bits A flags
+_HAS_NULL_BITMAP = 0x10
+_HAS_VARIABLE_COLUMNS = 0x20
+
+# The high bit of a variable column offset flags complex (off-row) columns
+_OFFSET_MASK = 0x7FFF
+
+_unpack_ushort = struct.Struct("<H").unpack_from
+
+_offset_structs: dict[int, typing.Callable[[memoryview, int], tuple[int, ...]]] = {}
+
+
+def _unpack_offsets(count: int) -> typing.Callable[[memoryview, int], tuple[int, ...]]:
+    """Returns an unpacker for a variable offset array of the given length."""
+
+    unpack = _offset_structs.get(count)
+    if unpack is None:
+        unpack = struct.Struct(f"<{count}H").unpack_from
+        _offset_structs[count] = unpack
+
+    return unpack
+
+
+def _ignore_error(data_type: str) -> None:
+    pass
+
+
+_DATETIME_EPOCH = datetime(1900, 1, 1)
+
+
+class TableDecoder:
+    """Decoding plan for the rows of a table, compiled once from its schema."""
+
+    def __init__(
+        self, table_schema: list[ColumnSchema], on_error: Optional[ErrorHandler] = None
+    ) -> None:
+        """Compiles the fixed offsets and converters of every column.
+
+        `on_error` is told the data type of every value that fails to decode.
+        """
+
+        self.columns = table_schema
+        on_error = on_error or _ignore_error
+
+        # Data types of the columns that are skipped because they can't be decoded
+        self.skipped: list[str] = []
+
+        # (column name, offset from the start of the row, converter, null bitmap mask)
+        self.fixed: list[tuple[str, int, Converter, int]] = []
+
+        # (column name, converter, null bitmap mask), in the order of the variable offset array
+        self.variable: list[tuple[str, VariableConverter, int]] = []
+
+        # Skip status bits A and B (1 byte each) and the fixed data length (2 bytes)
+        offset = 4
+        for idx, col in enumerate(table_schema):
+            data_type = col.DATA_TYPE.lower()
+
+            # The null bitmap has one bit per column, in column id order
+            null_mask = 1 << ((col.ORDINAL_POSITION or idx + 1) - 1)
+
+            if data_type in VARIABLE_LENGTH_TYPES:
+                self.variable.append(
+                    (col.COLUMN_NAME, _compile_variable_column(data_type), null_mask)
+                )
+                continue
+
+            size, converter = _compile_fixed_column(col, data_type, on_error)
+            if converter is not None:
+                self.fixed.append((col.COLUMN_NAME, offset, converter, null_mask))
+            else:
+                self.skipped.append(data_type)
+
+            offset += size
+
+        # Names of the decoded values, shared by every row of the table instead of repeated as dict keys
+        self.names: tuple[str, ...] = tuple(
+            sys.intern(name) for name, *_ in (*self.fixed, *self.variable)
+        )
+
+        self.fixed_size = offset
+
+    def decode(self, data: bytes) -> dict[str, typing.Any]:
+        """Decodes a row image into a dict of column values."""
+
+        return dict(zip(self.names, self.decode_values(data)))
+
+    def decode_values(self, data: bytes) -> tuple[typing.Any, ...]:
+        """Decodes a row image in a single pass without copying it, the values are in the order of `names`."""
+
+        view = memoryview(data)
+        size = len(view)
+        if size < self.fixed_size:
+            raise ValueError(
+                f"Row image of {size} bytes is shorter than the fixed data ({self.fixed_size} bytes)"
+            )
+
+        status = view[0]
+
+        # The column count is stored right after the fixed data
+        (column_count_offset,) = _unpack_ushort(view, 2)
+        if column_count_offset + 2 > size:
+            raise ValueError("Offset al número de columnas fuera del rango de datos.")
+
+        (total_columns,) = _unpack_ushort(view, column_count_offset)
+        position = column_count_offset + 2
+
+        null_bits = 0
+        if status & _HAS_NULL_BITMAP:
+            null_bitmap_size = (total_columns + 7) // 8
+            null_bits = int.from_bytes(
+                view[position : position + null_bitmap_size], "little"
+            )
+            position += null_bitmap_size
+
+        values = [
+            None if null_bits & null_mask else convert(view, offset)
+            for _, offset, convert, null_mask in self.fixed
+        ]
+
+        if not self.variable:
+            return tuple(values)
+
+        variable_offsets: tuple[int, ...] = ()
+        if status & _HAS_VARIABLE_COLUMNS and position + 2 <= size:
+            (variable_column_count,) = _unpack_ushort(view, position)
+            position += 2
+            variable_offsets = _unpack_offsets(variable_column_count)(view, position)
+            position += variable_column_count * 2
+
+        # Each entry of the offset array is the end of its column, the next one starts there
+        start = position
+        variable_column_count = len(variable_offsets)
+        for idx, (_, convert, null_mask) in enumerate(self.variable):
+            if idx >= variable_column_count:
+                # Trailing NULL columns are left out of the offset array
+                values.append(None)
+                continue
+
+            end = variable_offsets[idx] & _OFFSET_MASK
+            values.append(None if null_bits & null_mask else convert(view[start:end]))
+
+            start = end
+
+        return tuple(values)
+
+
+class DecoderCache:
+    """Compiled decoding plans shared by several parsers, keyed by the columns of the table.
+
+    Databases with the same tables, e.g. one per tenant, compile every plan once. Parsers in
+    different threads look plans up concurrently.
+    """
+
+    def __init__(self, on_error: Optional[ErrorHandler] = None) -> None:
+        """Creates an empty cache whose plans tell `on_error` of the values that fail to decode."""
+
+        self.on_error = on_error
+        self._decoders: dict[tuple[tuple[typing.Any, ...], ...], TableDecoder] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._decoders)
+
+    def get(self, table_schema: list[ColumnSchema]) -> TableDecoder:
+        """Returns the plan of a table schema, compiling it only for columns not seen before."""
+
+        signature = tuple(astuple(col) for col in table_schema)
+        with self._lock:
+            decoder = self._decoders.get(signature)
+            if decoder is None:
+                decoder = TableDecoder(table_schema, on_error=self.on_error)
+                self._decoders[signature] = decoder
+
+        return decoder
+
+
+def _compile_fixed_column(
+    col: ColumnSchema, data_type: str, on_error: ErrorHandler
+) -> tuple[int, Optional[Converter]]:
+    """Returns the size in bytes of a fixed length column and its converter, None for an unhandled type."""
+
+    if data_type == "int":
+        return 4, _unpack("<i")
+
+    if data_type == "smallint":
+        return 2, _unpack("<h")
+
+    if data_type == "tinyint":
+        return 1, _unpack("<B")
+
+    if data_type == "bigint":
+        return 8, _unpack("<q")
+
+    if data_type == "real":
+        unpack_real = struct.Struct("<f").unpack_from
+        return 4, lambda view, offset: float(
+            format(unpack_real(view, offset)[0], ".7g")
+        )
+
+    if data_type == "float":
+        unpack_float = struct.Struct("<d").unpack_from
+        return 8, lambda view, offset: float(
+            format(unpack_float(view, offset)[0], ".15g")
+        )
+
+    if "decimal" in data_type or data_type == "numeric":
+        return _compile_decimal(col)
+
+    if data_type == "char":
+        length = _required_length(col)
+        return length, lambda view, offset: str(
+            view[offset : offset + length], "latin1"
+        ).strip()
+
+    # money is an integer count of ten-thousandths
+    if data_type == "money":
+        unpack_money = struct.Struct("<q").unpack_from
+        return 8, lambda view, offset: Decimal(unpack_money(view, offset)[0]).scaleb(
+            -4, _DECIMAL_CONTEXT
+        )
+
+    if data_type == "smallmoney":
+        unpack_smallmoney = struct.Struct("<i").unpack_from
+        return 4, lambda view, offset: Decimal(
+            unpack_smallmoney(view, offset)[0]
+        ).scaleb(-4, _DECIMAL_CONTEXT)
+
+    if data_type == "date":
+        return 3, _date_converter(on_error)
+
+    if data_type == "time":
+        return _compile_time(col, on_error)
+
+    if data_type == "datetime":
+        return 8, _datetime_converter(on_error)
+
+    if data_type == "smalldatetime":
+        return 4, _decode_smalldatetime
+
+    if data_type == "binary":
+        length = _required_length(col)
+        return length, lambda view, offset: bytes(view[offset : offset + length])
+
+    if data_type in ("rowversion", "timestamp"):
+        return 8, lambda view, offset: bytes(view[offset : offset + 8])
+
+    return 4, None
+
+
+def _compile_variable_column(data_type: str) -> VariableConverter:
+    """Returns the converter of a variable length column."""
+
+    if data_type in ("nvarchar", "nchar"):
+        return lambda chunk: str(chunk, "utf-16-le", "replace").strip()
+
+    return lambda chunk: try_decode(bytes(chunk)).strip()
+
+
+def try_decode(data: bytes) -> str:
+    """
+    Detecta automáticamente la codificación de los datos.
+    Decodifica en UTF-8 primero, pero si encuentra un patrón típico de UTF-16, cambia a UTF-16.
+    """
+
+    if all(data[i] == 0 for i in range(1, len(data), 2)):
+        try:
+            return data.decode("utf-16", errors="strict")
+        except UnicodeDecodeError:
+            pass
+
+    try:
+        return data.decode("utf-8", errors="strict")
+    except UnicodeDecodeError:
+        return data.decode("utf-8", errors="replace")
+
+
+def _unpack(fmt: str) -> Converter:
+    """Converter for a column stored as a single struct value."""
+
+    unpack_from = struct.Struct(fmt).unpack_from
+    return lambda view, offset: unpack_from(view, offset)[0]
+
+
+def _required_length(col: ColumnSchema) -> int:
+    length = col.CHARACTER_MAXIMUM_LENGTH
+    if length is None:
+        raise ValueError(f"No se pudo determinar la longitud de {col.COLUMN_NAME}")
+
+    return length
+
+
+def _compile_decimal(col: ColumnSchema) -> tuple[int, Converter]:
+    precision = col.NUMERIC_PRECISION
+    scale = col.NUMERIC_SCALE
+
+    if precision is None or scale is None:
+        raise ValueError(f"Precisión o escala no definida para {col.COLUMN_NAME}")
+
+    # Sign byte followed by the integer value, its length depends on the precision
+    if precision <= 9:
+        size = 5
+    elif precision <= 19:
+        size = 9
+    elif precision <= 28:
+        size = 13
+    else:
+        size = 17
+
+    # Scaled as a Decimal, a float can't hold every value of a wide decimal
+    exponent = -scale
+
+    def convert(view: memoryview, offset: int) -> Decimal:
+        value = int.from_bytes(view[offset + 1 : offset + size], "little")
+
+        # The sign byte is 1 for positive values and 0 for negative ones
+        if not view[offset]:
+            value = -value
+
+        return Decimal(value).scaleb(exponent, _DECIMAL_CONTEXT)
+
+    return size, convert
+
+
+def _compile_time(col: ColumnSchema, on_error: ErrorHandler) -> tuple[int, Converter]:
+    precision = col.DATETIME_PRECISION
+    if precision is None:
+        precision = 7
+
+    if precision <= 2:
+        size = 3
+    elif precision <= 4:
+        size = 4
+    else:
+        size = 5
+
+    # Ticks are stored in units of 10^-precision seconds
+    scale_factor = 10 ** (7 - precision)
+
+    def convert(view: memoryview, offset: int) -> Optional[str]:
+        ticks = int.from_bytes(view[offset : offset + size], "little") * scale_factor
+
+        try:
+            seconds, remainder = divmod(ticks, 10**7)
+            minutes, second = divmod(seconds, 60)
+            hour, minute = divmod(minutes, 60)
+            decoded_time = time(hour, minute, second, remainder // 10)
+        except ValueError:
+            on_error("time")
+            return None
+
+        return decoded_time.isoformat(timespec="microseconds")
+
+    return size, convert
+
+
+def _date_converter(on_error: ErrorHandler) -> Converter:
+    def convert(view: memoryview, offset: int) -> Optional[str]:
+        days = int.from_bytes(view[offset : offset + 3], "little")
+
+        try:
+            # Days since 0001-01-01, which is ordinal 1
+            return date.fromordinal(days + 1).isoformat()
+        except ValueError:
+            on_error("date")
+            return None
+
+    return convert
+
+
+_unpack_datetime = struct.Struct("<Ii").unpack_from
+
+
+def _datetime_converter(on_error: ErrorHandler) -> Converter:
+    def convert(view: memoryview, offset: int) -> Optional[str]:
+        # Ticks are 1/300 of a second since midnight, days are since 1900-01-01
+        ticks, days = _unpack_datetime(view, offset)
+
+        if not (0 <= days <= 366000):
+            on_error("datetime")
+            return None
+
+        decoded_datetime = _DATETIME_EPOCH + timedelta(days=days, seconds=ticks // 300)
+        return decoded_datetime.strftime("%Y-%m-%d %H:%M:%S")
+
+    return convert
+
+
+_unpack_smalldatetime = struct.Struct("<HH").unpack_from
+
+
+def _decode_smalldatetime(view: memoryview, offset: int) -> datetime:
+    minutes, days = _unpack_smalldatetime(view, offset)
+    return _DATETIME_EPOCH + timedelta(days=days, minutes=minutes)
@@ -0,0 +1,196 @@
+import typing
+from bisect import insort
+from typing import Optional
+
+from .change import Change
+from .change_index import ChangeIndex
+from .log_filter import ACTIONS
+from .schema_cache import SchemaCache
+
+# (source, schema, table), the same table of different databases has different rows
+SourceTable = tuple[Optional[str], str, str]
+
+# (table, values of the primary key, or of the whole row when the table has no key)
+RowKey = tuple[SourceTable, tuple[typing.Any, ...]]
+
+
+class RowHistory:
+    """Index from every row, by table and primary key, to the ids of the changes made to it.
+
+    Kept up to date as changes are added, so the history of a row is a dict lookup. The ids of a
+    row are kept in LSN order. An update is indexed under the keys of its old and new images, which
+    links the history of a row whose key was changed.
+    """
+
+    def __init__(
+        self,
+        changes: ChangeIndex,
+        schema_cache: Optional[SchemaCache] = None,
+        schema_caches: Optional[dict[Optional[str], SchemaCache]] = None,
+    ) -> None:
+        """Creates the history of the changes of `changes`, with the keys of `schema_cache`.
+
+        The changes of a source in `schema_caches` use the keys of its own cache instead.
+        """
+
+        self.changes = changes
+        self.schema_cache = schema_cache
+        self.schema_caches = schema_caches if schema_caches is not None else {}
+
+        self._rows: dict[RowKey, list[int]] = {}
+
+        # Ids of the changes of every table, to index it again when its key is loaded or changed
+        self._ids_by_table: dict[SourceTable, list[int]] = {}
+        self._keys_used: dict[SourceTable, tuple[str, ...]] = {}
+
+        # Positions of the key in the column names of a table, per (names, key)
+        self._positions: dict[tuple[tuple[str, ...], tuple[str, ...]], Optional[list[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, change_ids: typing.Iterable[int]) -> None:
+        """Indexes changes that were added to the change index."""
+
+        changes = self.changes.changes
+        rows = self._rows
+
+        # Key of every table and positions of the key in its values, looked up once per call
+        tables: dict[
+            tuple[Optional[str], str, str, tuple[str, ...]],
+            tuple[SourceTable, tuple[str, ...], Optional[list[int]]],
+        ] = {}
+
+        for change_id in change_ids:
+            change = changes[change_id]
+            action = ACTIONS.get(change.operation)
+            if action is None:
+                continue
+
+            known = tables.get((change.source, change.schema, change.table, change.columns))
+            if known is None:
+                table = (change.source, change.schema, change.table)
+                primary_key = self._primary_key(table)
+                if self._keys_used.setdefault(table, primary_key) != primary_key:
+                    self._reindex(table, primary_key)
+
+                known = (table, primary_key, self._key_positions(change.columns, primary_key))
+                tables[(change.source, change.schema, change.table, change.columns)] = known
+
+            table, primary_key, positions = known
+            self._ids_by_table.setdefault(table, []).append(change_id)
+
+            if action == "UPDATE" or positions is None:
+                self._index(change_id, change, table, primary_key)
+                continue
+
+            # Inserts and deletes, the common case, are indexed inline
+            values = change.values
+            key = (table, tuple([values[position] for position in positions]))
+            ids = rows.get(key)
+            if ids is None:
+                rows[key] = [change_id]
+            elif change.lsn > changes[ids[-1]].lsn:
+                ids.append(change_id)
+            else:
+                self._index(change_id, change, table, primary_key)
+
+    def history(self, change_id: int) -> list[int]:
+        """Ids of every change of the row (or rows) changed by a change, in LSN order."""
+
+        change = self.changes[change_id]
+        table = (change.source, change.schema, change.table)
+
+        ids: set[int] = set()
+        for key in self._row_keys(change, table, self._keys_used.get(table, ())):
+            ids.update(self._rows.get(key, ()))
+
+        return sorted(ids, key=lambda history_id: self.changes[history_id].lsn)
+
+    def _primary_key(self, table: SourceTable) -> tuple[str, ...]:
+        """Columns that identify a row: the primary key, or every column of a table without one."""
+
+        schema_cache = self.schema_caches.get(table[0], self.schema_cache)
+        if schema_cache is None:
+            return ()
+
+        primary_key = schema_cache.primary_keys.get((table[1], table[2]))
+        if primary_key:
+            return tuple(primary_key)
+
+        # In the table's column order, so inserts, deletes and both images of an update agree
+        columns = schema_cache.tables.get((table[1], table[2]), [])
+        return tuple(column.COLUMN_NAME for column in columns)
+
+    def _index(
+        self, change_id: int, change: Change, table: SourceTable, primary_key: tuple[str, ...]
+    ) -> None:
+        lsn = change.lsn
+        for key in self._row_keys(change, table, primary_key):
+            ids = self._rows.get(key)
+            if ids is None:
+                self._rows[key] = [change_id]
+            elif lsn > self.changes[ids[-1]].lsn:
+                ids.append(change_id)
+            else:
+                # Changes are released at the commit of their transaction, so older LSNs can still arrive
+                insort(ids, change_id, key=lambda history_id: self.changes[history_id].lsn)
+
+    def _reindex(self, table: SourceTable, primary_key: tuple[str, ...]) -> None:
+        """Indexes the changes of a table again, e.g. when its key was loaded after they were added."""
+
+        self._keys_used[table] = primary_key
+        for key in [key for key in self._rows if key[0] == table]:
+            del self._rows[key]
+
+        for change_id in self._ids_by_table.get(table, []):
+            self._index(change_id, self.changes[change_id], table, primary_key)
+
+    def _row_keys(
+        self, change: Change, table: SourceTable, primary_key: tuple[str, ...]
+    ) -> list[RowKey]:
+        if ACTIONS.get(change.operation) != "UPDATE":
+            positions = self._key_positions(change.columns, primary_key)
+            if positions is None:
+                return []
+
+            values = change.values
+            return [(table, tuple(values[position] for position in positions))]
+
+        keys: list[RowKey] = []
+        data = change.data
+        for image in (data.get("old"), data.get("new")):
+            if not image:
+                continue
+
+            if not primary_key:
+                # Columns unknown, the images are decoded in the same order as inserted rows
+                key = (table, tuple(image.values()))
+            elif all(column in image for column in primary_key):
+                key = (table, tuple(image[column] for column in primary_key))
+            else:
+                continue
+
+            if key not in keys:
+                keys.append(key)
+
+        return keys
+
+    def _key_positions(
+        self, columns: tuple[str, ...], primary_key: tuple[str, ...]
+    ) -> Optional[list[int]]:
+        """Positions of the key in the values of a change, None when some key column is missing."""
+
+        cache_key = (columns, primary_key)
+        if cache_key not in self._positions:
+            if not primary_key:
+                # Without a key, the whole row identifies it
+                positions: Optional[list[int]] = list(range(len(columns)))
+            elif all(column in columns for column in primary_key):
+                positions = [columns.index(column) for column in primary_key]
+            else:
+                positions = None
+
+            self._positions[cache_key] = positions
+
+        return self._positions[cache_key]
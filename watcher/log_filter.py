@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .change import Change
+from .lsn import LSN
+
+# Log operations of every kind of change shown in the Dashboard
+OPERATIONS = {
+    "INSERT": ("LOP_INSERT_ROWS",),
+    "UPDATE": ("LOP_MODIFY_ROW", "LOP_MODIFY_COLUMNS"),
+    "DELETE": ("LOP_DELETE_ROWS",),
+}
+
+# Action (INSERT, UPDATE, DELETE) of every log operation
+ACTIONS = {
+    operation: action for action, operations in OPERATIONS.items() for operation in operations
+}
+
+
+def log_time(value: Optional[datetime]) -> Optional[str]:
+    """Formats a datetime like the [Begin Time] column of fn_dblog, which is compared as a string."""
+
+    return value.strftime("%Y/%m/%d %H:%M:%S:000") if value else None
+
+
+@dataclass
+class LogFilter:
+    """Filters that are pushed down into the transaction log query."""
+
+    # Only the changes made in [start_time, end_time)
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+
+    # Log operations to read, every operation when None
+    operations: Optional[tuple[str, ...]] = None
+
+    # Allow-list of tables as schema.table, or whole schemas as schema
+    tables: Optional[list[str]] = None
+
+    # Only the records after start_lsn and before end_lsn
+    start_lsn: Optional[LSN] = None
+    end_lsn: Optional[LSN] = None
+
+    def matches_table(self, schema_name: str, table_name: str) -> bool:
+        """Whether a table is in the allow-list."""
+
+        if self.tables is None:
+            return True
+
+        return (
+            schema_name.lower() in self.tables
+            or f"{schema_name}.{table_name}".lower() in self.tables
+        )
+
+    @property
+    def key(self) -> str:
+        """Identifies the filter in the store, which keeps a checkpoint for every filter."""
+
+        if self == LogFilter():
+            return ""
+
+        return "|".join(
+            [
+                log_time(self.start_time) or "",
+                log_time(self.end_time) or "",
+                ",".join(sorted(self.operations)) if self.operations is not None else "*",
+                ",".join(sorted(self.tables)) if self.tables is not None else "*",
+                str(self.start_lsn) if self.start_lsn is not None else "",
+                str(self.end_lsn) if self.end_lsn is not None else "",
+            ]
+        )
+
+    def matches(self, change: Change) -> bool:
+        """Whether a change read back from the store passes the filter, as if it was pushed down."""
+
+        if self.operations is not None and change.operation not in self.operations:
+            return False
+
+        if not self.matches_table(change.schema, change.table):
+            return False
+
+        if self.start_lsn is not None and change.lsn <= self.start_lsn:
+            return False
+
+        if self.end_lsn is not None and change.lsn >= self.end_lsn:
+            return False
+
+        # [Begin Time] is fixed width, so it compares like the time it holds
+        begin_time = change.begin_time or ""
+        start, end = log_time(self.start_time), log_time(self.end_time)
+        if start is not None and begin_time < start:
+            return False
+
+        return end is None or begin_time < end
+
+    @classmethod
+    def from_inputs(
+        cls, start_date: str, end_date: str, tables: str
+    ) -> "LogFilter":
+        """Builds a filter from the date (YYYY-MM-DD, both inclusive) and table inputs of the auth screen."""
+
+        start_time = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+        end_time = datetime.strptime(end_date, "%Y-%m-%d") if end_date else None
+
+        # The end date is inclusive, so the window ends when the next day starts
+        if end_time:
+            end_time += timedelta(days=1)
+
+        allowed_tables = [
+            table.strip().lower() for table in tables.split(",") if table.strip()
+        ]
+
+        return cls(
+            start_time=start_time,
+            end_time=end_time,
+            tables=allowed_tables or None,
+        )
+
+    @staticmethod
+    def operations_for(actions: list[str]) -> tuple[str, ...]:
+        """Log operations of the given INSERT/UPDATE/DELETE actions."""
+
+        return tuple(
+            operation for action in actions for operation in OPERATIONS[action]
+        )
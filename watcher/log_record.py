@@ -1,7 +1,10 @@
 from dataclasses import dataclass
+from typing import Optional
 
+from .lsn import LSN
 
-@dataclass
+
+@dataclass(slots=True)
 class LogRecord:
     operation: str
     context: str
@@ -9,10 +12,34 @@ class LogRecord:
     alloc_unit: str
     raw_data: bytes
     raw_data2: bytes
-    begin_operation: str
-    end_operation: str
+    begin_operation: Optional[str]
+    end_operation: Optional[str]
     username: str
-    current_lsn: str
+    current_lsn: LSN
+    alloc_unit_id: int
+    partition_id: int
+
+    # Location of the row, and for LOP_MODIFY_ROW the range of bytes that changed
+    page_id: Optional[str] = None
+    slot_id: Optional[int] = None
+    offset_in_row: Optional[int] = None
+    modify_size: Optional[int] = None
+
+    # Full images of an updated row, rebuilt from the last known image of its slot
+    before_image: Optional[bytes] = None
+    after_image: Optional[bytes] = None
+
+    @property
+    def images(self) -> tuple[bytes, ...]:
+        """Row images to decode: the row of an insert or a delete, the row before and after an update."""
+
+        if self.before_image is not None and self.after_image is not None:
+            return self.before_image, self.after_image
+
+        if self.operation in ("LOP_INSERT_ROWS", "LOP_DELETE_ROWS"):
+            return (self.raw_data,)
+
+        return ()
 
     def __str__(self) -> str:
         return f"LogRecord(operation={self.operation}, context={self.context}, transaction_id={self.transaction_id}, alloc_unit={self.alloc_unit}, raw_data={self.raw_data}, raw_data2={self.raw_data2})"
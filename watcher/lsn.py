@@ -0,0 +1,67 @@
+import typing
+from typing import Optional
+
+# Bits of every part of an LSN once packed, the slot takes the lowest ones
+_BLOCK_BITS = 32
+_SLOT_BITS = 16
+
+_SLOT_MASK = (1 << _SLOT_BITS) - 1
+_BLOCK_MASK = (1 << _BLOCK_BITS) - 1
+
+
+class LSN(int):
+    """A log sequence number packed into a single int, so LSNs sort and compare as numbers.
+
+    The VLF sequence number takes the highest bits, then the log block and the slot in the block.
+    `str()` gives back the 0000002a:00000010:0001 form of the [Current LSN] column.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, value: str) -> "LSN":
+        """Parses a [Current LSN] like 0000002a:00000010:0001."""
+
+        vlf, block, slot = value.split(":")
+        return cls(
+            int(vlf, 16) << (_BLOCK_BITS + _SLOT_BITS)
+            | int(block, 16) << _SLOT_BITS
+            | int(slot, 16)
+        )
+
+    @classmethod
+    def parse_many(cls, values: typing.Iterable[str]) -> list["LSN"]:
+        """Parses a column of LSNs at once."""
+
+        # Every part is fixed width hex, so dropping the separators leaves the packed number
+        return [cls(int(value.replace(":", ""), 16)) for value in values]
+
+    @property
+    def vlf(self) -> int:
+        return self >> (_BLOCK_BITS + _SLOT_BITS)
+
+    @property
+    def block(self) -> int:
+        return (self >> _SLOT_BITS) & _BLOCK_MASK
+
+    @property
+    def slot(self) -> int:
+        return self & _SLOT_MASK
+
+    @property
+    def decimal(self) -> str:
+        """The 42:16:1 form fn_dblog and fn_dump_dblog accept as start and end LSN."""
+
+        return f"{self.vlf}:{self.block}:{self.slot}"
+
+    def __str__(self) -> str:
+        return f"{self.vlf:08x}:{self.block:08x}:{self.slot:04x}"
+
+    def __repr__(self) -> str:
+        return f"LSN('{self}')"
+
+
+def parse_lsn(value: Optional[str]) -> Optional[LSN]:
+    """Parses an LSN read from the log or the store, which may be NULL."""
+
+    return LSN.parse(value) if value else None
@@ -0,0 +1,135 @@
+import multiprocessing
+import threading
+import time
+import typing
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterator, Optional
+
+from .column_schema import ColumnSchema
+from .decoder import TableDecoder
+from .schema_cache import TableKey
+from .stats import DISABLED, PipelineStats
+
+# Rows sent to a worker at once, big enough to amortize the pickling of the batch
+CHUNK_SIZE = 2000
+
+# Decoding plans compiled in each worker process, reused by every batch it receives. They are keyed
+# by the id of the plan in the parent, so tables with the same name in different databases don't
+# replace each other
+_worker_decoders: dict[int, TableDecoder] = {}
+
+# Decode errors by data type of the batch being decoded in the worker process
+_worker_errors: Counter[str] = Counter()
+
+
+def _count_error(data_type: str) -> None:
+    _worker_errors[data_type] += 1
+
+
+def decode_rows(
+    plans: dict[int, list[ColumnSchema]],
+    rows: list[tuple[int, tuple[bytes, ...]]],
+) -> tuple[list[tuple[tuple[typing.Any, ...], ...]], dict[str, int], float]:
+    """Decodes the row images of a batch of records inside a worker process, see `TableDecoder.decode_values`.
+
+    The values of every image of a record are returned together, or () when one of them fails,
+    along with the decode errors by data type and the seconds spent decoding.
+    """
+
+    started = time.perf_counter()
+    _worker_errors.clear()
+
+    for plan_id, table_schema in plans.items():
+        decoder = _worker_decoders.get(plan_id)
+        if decoder is None or decoder.columns != table_schema:
+            _worker_decoders[plan_id] = TableDecoder(table_schema, on_error=_count_error)
+
+    decoded: list[tuple[tuple[typing.Any, ...], ...]] = []
+    for plan_id, images in rows:
+        decoder = _worker_decoders[plan_id]
+        try:
+            decoded.append(tuple(decoder.decode_values(data) for data in images))
+        except ValueError:
+            _worker_errors["row"] += 1
+            decoded.append(())
+
+    return decoded, dict(_worker_errors), time.perf_counter() - started
+
+
+class ParallelDecoder:
+    """Decodes row images in a pool of worker processes, keeping the order they were submitted in."""
+
+    def __init__(self, workers: int, stats: PipelineStats = DISABLED) -> None:
+        """Creates a decoder with `workers` processes, started on first use.
+
+        The time spent decoding in the workers and their decode errors are added to `stats`. The
+        processes can be shared by parsers running in different threads.
+        """
+
+        self.workers = workers
+        self.stats = stats
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def map(
+        self,
+        batches: typing.Iterable[list[tuple[TableKey, TableDecoder, typing.Any]]],
+    ) -> Iterator[
+        tuple[tuple[TableKey, TableDecoder, typing.Any], tuple[tuple[typing.Any, ...], ...]]
+    ]:
+        """Decodes (table, decoder, item) batches, yielding each entry with its decoded values in the same order.
+
+        The item must have an `images` attribute, the values of each image are yielded together. Up
+        to two chunks per worker are kept in flight, so the next batches are fetched while the
+        previous ones are being decoded.
+        """
+
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that runs the UI threads is unsafe, spawn clean interpreters instead
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            executor = self._executor
+
+        in_flight: deque[
+            tuple[list[tuple[TableKey, TableDecoder, typing.Any]], Future]
+        ] = deque()
+
+        for batch in batches:
+            for start in range(0, len(batch), CHUNK_SIZE):
+                chunk = batch[start : start + CHUNK_SIZE]
+
+                plans = {id(decoder): decoder.columns for _, decoder, _ in chunk}
+                rows = [(id(decoder), item.images) for _, decoder, item in chunk]
+                in_flight.append((chunk, executor.submit(decode_rows, plans, rows)))
+
+                while len(in_flight) > self.workers * 2:
+                    yield from self._collect(*in_flight.popleft())
+
+        while in_flight:
+            yield from self._collect(*in_flight.popleft())
+
+    def _collect(
+        self, chunk: list[tuple[TableKey, TableDecoder, typing.Any]], future: Future
+    ) -> Iterator[
+        tuple[tuple[TableKey, TableDecoder, typing.Any], tuple[tuple[typing.Any, ...], ...]]
+    ]:
+        decoded, errors, seconds = future.result()
+        if self.stats.enabled:
+            size = sum(len(data) for _, _, item in chunk for data in item.images)
+            self.stats.add("decode", seconds, len(chunk), size)
+            self.stats.merge_errors(errors)
+
+        yield from zip(chunk, decoded)
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
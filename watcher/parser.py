@@ -1,601 +1,864 @@
+import time
 import typing
-import struct
-from datetime import datetime, timedelta, time
-from typing import Optional
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import chain
+from datetime import datetime
+from typing import Iterator, Optional
 
+import pymssql
 from pymssql import Cursor
 
+from .change import Change, intern
 from .log_record import LogRecord
+from .backup import BackupSource
 from .column_schema import ColumnSchema
+from .decoder import DecoderCache, TableDecoder, try_decode
+from .log_filter import LogFilter, log_time
+from .lsn import LSN
+from .parallel import ParallelDecoder
+from .pool import ConnectionPool
+from .row_state import RowStateCache
+from .schema_cache import SchemaCache, TableKey
+from .stats import DISABLED, PipelineStats
+from .store import ChangeStore
+from .transactions import TransactionAssembler
+
+TRANSACTION_END_OPERATIONS = ("LOP_COMMIT_XACT", "LOP_ABORT_XACT")
+
+# Operations whose row image is decoded
+DECODED_OPERATIONS = (
+    "LOP_INSERT_ROWS",
+    "LOP_DELETE_ROWS",
+    "LOP_MODIFY_ROW",
+    "LOP_MODIFY_COLUMNS",
+)
+
+# Operations that move the rows of a page, followed to rebuild the images of updated rows
+ROW_STATE_OPERATIONS = (*DECODED_OPERATIONS, "LOP_EXPUNGE_ROWS")
+
+# Error of fn_dblog when its start LSN is not in the active log anymore
+INVALID_LOG_SCAN = 9003
+
+# Columns of the decoded value of an update
+UPDATE_COLUMNS = (intern("old"), intern("new"))
+
+# Bounds of the fetchmany batches, they grow or shrink to take around FETCH_TARGET_SECONDS each
+MIN_FETCH_SIZE = 100
+INITIAL_FETCH_SIZE = 1000
+MAX_FETCH_SIZE = 20000
+FETCH_TARGET_SECONDS = 0.2
+
+# Changes written to the store at once
+STORE_BATCH_SIZE = 1000
+
+# (operation, schema.table, change)
+ChangeEntry = tuple[str, str, Change]
+
+# A batch of a progressive parse is handed over once it has this many changes or is this old
+PROGRESS_BATCH_SIZE = 2000
+PROGRESS_BATCH_SECONDS = 0.5
+
+
+@dataclass
+class ParseProgress:
+    """Counters of a parse, read by the UI while the parser runs in a worker thread."""
+
+    # Log records read and changes decoded
+    fetched: int = 0
+    decoded: int = 0
+
+    started: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = (self.finished_at or time.perf_counter()) - self.started
+        return self.decoded / elapsed if elapsed > 0 else 0.0
 
 
 class Parser:
     CURSOR: Optional[Cursor] = None
     """Class that parses the transaction log."""
 
-    def __init__(self, cursor: Cursor, database: str = "sachen") -> None:
-        """Creates a new parser for the specified database."""
+    def __init__(
+        self,
+        cursor: Optional[Cursor],
+        database: str = "sachen",
+        schema_cache: Optional[SchemaCache] = None,
+        log_filter: Optional[LogFilter] = None,
+        decode_workers: int = 0,
+        log_source: Optional[BackupSource] = None,
+        store: Optional[ChangeStore] = None,
+        pool: Optional[ConnectionPool] = None,
+        stats: Optional[PipelineStats] = None,
+        source: Optional[str] = None,
+        decoders: Optional[DecoderCache] = None,
+        parallel_decoder: Optional[ParallelDecoder] = None,
+    ) -> None:
+        """Creates a new parser for the specified database.
+
+        The cursor, and the connections of the pool, must be connected to `database`.
+
+        With more than one `decode_workers` the row images are decoded in a pool of processes. With a
+        `log_source` the records are read from log backups instead of the online log, the cursor is
+        still used for the catalog. With a `store` the changes are persisted and a new parser resumes
+        from the last checkpoint. With a `pool` and no cursor, every scan borrows a cursor from the pool.
+        With `stats` every stage of the parse is timed and counted.
+
+        When several databases are watched at once, `source` names this one in its changes, and the
+        parsers can share their compiled `decoders` and a `parallel_decoder`, which is then left open
+        by `close`.
+        """
 
         self.CURSOR = cursor
+        self.pool = pool
         self.database = database
+        self.source = source
+        self.schema_cache = schema_cache or SchemaCache.for_database(database)
+        self.log_filter = log_filter or LogFilter()
+        self.log_source = log_source
+        self.store = store
+        self.stats = stats or DISABLED
+        self.decoders = (
+            decoders if decoders is not None else DecoderCache(on_error=self.stats.decode_error)
+        )
+
+        # Decoding plans of the table schemas used so far, keyed by the id of the schema
+        self._decoders: dict[int, tuple[list[ColumnSchema], TableDecoder]] = {}
+        self._schema: Optional[dict[TableKey, list[ColumnSchema]]] = None
+
+        # Table and decoding plan of every allocation unit, so a record needs a single lookup
+        self._alloc_units: dict[int, tuple[TableKey, TableDecoder]] = {}
+
+        # Allocation units of the nonclustered indexes, LOB and row-overflow pages of the tables
+        self._skipped_alloc_units: set[int] = set()
+
+        # Set when a record belongs to an allocation unit created after the catalog was read
+        self._catalog_stale = False
+
+        # High-water mark of the log, the next poll only reads the records after it
+        self.last_lsn: Optional[LSN] = None
+
+        # LSN bounds of the time window of the filter, resolved once and completed by later polls,
+        # the times they were resolved for, and the last begin LSN the resolution has seen
+        self._window: tuple[Optional[LSN], Optional[LSN]] = (None, None)
+        self._window_times: Optional[tuple[Optional[datetime], Optional[datetime]]] = None
+        self._window_scanned: Optional[LSN] = None
+
+        # Records of the transactions that have not finished yet, and summaries of the finished ones
+        self.transactions = TransactionAssembler()
+
+        # Last known image of the rows changed in the log, kept between polls
+        self._row_states = RowStateCache()
+
+        self.fetch_size = INITIAL_FETCH_SIZE
+        self.progress = ParseProgress()
+
+        self._owns_parallel_decoder = parallel_decoder is None
+        if parallel_decoder is None and decode_workers > 1:
+            parallel_decoder = ParallelDecoder(decode_workers, self.stats)
+        self._parallel_decoder = parallel_decoder
+
+    def _iter_batches(self) -> Iterator[list[tuple]]:
+        """Yields the rows of the last executed query in adaptively sized batches."""
 
-    def _fetch_table_schema(self) -> dict[str, list[ColumnSchema]]:
-        """Fetches the schema of the table. Sorts the column in how is it expected to be in the transaction log."""
+        if not self.CURSOR:
+            return
+
+        while True:
+            started = time.perf_counter()
+            rows = self.CURSOR.fetchmany(self.fetch_size)
+            elapsed = time.perf_counter() - started
+
+            if not rows:
+                return
+
+            self.stats.add("fetch", elapsed, len(rows))
+            yield rows
+
+            # Grow the batches while fetching is cheap, shrink them when a batch takes too long
+            if elapsed < FETCH_TARGET_SECONDS / 2:
+                self.fetch_size = min(self.fetch_size * 2, MAX_FETCH_SIZE)
+            elif elapsed > FETCH_TARGET_SECONDS:
+                self.fetch_size = max(self.fetch_size // 2, MIN_FETCH_SIZE)
+
+    def _get_decoder(self, table_schema: list[ColumnSchema]) -> TableDecoder:
+        """Returns the decoding plan of a table schema, compiling it only the first time."""
+
+        known = self._decoders.get(id(table_schema))
+        if known is not None and known[0] is table_schema:
+            return known[1]
+
+        decoder = self.decoders.get(table_schema)
+        self._decoders[id(table_schema)] = (table_schema, decoder)
+
+        if decoder.skipped:
+            self.stats.count("skipped_columns", len(decoder.skipped))
+
+        return decoder
+
+    def _fetch_table_schema(self) -> dict[TableKey, list[ColumnSchema]]:
+        """Fetches the schema of every table. Sorts the column in how is it expected to be in the transaction log."""
         if not self.CURSOR:
             return {}
 
-        self.CURSOR.execute(f"USE {self.database}")
-        self.CURSOR.execute(
-            "SELECT DISTINCT TABLE_NAME FROM INFORMATION_SCHEMA.COLUMNS;"
+        # Not saving the cache only means the next session reads the catalog again
+        return self.schema_cache.load(
+            self.CURSOR, lambda _: self.stats.count("schema_cache_write_errors")
         )
-        tables: dict[str, list[ColumnSchema]] = {}
 
-        for row in self.CURSOR.fetchall():
-            table_name: str = row[0]
-            self.CURSOR.execute(
-                f"""SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, DATETIME_PRECISION, NUMERIC_SCALE, CHARACTER_OCTET_LENGTH
-FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = '{table_name}';"""
-            )
+    def _iter_transaction_log(
+        self, start_lsn: Optional[LSN] = None, flush_open: bool = True
+    ) -> Iterator[list[LogRecord]]:
+        """Streams the transaction log in a single scan, resolving the transaction times on the client.
 
-            if table_name not in tables:
-                tables[table_name] = []
-
-            # Types that are put to the end of the RowLog because of their variable size.
-            final_types = []
-            for column_row in self.CURSOR.fetchall():
-                (
-                    column_name,
-                    data_type,
-                    char_max_length,
-                    numeric_precision,
-                    datetime_precision,
-                    numeric_scale,
-                    char_octet_length,
-                ) = column_row
-
-                if data_type in ["varchar", "nvarchar", "nchar"]:
-                    final_types.append(
-                        ColumnSchema(
-                            COLUMN_NAME=column_name,
-                            DATA_TYPE=data_type,
-                            NUMERIC_PRECISION=numeric_precision,
-                            DATETIME_PRECISION=datetime_precision,
-                            NUMERIC_SCALE=numeric_scale,
-                            CHARACTER_MAXIMUM_LENGTH=char_max_length,
-                            CHARACTER_OCTET_LENGTH=char_octet_length,
-                        )
-                    )
-                else:
-                    if data_type == "decimal":
-                        t = f"decimal({numeric_precision},{numeric_scale})"
-                        print(t)
-                        tables[table_name].append(
-                            ColumnSchema(
-                                COLUMN_NAME=column_name,
-                                DATA_TYPE=t,
-                                NUMERIC_PRECISION=numeric_precision,
-                                DATETIME_PRECISION=datetime_precision,
-                                NUMERIC_SCALE=numeric_scale,
-                                CHARACTER_MAXIMUM_LENGTH=char_max_length,
-                                CHARACTER_OCTET_LENGTH=char_octet_length,
-                            )
-                        )
-                        continue
-
-                    tables[table_name].append(
-                        ColumnSchema(
-                            COLUMN_NAME=column_name,
-                            DATA_TYPE=data_type,
-                            NUMERIC_PRECISION=numeric_precision,
-                            DATETIME_PRECISION=datetime_precision,
-                            NUMERIC_SCALE=numeric_scale,
-                            CHARACTER_MAXIMUM_LENGTH=char_max_length,
-                            CHARACTER_OCTET_LENGTH=char_octet_length,
-                        )
-                    )
-
-            tables[table_name].extend(final_types)
-
-        return tables
-
-    def _fetch_transaction_log(self) -> list[LogRecord]:
+        Records are held back until the commit or abort of their transaction is read, then they are
+        yielded in batches. When `start_lsn` is given only the records after it are read. Unless
+        `flush_open` is True, the transactions still open at the end are kept for the next call.
+        """
         if (not self.CURSOR) or (not self.database):
-            return []
-
-        self.CURSOR.execute(f"USE {self.database};")
-
-        self.CURSOR.execute(
-            """SELECT 
-    log.[Operation], -- Operación exacta
-    log.[Context], -- Contexto de la operación
-    log.[Transaction ID] AS [TransactionID], -- ID de la transacción
-    log.[Current LSN] AS [CurrentLSN], -- Log Sequence Number actual
-    log.[Previous LSN] AS [PreviousLSN], -- Log Sequence Number previo
-    log.[AllocUnitName] AS [Schema_Object], -- Esquema y objeto afectado
-    log.[RowLog Contents 0], -- Contenido del log (parte 0)
-    log.[RowLog Contents 1], -- Contenido del log (parte 1)
-    log.[RowLog Contents 2], -- Contenido del log (parte 2)
-    log.[RowLog Contents 3], -- Contenido del log (parte 3)
-    begin_log.[Begin Time] AS [BeginTime], -- Tiempo de inicio de la transacción
-    end_log.[Begin Time] AS [EndTime], -- Tiempo aproximado de finalización de la transacción
-    SUSER_SNAME() AS [UserName] -- Usuario ejecutor (de la sesión actual)    AND log.[AllocUnitName] NOT LIKE 'MS%' -- Excluir objetos de Microsoft
-
-FROM sys.fn_dblog(NULL, NULL) log -- Logs principales
-LEFT JOIN sys.fn_dblog(NULL, NULL) begin_log
-    ON log.[Transaction ID] = begin_log.[Transaction ID]
-    AND begin_log.[Operation] = 'LOP_BEGIN_XACT' -- Identifica el inicio de la transacción
-LEFT JOIN sys.fn_dblog(NULL, NULL) end_log
-    ON log.[Transaction ID] = end_log.[Transaction ID]
-    AND end_log.[Operation] IN ('LOP_COMMIT_XACT', 'LOP_ABORT_XACT') -- Identifica el final de la transacción
+            return
+
+        # Changes outside of the time window are never read
+        window = self._time_window_lsns()
+        if window is None:
+            return
+
+        window_start, window_end = window
+        start_lsn = max(filter(None, (start_lsn, self.log_filter.start_lsn)), default=None)
+        window_end = min(filter(None, (window_end, self.log_filter.end_lsn)), default=None)
+        scan_start = max(filter(None, (start_lsn, window_start)), default=None)
+
+        data_predicates, data_params = self._data_predicates()
+
+        query = f"""SELECT 
+    [Operation], -- Operación exacta
+    [Context], -- Contexto de la operación
+    [Transaction ID] AS [TransactionID], -- ID de la transacción
+    [Current LSN] AS [CurrentLSN], -- Log Sequence Number actual
+    [Previous LSN] AS [PreviousLSN], -- Log Sequence Number previo
+    [AllocUnitName] AS [Schema_Object], -- Esquema y objeto afectado
+    [RowLog Contents 0], -- Contenido del log (parte 0)
+    [RowLog Contents 1], -- Contenido del log (parte 1)
+    [RowLog Contents 2], -- Contenido del log (parte 2)
+    [RowLog Contents 3], -- Contenido del log (parte 3)
+    [Begin Time] AS [BeginTime], -- Tiempo de inicio (solo en LOP_BEGIN_XACT)
+    [End Time] AS [EndTime], -- Tiempo de finalización (solo en LOP_COMMIT_XACT / LOP_ABORT_XACT)
+    SUSER_SNAME() AS [UserName], -- Usuario ejecutor (de la sesión actual)
+    [AllocUnitId], -- Unidad de asignación afectada
+    [PartitionId], -- Partición afectada
+    [Page ID] AS [PageID], -- Página de la fila
+    [Slot ID] AS [SlotID], -- Posición de la fila en la página
+    [Offset in Row] AS [OffsetInRow], -- Inicio de los bytes modificados (LOP_MODIFY_ROW)
+    [Modify Size] AS [ModifySize] -- Cantidad de bytes modificados (LOP_MODIFY_ROW)
+
+FROM {{source}} -- Un solo recorrido del log, desde el LSN inicial
 WHERE 
-    log.[AllocUnitName] IS NOT NULL -- Ignorar registros sin nombre de unidad de asignación
-    AND log.[AllocUnitName] NOT LIKE 'sys%' -- Excluir objetos del sistema
-    AND log.[AllocUnitName] NOT LIKE 'Unknown Alloc Unit%' -- Excluir asignaciones desconocidas
-ORDER BY log.[Current LSN];
+    (%s IS NULL OR [Current LSN] > %s) -- El LSN inicial ya fue leído
+    AND (%s IS NULL OR [Current LSN] < %s) -- Fin de la ventana de tiempo
+    AND (
+        [Operation] IN ('LOP_BEGIN_XACT', 'LOP_COMMIT_XACT', 'LOP_ABORT_XACT') -- Inicio y fin de las transacciones
+        OR ({data_predicates})
+    )
+ORDER BY [Current LSN];
 """
+        # [Current LSN] is compared as the fixed width hex string it is stored as
+        start = str(start_lsn) if start_lsn is not None else None
+        end = str(window_end) if window_end is not None else None
+        params = (start, start, end, end, *data_params)
+
+        batches = self._iter_log_rows(
+            query, scan_start.decimal if scan_start is not None else None, params
         )
 
-        logs: list[LogRecord] = []
-        for row in self.CURSOR.fetchall():
-            logs.append(
-                LogRecord(
-                    operation=row[0],
-                    context=row[1],
-                    transaction_id=row[2],
-                    alloc_unit=row[5],
+        # Kept between polls for the transactions still open
+        transactions = self.transactions
+        alloc_units = self._alloc_units
+        skipped_alloc_units = self._skipped_alloc_units
+        operations = self.log_filter.operations
+
+        for rows in batches:
+            started = time.perf_counter()
+            finished: list[LogRecord] = []
+            self.progress.fetched += len(rows)
+
+            for row, current_lsn in zip(rows, LSN.parse_many([row[3] for row in rows])):
+                operation = intern(row[0])
+                transaction_id = intern(row[2])
+                previous_lsn = self.last_lsn
+                self.last_lsn = current_lsn
+
+                if operation == "LOP_BEGIN_XACT":
+                    transactions.begin(transaction_id, intern(row[10]), current_lsn, previous_lsn)
+                    continue
+
+                if operation in TRANSACTION_END_OPERATIONS:
+                    status = "COMMIT" if operation == "LOP_COMMIT_XACT" else "ABORT"
+                    for record in transactions.end(transaction_id, row[11], status, current_lsn):
+                        finished.append(record)
+
+                        # A long transaction is handed over in parts
+                        if len(finished) >= MAX_FETCH_SIZE:
+                            self.stats.add("assemble", time.perf_counter() - started)
+                            yield finished
+                            finished = []
+                            started = time.perf_counter()
+                    continue
+
+                # Index entries and LOB pages are not rows of the table
+                if row[13] in skipped_alloc_units:
+                    continue
+
+                record = LogRecord(
+                    operation=operation,
+                    context=intern(row[1]),
+                    transaction_id=transaction_id,
+                    alloc_unit=intern(row[5]),
                     raw_data=row[6],
                     raw_data2=row[7],
-                    begin_operation=row[10],
-                    end_operation=row[11],
-                    username=row[12],
-                    current_lsn=row[3],
+                    begin_operation=transactions.begin_time(transaction_id),
+                    end_operation=None,
+                    username=intern(row[12]),
+                    current_lsn=current_lsn,
+                    alloc_unit_id=row[13],
+                    partition_id=row[14],
+                    page_id=row[15],
+                    slot_id=row[16],
+                    offset_in_row=row[17],
+                    modify_size=row[18],
                 )
-            )
 
-        return logs
+                # The rows of a page are followed in LSN order, before the records are grouped by transaction
+                if operation in ROW_STATE_OPERATIONS:
+                    self._track_row_state(record)
+
+                if operations is not None and operation not in operations:
+                    continue
+
+                table = alloc_units.get(record.alloc_unit_id)
+                transactions.add(
+                    record,
+                    f"{table[0][0]}.{table[0][1]}" if table else record.alloc_unit,
+                    previous_lsn,
+                )
+
+            self.stats.add("assemble", time.perf_counter() - started, len(rows))
+            if finished:
+                yield finished
+
+        if flush_open and len(transactions):
+            yield transactions.flush()
+
+    def _track_row_state(self, record: LogRecord) -> None:
+        """Follows the rows of a page, and rebuilds the full images of a row updated with LOP_MODIFY_ROW."""
+
+        page_id, slot_id = record.page_id, record.slot_id
+        if page_id is None or slot_id is None:
+            return
+
+        row_states = self._row_states
+        operation = record.operation
+
+        # The slots of a heap page stay put, the ones of an index page are kept in key order
+        heap = record.context == "LCX_HEAP"
+
+        if operation == "LOP_INSERT_ROWS":
+            row_states.insert(page_id, slot_id, record.raw_data, shift=not heap)
+        elif operation == "LOP_DELETE_ROWS":
+            # A ghosted row keeps its slot until the ghost cleanup expunges it
+            row_states.delete(
+                page_id, slot_id, shift=not heap and record.context != "LCX_MARK_AS_GHOST"
+            )
+        elif operation == "LOP_EXPUNGE_ROWS":
+            row_states.delete(page_id, slot_id, shift=True)
+        elif operation == "LOP_MODIFY_ROW" and record.offset_in_row is not None:
+            images = row_states.modify(
+                page_id,
+                slot_id,
+                record.offset_in_row,
+                record.raw_data or b"",
+                record.raw_data2 or b"",
+            )
+            if images is not None:
+                record.before_image, record.after_image = images
+        else:
+            # The ranges of LOP_MODIFY_COLUMNS are not applied, so the image is no longer known
+            row_states.forget(page_id, slot_id)
 
     def parse_bytes(
         self, data: bytes, table_schema: list[ColumnSchema]
     ) -> dict[str, typing.Any]:
         """Parse a raw byte array."""
 
-        # Skip first bytes
-        useful_data = data[4:]
-
-        operation_data: dict[str, typing.Any] = {}
-        for idx, col in enumerate(table_schema):
-            data_type = col.DATA_TYPE
-            column_name = col.COLUMN_NAME
-
-            if col.DATA_TYPE not in ["varchar", "nvarchar", "nchar"]:
-                if data_type.lower() == "int":
-                    value = int.from_bytes(useful_data[:4], "little")
-                    operation_data[column_name] = value
-                    useful_data = useful_data[4:]
-
-                elif data_type.lower() == "smallint":
-                    value = int.from_bytes(useful_data[:2], "little")
-                    operation_data[column_name] = value
-                    useful_data = useful_data[2:]
-
-                elif data_type.lower() == "tinyint":
-                    value = int.from_bytes(useful_data[:1], "little")
-                    operation_data[column_name] = value
-                    useful_data = useful_data[1:]
-
-                elif data_type.lower() == "bigint":
-                    value = int.from_bytes(useful_data[:8], "little")
-                    operation_data[column_name] = value
-                    useful_data = useful_data[8:]
-
-                elif data_type.lower() == "real":
-                    value = struct.unpack("<f", useful_data[:4])[0]
-                    exact_value = format(value, ".7g")
-                    operation_data[column_name] = float(exact_value)
-                    useful_data = useful_data[4:]
-
-                elif data_type.lower() == "float":
-                    value = struct.unpack("<d", useful_data[:8])[0]
-                    exact_value = format(value, ".15g")
-                    operation_data[column_name] = float(exact_value)
-                    useful_data = useful_data[8:]
-
-                elif "decimal" in data_type.lower() or data_type.lower() == "numeric":
-                    # Obtener precisión y escala desde el esquema
-                    precision = col.NUMERIC_PRECISION
-                    scale = col.NUMERIC_SCALE
-
-                    if precision is None or scale is None:
-                        raise ValueError(
-                            f"Precisión o escala no definida para {column_name}"
-                        )
-
-                    # Determinar la longitud según la precisión
-                    if precision <= 9:
-                        bytes_for_value = 5
-                    elif precision <= 19:
-                        bytes_for_value = 9
-                    elif precision <= 28:
-                        bytes_for_value = 13
-                    else:
-                        bytes_for_value = 17
-
-                    # Leer los bytes binarios para el valor
-                    raw_value = useful_data[1:bytes_for_value]
-                    is_negative = useful_data[0] & 0x80 != 0
-                    value = int.from_bytes(raw_value, byteorder="little")
-                    if is_negative:
-                        value = -value
-
-                    # Aplicar escala
-                    operation_data[column_name] = value / (10**scale)
-                    useful_data = useful_data[bytes_for_value:]
-
-                elif data_type.lower() == "char":
-                    # Determinar la longitud exacta
-
-                    # * ver aca el data_type y cosas asi (esto es nota1)
-                    length_in_bytes = next(
-                        (
-                            col.CHARACTER_MAXIMUM_LENGTH
-                            for col in table_schema
-                            if col.COLUMN_NAME == column_name
-                        ),
-                        None,
-                    )
-
-                    if length_in_bytes is None:
-                        raise ValueError(
-                            f"No se pudo determinar la longitud de {column_name}"
-                        )
-                    val = useful_data[:length_in_bytes].decode("latin1").strip()
-                    operation_data[column_name] = val
-
-                    useful_data = useful_data[length_in_bytes:]
-
-                elif data_type.lower() == "money":
-                    val = struct.unpack("<q", useful_data[:8])[0] / 10000.0
-                    operation_data[column_name] = val
-                    useful_data = useful_data[8:]
-
-                elif data_type.lower() == "smallmoney":
-                    value = struct.unpack("<i", useful_data[:4])[0] / 10000.0
-                    operation_data[column_name] = value
-                    useful_data = useful_data[4:]
-
-                elif data_type.lower() == "date":
-                    try:
-                        days = int.from_bytes(
-                            useful_data[:3],
-                            "little",
-                        )
-                        if not (-693593 <= days <= 2958465):
-                            raise ValueError(
-                                f"[date] El valor de 'days' está fuera de rango: {days}"
-                            )
-                        value = datetime(1, 1, 1) + timedelta(days=days)
-
-                        formatted_date = value.strftime("%Y-%m-%d")
-                        operation_data[column_name] = formatted_date
-                    except ValueError as e:
-                        print(f"Error decodificando date para {column_name}: {e}")
-                        operation_data[column_name] = None
-                    finally:
-                        useful_data = useful_data[3:]
-
-                elif data_type.lower() == "time":
-                    tick_bytes = 3  # Valor por defecto si algo falla
-                    datetimeprecision = col.DATETIME_PRECISION
-                    try:
-                        # Validar si datetimeprecision es válido
-                        if datetimeprecision is None:
-                            raise ValueError(
-                                f"No se pudo obtener la precisión para la columna {column_name}"
-                            )
-
-                        # Calcular el número de bytes necesarios según la precisión
-                        tick_bytes = 3 + (datetimeprecision // 2)
-                        if len(useful_data) < tick_bytes:
-                            raise ValueError(
-                                f"Se requieren al menos {tick_bytes} bytes para TIME con precisión {datetimeprecision}"
-                            )
-
-                        # Extraer los ticks desde los bytes
-                        ticks = int.from_bytes(
-                            useful_data[:tick_bytes],
-                            "little",
-                        )
-
-                        # Ajustar los ticks a precisión máxima usando datetimeprecision
-                        scale_factor = 10 ** (
-                            7 - datetimeprecision
-                        )  # Escalar a la precisión máxima
-                        ticks *= scale_factor
-
-                        # Convertir ticks a segundos
-                        time_seconds = ticks / 10**7  # Ticks están en 1/10^7 segundos
-
-                        # Calcular horas, minutos, segundos y microsegundos
-                        hours = int(time_seconds // 3600)
-                        minutes = int((time_seconds % 3600) // 60)
-                        seconds = int(time_seconds % 60)
-                        microseconds = int((time_seconds - int(time_seconds)) * 1e6)
-
-                        decoded_time = time(
-                            hour=hours,
-                            minute=minutes,
-                            second=seconds,
-                            microsecond=microseconds,
-                        )
-
-                        formatted_time = decoded_time.strftime("%H:%M:%S.%f")
-                        operation_data[column_name] = formatted_time
-
-                    except Exception as e:
-                        print(f"Error decodificando TIME para {column_name}: {e}")
-                        operation_data[column_name] = None
-
-                    finally:
-                        # Asegurar que avanzamos el puntero, incluso si ocurre un error
-                        useful_data = useful_data[tick_bytes:]
-
-                elif data_type.lower() == "datetime":
-                    try:
-                        # Validar que haya al menos 8 bytes para DATETIME
-                        if len(useful_data) < 8:
-                            raise ValueError(
-                                f"Se requieren al menos 8 bytes para DATETIME, se encontraron {len(useful_data)} bytes."
-                            )
-
-                        # Leer días y ticks
-                        ticks = int.from_bytes(
-                            useful_data[:4],
-                            "little",
-                        )
-                        days = int.from_bytes(
-                            useful_data[4:8],
-                            "little",
-                        )
-
-                        # Validar rango de días
-                        if not (0 <= days <= 366000):  # Asegurar un rango razonable
-                            raise ValueError(f"Días fuera de rango: {days}")
-
-                        # Calcular la fecha y hora
-                        date = datetime(1900, 1, 1) + timedelta(days=days)
-                        time_seconds = ticks / 300  # Ticks son 1/300 de segundo
-                        hours = int(time_seconds // 3600)
-                        minutes = int((time_seconds % 3600) // 60)
-                        seconds = int(time_seconds % 60)
-                        milliseconds = int((time_seconds - int(time_seconds)) * 1000)
-
-                        # Crear el objeto datetime
-                        decoded_datetime = datetime.combine(
-                            date, datetime.min.time()
-                        ) + timedelta(
-                            hours=hours,
-                            minutes=minutes,
-                            seconds=seconds,
-                            milliseconds=milliseconds,
-                        )
-                        formatted_datetime = decoded_datetime.strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        )
-                        operation_data[column_name] = formatted_datetime
-
-                    except Exception as e:
-                        print(f"Error decodificando DATETIME para {column_name}: {e}")
-                        operation_data[column_name] = None
-
-                    finally:
-                        useful_data = useful_data[8:]
-
-                elif data_type.lower() == "smalldatetime":
-                    minutes = int.from_bytes(useful_data[:2], "little")
-                    days = int.from_bytes(useful_data[2:4], "little")
-
-                    # Validar rango de días
-                    if not (0 <= days <= 65535):
-                        raise ValueError(
-                            f"[smalldatetime] El valor de 'days' está fuera de rango: {days}"
-                        )
-
-                    # Calcular fecha y hora
-                    date = datetime(1900, 1, 1) + timedelta(days=days)
-                    hours = minutes // 60
-                    remaining_minutes = minutes % 60
-
-                    # Combinar fecha y hora
-                    smalldatetime_value = datetime.combine(
-                        date, datetime.min.time()
-                    ) + timedelta(hours=hours, minutes=remaining_minutes)
-                    operation_data[column_name] = smalldatetime_value
-                    useful_data = useful_data[4:]
-
-                elif data_type.lower() == "nchar":
-                    length_in_bytes = next(
-                        (
-                            col.CHARACTER_MAXIMUM_LENGTH
-                            for col in table_schema
-                            if col.COLUMN_NAME == column_name
-                        ),
-                        None,
-                    )
-
-                    if length_in_bytes is None:
-                        raise ValueError(
-                            f"No se pudo determinar la longitud de {column_name}"
-                        )
-                    val = useful_data[:length_in_bytes].decode(
-                        "utf-16le", errors="ignore"
-                    )
-                    operation_data[column_name] = val.strip()
-
-                    useful_data = useful_data[length_in_bytes:]
-
-                elif data_type.lower() == "binary":
-                    length_in_bytes = next(
-                        (
-                            col.CHARACTER_MAXIMUM_LENGTH
-                            for col in table_schema
-                            if col.COLUMN_NAME == column_name
-                        ),
-                        None,
-                    )
-                    if length_in_bytes is None:
-                        raise ValueError(
-                            f"No se pudo determinar la longitud de {column_name}"
-                        )
-
-                    new_val = useful_data[:length_in_bytes]
-                    hex_representation = f"0x{new_val.hex().upper()}"
-                    operation_data[column_name] = hex_representation
-                    useful_data = useful_data[length_in_bytes:]
-
-                elif data_type.lower() == "rowversion":
-                    val = useful_data[:8].hex().upper()
-                    operation_data[column_name] = value
-                    useful_data = useful_data[8:]
-                else:
-                    print(f"Tipo no manejado: {data_type}")
-                    useful_data = useful_data[4:]
-
-        # ================================================================================
-        #                       Parse now variable length columns
-        # ================================================================================
-
-        # Filter only the variable length columns from the table schema
-        variable_colummns = filter(
-            lambda col: col.DATA_TYPE in ["varchar", "nvarchar", "nchar"],
-            table_schema,
-        )
+        decoder = self._get_decoder(table_schema)
+        return dict(zip(decoder.names, self._decode_row(decoder, data)))
 
-        # Declare here the dictionary to store the offsets so we can use the same offsets for the next column
-        variable_offsets: dict[int, int] = {}
+    def _decode_row(self, decoder: TableDecoder, data: bytes) -> tuple[typing.Any, ...]:
+        try:
+            return decoder.decode_values(data)
+        except ValueError:
+            self.stats.decode_error("row")
+            return ()
 
-        for idx, (col) in enumerate(variable_colummns):
+    def _decode_images(
+        self, decoder: TableDecoder, images: tuple[bytes, ...]
+    ) -> tuple[tuple[typing.Any, ...], ...]:
+        """Values of every image of a record, () when one of them fails to decode."""
 
-            column_name = col.COLUMN_NAME
-            data_type = col.DATA_TYPE
+        try:
+            return tuple(decoder.decode_values(data) for data in images)
+        except ValueError:
+            self.stats.decode_error("row")
+            return ()
 
-            raw = data  # Reset everything to the start of the data
+    def parse_online_transaction_log(self, dispose: bool = True) -> dict[str, typing.Any]:
+        """Just parse it. NOTE: Disposes the Cursor unless `dispose` is False, which is needed to `poll` later."""
 
-            # This offset represents the start position of the columns from the start of the data
-            column_offset = int.from_bytes(raw[2:4], "little")
+        if not self.connected:
+            return {}
 
-            if column_offset >= len(raw):
-                print("Error: Offset al número de columnas fuera del rango de datos.")
-                return {}
+        parsed_transactions = self._group_changes(self._initial_changes())
 
-            # The amount of columns is located 2 bytes after the column offset
-            total_columns = int.from_bytes(
-                raw[column_offset : column_offset + 2], "little"
-            )
+        if dispose:
+            self.close()
 
-            print(f"Column count: {total_columns}")
+        return parsed_transactions
 
-            # Calculate the amount of columns that have a variable size
-            null_bitmap_size = (total_columns + 7) // 8
-            variable_column_count_offset = column_offset + 2 + null_bitmap_size
+    def iter_parsed_batches(self) -> Iterator[dict[str, typing.Any]]:
+        """Parses the log like `parse_online_transaction_log`, yielding the grouped changes batch by batch.
 
-            # The amount of columns that have a variable size is located 2 bytes after the variable column count offset
-            variable_column_count = int.from_bytes(
-                raw[variable_column_count_offset : variable_column_count_offset + 2],
-                "little",
-            )
+        Batches are handed over as soon as they are decoded, so a caller in a worker thread can show
+        them while the rest of the log is read. `progress` is updated meanwhile. The cursor is kept open.
+        """
 
-            print(f"Variable column count: {variable_column_count}")
+        self.progress = ParseProgress()
+        if not self.connected:
+            self.progress.finish()
+            return
 
-            variable_data_start = (
-                variable_column_count_offset + 2 + variable_column_count * 2
-            )
+        batch: list[ChangeEntry] = []
+        handed_over = time.perf_counter()
+        for change in self._initial_changes():
+            batch.append(change)
 
-            offset_start = variable_column_count_offset + 2  # Here is where data starts
+            if (
+                len(batch) >= PROGRESS_BATCH_SIZE
+                or time.perf_counter() - handed_over >= PROGRESS_BATCH_SECONDS
+            ):
+                yield self._group_changes(batch)
+                batch = []
+                handed_over = time.perf_counter()
 
-            for i in range(variable_column_count):
-                start_pos = offset_start + (i * 2)
-                var_offset = int.from_bytes(raw[start_pos : start_pos + 2], "little")
+        if batch:
+            yield self._group_changes(batch)
 
-                variable_offsets[i] = var_offset
+        self.progress.finish()
 
-            print("Variable offsets:", variable_offsets)
+    def _initial_changes(self) -> Iterator[ChangeEntry]:
+        """Every change of the first parse."""
 
-            last_offset = variable_offsets.get(idx - 1)
-            start = last_offset if last_offset else variable_data_start
-            end = variable_offsets[idx] if idx < len(variable_offsets) else len(raw)
+        if self.store is None:
+            return self.iter_changes()
 
-            print(f"Start: {start}, End: {end}")
+        # What was already stored is shown right away, only the records after the checkpoint are read
+        checkpoint = self.store.checkpoint(self.log_filter.key)
+        self.last_lsn = checkpoint
 
-            data_chunk = raw[start:end]
-            decoded_value = self.try_decode(data_chunk)
-            operation_data[column_name] = decoded_value.strip()
+        stored: Iterator[ChangeEntry] = self.store.iter_changes(source=self.source)
+        if self.log_filter != LogFilter():
+            # The store also has the changes read with other filters
+            stored = (change for change in stored if self.log_filter.matches(change[2]))
 
-        return operation_data
+        # The transactions still open are kept for the next poll, storing them now would move the
+        # checkpoint past them
+        return chain(
+            stored,
+            self._store_changes(self.iter_changes(start_lsn=checkpoint, flush_open=False)),
+        )
 
-    def parse_online_transaction_log(self) -> dict[str, typing.Any]:
-        """Just parse it. NOTE: Disposes the Cursor"""
+    def close(self) -> None:
+        """Disposes the cursor and stops the decoding processes."""
 
-        if (not self.CURSOR) or (not self.database):
-            return {}
+        if self.CURSOR:
+            self.CURSOR.close()
 
-        schema = self._fetch_table_schema()
-        log = self._fetch_transaction_log()
+        if self._parallel_decoder is not None and self._owns_parallel_decoder:
+            self._parallel_decoder.close()
 
-        parsed_transactions: dict[str, typing.Any] = {}
-        for record in log:
-            # Parse the table name from alloc_unit
-            # dbo.Something.[...]
+        if self.store is not None:
+            self.store.close()
 
-            # Realistically, nobody is naming a table with a dot in the name.
-            # If you are one of those, consider yourself an opp 🫵
-            # - JH, 2024
-            table_name = record.alloc_unit.split(".")[1]
-            table_schema = schema.get(table_name, [])
+    def poll(self) -> dict[str, typing.Any]:
+        """Parses only the records written to the log since the last fetch."""
 
-            if not table_schema:
-                raise TypeError(f"Table {table_name} not found in schema.")
+        return self._group_changes(self.iter_new_changes())
 
-            if (
-                record.operation == "LOP_INSERT_ROWS"
-                or record.operation == "LOP_DELETE_ROWS"
-            ):
+    def iter_new_changes(self) -> Iterator[ChangeEntry]:
+        """Yields the changes of the records written since `last_lsn`, storing them as they pass.
 
-                if not parsed_transactions.get(record.operation):
-                    parsed_transactions[record.operation] = {}
-                    parsed_transactions[record.operation][table_name] = []
-
-                elif not parsed_transactions[record.operation].get(table_name):
-                    parsed_transactions[record.operation][table_name] = []
-
-                parsed_transactions[record.operation][table_name].append(
-                    {
-                        "data": self.parse_bytes(record.raw_data, table_schema),
-                        "transaction_id": record.transaction_id,
-                        "schema": record.alloc_unit.split(".")[0],
-                        "table": table_name,
-                        "begin_time": record.begin_operation,
-                        "username": record.username,
-                        "end_time": record.end_operation,
-                        "lsn": record.current_lsn,
-                    }
-                )
+        The transactions still open are kept for the next call. Set `last_lsn` to the checkpoint of
+        the store to resume a previous run.
+        """
 
-        self.CURSOR.close()
-        return parsed_transactions
+        changes = self.iter_changes(start_lsn=self.last_lsn, flush_open=False)
+        if self.store is not None:
+            changes = self._store_changes(changes)
 
-    def try_decode(self, data):
-        """
-        Detecta automáticamente la codificación de los datos.
-        Decodifica en UTF-8 primero, pero si encuentra un patrón típico de UTF-16, cambia a UTF-16.
+        return changes
+
+    @property
+    def checkpoint_lsn(self) -> Optional[LSN]:
+        """LSN a new parser can resume from without losing the transactions that are still open."""
+
+        started = list(self.transactions.open_since.values())
+        if not started:
+            return self.last_lsn
+
+        # None means a transaction opened before the first record read, so there is no safe checkpoint yet
+        if None in started:
+            return None
+
+        return min(typing.cast(list[LSN], started))
+
+    def _store_changes(
+        self, changes: typing.Iterable[ChangeEntry]
+    ) -> Iterator[ChangeEntry]:
+        """Writes the changes to the store as they pass through, skipping the ones it already has.
+
+        Resuming before an open transaction reads the changes committed meanwhile again, those are
+        neither stored nor yielded twice. The checkpoint of the filter only moves once the whole scan
+        is stored.
         """
 
-        if all(data[i] == 0 for i in range(1, len(data), 2)):
+        store = typing.cast(ChangeStore, self.store)
+        known = store.lsns_after(self.last_lsn)
+
+        batch: list[ChangeEntry] = []
+        for change in changes:
+            if change[2].lsn in known:
+                continue
+
+            batch.append(change)
+            yield change
+
+            if len(batch) >= STORE_BATCH_SIZE:
+                store.append(batch, None)
+                batch = []
+
+        store.append(batch, self.checkpoint_lsn, self.log_filter.key)
+
+    def iter_changes(
+        self, start_lsn: Optional[LSN] = None, flush_open: bool = True
+    ) -> Iterator[ChangeEntry]:
+        """Yields (operation, table name, change) for every change, decoding the log batch by batch."""
+
+        if not self.connected:
+            return
+
+        with self._borrowed_cursor():
+            if self._schema is None or self._catalog_stale:
+                with self.stats.timer("schema"):
+                    self._load_catalog()
+
+            batches = self._iter_transaction_log(start_lsn, flush_open)
+
+            if self._parallel_decoder is None:
+                for records in batches:
+                    yield from self._decode_records(records)
+                return
+
+            resolved = (self._resolve_records(records) for records in batches)
+            for (key, decoder, record), values in self._parallel_decoder.map(resolved):
+                yield record.operation, f"{key[0]}.{key[1]}", self._change(
+                    record, key, decoder, values
+                )
+
+    @property
+    def connected(self) -> bool:
+        """Whether the parser has a cursor, or a pool to borrow one from."""
+
+        return bool(self.database) and (self.CURSOR is not None or self.pool is not None)
+
+    @contextmanager
+    def _borrowed_cursor(self) -> Iterator[None]:
+        """Puts a cursor borrowed from the pool in CURSOR while a scan runs, unless the parser has its own."""
+
+        if self.pool is None or self.CURSOR is not None:
+            yield
+            return
+
+        with self.pool.cursor() as cursor:
+            self.CURSOR = cursor
             try:
-                return data.decode("utf-16", errors="strict")
-            except UnicodeDecodeError:
-                pass
+                yield
+            finally:
+                self.CURSOR = None
+
+    def _load_catalog(self) -> None:
+        """Loads the table schemas and maps every allocation unit to its compiled decoder."""
+
+        if not self.CURSOR:
+            return
+
+        self._schema = self._fetch_table_schema()
 
+        alloc_units, self._skipped_alloc_units = self.schema_cache.load_allocation_units(
+            self.CURSOR
+        )
+
+        self._alloc_units = {}
+        for alloc_unit_id, key in alloc_units.items():
+            table_schema = self._schema.get(key)
+            if table_schema:
+                self._alloc_units[alloc_unit_id] = (key, self._get_decoder(table_schema))
+
+        self._catalog_stale = False
+
+    def _iter_log_rows(
+        self, query: str, start_lsn: Optional[str], params: tuple
+    ) -> Iterator[list[tuple]]:
+        """Runs a log query, whose FROM is a {source} placeholder, against the online log or the backups."""
+
+        if self.log_source is not None:
+            batches = iter(self.log_source.iter_batches(query, start_lsn, params))
+            while True:
+                started = time.perf_counter()
+                rows = next(batches, None)
+                if rows is None:
+                    return
+
+                self.stats.add("fetch", time.perf_counter() - started, len(rows))
+                yield rows
+
+        if not self.CURSOR:
+            return
+
+        with self.stats.timer("query"):
+            self._execute_dblog(query, start_lsn, params)
+        yield from self._iter_batches()
+
+    def _execute_dblog(self, query: str, start_lsn: Optional[str], params: tuple) -> None:
+        """Runs a query against fn_dblog from `start_lsn`, or from the start of the log when it is
+        no longer there.
+
+        A log backup truncates the records before the last checkpoint, so the LSN a poll or a
+        stored checkpoint resumes from can be gone. The queries also compare [Current LSN] with it,
+        so reading the whole active log returns the same records.
+        """
+
+        cursor = typing.cast(Cursor, self.CURSOR)
         try:
-            return data.decode("utf-8", errors="strict")
-        except UnicodeDecodeError:
-            return data.decode("utf-8", errors="replace")
+            cursor.execute(query.format(source="sys.fn_dblog(%s, NULL)"), (start_lsn, *params))
+        except pymssql.Error as e:
+            if start_lsn is None or not e.args or e.args[0] != INVALID_LOG_SCAN:
+                raise
+
+            self.stats.count("truncated_log_restarts")
+            cursor.execute(query.format(source="sys.fn_dblog(NULL, NULL)"), params)
+
+    def _data_predicates(self) -> tuple[str, list[typing.Any]]:
+        """WHERE predicates and parameters that select the data records to read."""
+
+        predicates = [
+            "[AllocUnitName] IS NOT NULL",  # Ignorar registros sin nombre de unidad de asignación
+            "[AllocUnitName] NOT LIKE 'sys%'",  # Excluir objetos del sistema
+            "[AllocUnitName] NOT LIKE 'Unknown Alloc Unit%'",  # Excluir asignaciones desconocidas
+        ]
+        params: list[typing.Any] = []
+
+        # The records that move rows are read anyway, the row state needs them to rebuild the images
+        # of updates, and the filter drops them after that
+        if self.log_filter.operations is not None:
+            operations = sorted({*self.log_filter.operations, *ROW_STATE_OPERATIONS})
+            predicates.append(f"[Operation] IN ({', '.join(['%s'] * len(operations))})")
+            params.extend(operations)
+
+        if self.log_filter.tables is not None:
+            alloc_unit_ids = [
+                str(alloc_unit_id)
+                for alloc_unit_id, ((schema_name, table_name), _) in self._alloc_units.items()
+                if self.log_filter.matches_table(schema_name, table_name)
+            ]
+            predicates.append(f"[AllocUnitId] IN ({', '.join(alloc_unit_ids) or 'NULL'})")
+
+        return " AND ".join(predicates), params
+
+    def _time_window_lsns(self) -> Optional[tuple[Optional[LSN], Optional[LSN]]]:
+        """Translates the time window of the filter to a range of LSNs, None when it is empty.
+
+        The begin times of the transactions are the only clock in the log, so the window starts at
+        the first transaction that began inside it and ends at the first one that began after it.
+        The log only grows, so a bound that was found never moves: the window is resolved once, and
+        later polls only look for the missing bounds in the records written since.
+        """
+
+        start_time = self.log_filter.start_time
+        end_time = self.log_filter.end_time
+        if (not self.CURSOR) or (start_time is None and end_time is None):
+            return None, None
+
+        if self._window_times != (start_time, end_time):
+            self._window_times = (start_time, end_time)
+            self._window = (None, None)
+            self._window_scanned = None
+
+        window_start, window_end = self._window
+        if (start_time is None or window_start is not None) and (
+            end_time is None or window_end is not None
+        ):
+            return window_start, window_end
+
+        # The bounds are joined after the source, so their parameters follow the ones of the source
+        query = """SELECT
+    MIN(CASE WHEN w.start_time IS NULL OR l.[Begin Time] >= w.start_time THEN l.[Current LSN] END),
+    MIN(CASE WHEN l.[Begin Time] >= w.end_time THEN l.[Current LSN] END),
+    MAX(l.[Current LSN])
+FROM {source} l
+CROSS JOIN (SELECT %s AS start_time, %s AS end_time) w
+WHERE l.[Operation] = 'LOP_BEGIN_XACT';"""
+        params = (log_time(start_time), log_time(end_time))
+        scan_start = self._window_scanned.decimal if self._window_scanned is not None else None
+
+        if self.log_source is not None:
+            rows = [
+                row
+                for file_rows in self.log_source.query(query, scan_start, params).values()
+                for row in file_rows
+            ]
+        else:
+            self._execute_dblog(query, scan_start, params)
+            rows = self.CURSOR.fetchall()
+
+        if window_start is None:
+            window_start = min((LSN.parse(row[0]) for row in rows if row[0]), default=None)
+        if window_end is None:
+            window_end = min((LSN.parse(row[1]) for row in rows if row[1]), default=None)
+
+        self._window = (window_start, window_end)
+        self._window_scanned = max(
+            (LSN.parse(row[2]) for row in rows if row[2]), default=self._window_scanned
+        )
+
+        if start_time is not None and window_start is None:
+            return None
+
+        return window_start, window_end
+
+    def _resolve_records(
+        self, log: list[LogRecord]
+    ) -> list[tuple[TableKey, TableDecoder, LogRecord]]:
+        """Finds the table and decoder of every record that has a row image to decode."""
+
+        alloc_units = self._alloc_units
+
+        resolved: list[tuple[TableKey, TableDecoder, LogRecord]] = []
+        for record in log:
+            if record.operation not in DECODED_OPERATIONS:
+                continue
+
+            table = alloc_units.get(record.alloc_unit_id)
+            if table is None:
+                # The cursor is busy streaming the log, so the catalog is reloaded before the next fetch
+                self._catalog_stale = True
+                self.stats.count("unknown_alloc_units")
+                continue
+
+            resolved.append((table[0], table[1], record))
+
+        return resolved
+
+    def _decode_records(
+        self, log: list[LogRecord]
+    ) -> Iterator[ChangeEntry]:
+        """Decodes the changes of a batch of records. Yields the table as schema.table."""
+
+        resolved = self._resolve_records(log)
+
+        # Decoded as a whole batch, so the time is measured once per batch
+        started = time.perf_counter()
+        changes = [
+            (
+                record.operation,
+                f"{key[0]}.{key[1]}",
+                self._change(record, key, decoder, self._decode_images(decoder, record.images)),
+            )
+            for key, decoder, record in resolved
+        ]
+        if self.stats.enabled:
+            size = sum(len(data) for _, _, record in resolved for data in record.images)
+            self.stats.add("decode", time.perf_counter() - started, len(changes), size)
+
+        yield from changes
+
+    def _change(
+        self,
+        record: LogRecord,
+        key: TableKey,
+        decoder: TableDecoder,
+        decoded: tuple[tuple[typing.Any, ...], ...],
+    ) -> Change:
+        """Builds the change shown in the Dashboard from a record and the values of its images.
+
+        An update has the {"old": ..., "new": ...} columns that changed, plus the primary key (or
+        every column when the table has none) to find the row.
+        """
+
+        self.progress.decoded += 1
+
+        columns: tuple[str, ...] = ()
+        values: tuple[typing.Any, ...] = ()
+        if len(decoded) == 1:
+            columns, values = decoder.names, decoded[0]
+        elif len(decoded) == 2:
+            primary_key = self.schema_cache.primary_keys.get(key)
+            kept = set(primary_key) if primary_key else set(decoder.names)
+
+            old: dict[str, typing.Any] = {}
+            new: dict[str, typing.Any] = {}
+            for name, before, after in zip(decoder.names, *decoded):
+                if before != after or name in kept:
+                    old[name] = before
+                    new[name] = after
+
+            columns, values = UPDATE_COLUMNS, (old, new)
+
+        return Change(
+            operation=record.operation,
+            schema=key[0],
+            table=key[1],
+            transaction_id=record.transaction_id,
+            begin_time=record.begin_operation,
+            end_time=record.end_operation,
+            username=record.username,
+            lsn=record.current_lsn,
+            # A row that failed to decode, or an update whose row image is unknown, has no values
+            columns=columns,
+            values=values,
+            source=self.source,
+        )
+
+    def _group_changes(
+        self, changes: typing.Iterable[ChangeEntry]
+    ) -> dict[str, typing.Any]:
+        """Groups changes by operation and table."""
+
+        parsed_transactions: dict[str, typing.Any] = {}
+        for operation, table_name, change in changes:
+            parsed_transactions.setdefault(operation, {}).setdefault(
+                table_name, []
+            ).append(change)
+
+        return parsed_transactions
+
+    def try_decode(self, data: bytes) -> str:
+        """Decodes a string whose encoding is unknown, see `decoder.try_decode`."""
+
+        return try_decode(data)
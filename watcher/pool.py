@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+import typing
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import pymssql
+from pymssql import Connection, Cursor
+
+DEFAULT_POOL_SIZE = 4
+
+# Connections idle for longer than this are checked before being handed out again
+HEALTH_CHECK_AFTER_SECONDS = 5.0
+HEALTH_CHECK_QUERY = "SELECT 1;"
+
+# How long a borrower waits for a free connection before giving up
+BORROW_TIMEOUT_SECONDS = 30.0
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection is freed in time."""
+
+
+class ConnectionPool:
+    """A small pool of connections to a server, reused so queries skip the connection and login handshake."""
+
+    def __init__(
+        self,
+        connect: typing.Callable[[], Connection],
+        size: int = DEFAULT_POOL_SIZE,
+    ) -> None:
+        """Creates a pool that opens up to `size` connections with `connect`, only when they are needed."""
+
+        self.connect = connect
+        self.size = max(1, size)
+
+        # (connection, when it was returned), the most recently used is handed out first
+        self._idle: queue.LifoQueue[tuple[Connection, float]] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """Borrows a connection, returned to the pool when the block ends.
+
+        A connection that fails with a connection error inside the block is dropped instead.
+        """
+
+        if self._closed:
+            raise PoolExhausted("El pool de conexiones está cerrado")
+
+        if not self._slots.acquire(timeout=BORROW_TIMEOUT_SECONDS):
+            raise PoolExhausted(
+                f"No se liberó ninguna de las {self.size} conexiones en {BORROW_TIMEOUT_SECONDS:.0f}s"
+            )
+
+        conn: Optional[Connection] = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except (pymssql.OperationalError, pymssql.InterfaceError):
+            if conn is not None:
+                _close_quietly(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                if self._closed:
+                    _close_quietly(conn)
+                else:
+                    self._idle.put((conn, time.monotonic()))
+
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self) -> Iterator[Cursor]:
+        """Borrows a connection and yields a cursor of it."""
+
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close(self) -> None:
+        """Closes the idle connections, the borrowed ones are closed when they are returned."""
+
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+
+            _close_quietly(conn)
+
+    def _checkout(self) -> Connection:
+        """Takes an idle connection that is still alive, or opens a new one."""
+
+        while True:
+            try:
+                conn, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+
+            if time.monotonic() - returned_at < HEALTH_CHECK_AFTER_SECONDS or _is_alive(conn):
+                return conn
+
+            _close_quietly(conn)
+
+
+def _is_alive(conn: Connection) -> bool:
+    try:
+        cursor = conn.cursor()
+        cursor.execute(HEALTH_CHECK_QUERY)
+        cursor.fetchall()
+        cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+def _close_quietly(conn: Connection) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
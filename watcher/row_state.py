@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from typing import Optional
+
+# Rows whose image is kept at most, the pages used least recently are dropped first
+MAX_ROWS = 200_000
+
+
+class RowStateCache:
+    """Last known image of the rows changed in the log, by page and slot.
+
+    LOP_MODIFY_ROW only logs the bytes that changed, so the images of the row before and after an
+    update are rebuilt by patching the image last inserted or updated at its slot. The slots of an
+    index page are kept in key order, so an insert or a removal there moves the slots after it.
+    """
+
+    def __init__(self, max_rows: int = MAX_ROWS) -> None:
+        self.max_rows = max_rows
+
+        # Page ID -> {slot: row image}
+        self._pages: OrderedDict[str, dict[int, bytes]] = OrderedDict()
+        self._rows = 0
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def insert(self, page_id: str, slot_id: int, image: bytes, shift: bool) -> None:
+        """Keeps the image of an inserted row, moving the slots from `slot_id` on when `shift`."""
+
+        slots = self._page(page_id)
+        if shift:
+            self._replace(
+                page_id,
+                {(slot + 1 if slot >= slot_id else slot): row for slot, row in slots.items()},
+            )
+            slots = self._pages[page_id]
+
+        if slot_id not in slots:
+            self._rows += 1
+        slots[slot_id] = image
+
+        self._evict()
+
+    def delete(self, page_id: str, slot_id: int, shift: bool) -> None:
+        """Forgets a deleted row, moving the slots after it back when `shift`."""
+
+        self.forget(page_id, slot_id)
+
+        slots = self._pages.get(page_id)
+        if shift and slots:
+            self._replace(
+                page_id,
+                {(slot - 1 if slot > slot_id else slot): row for slot, row in slots.items()},
+            )
+
+    def modify(
+        self, page_id: str, slot_id: int, offset: int, before: bytes, after: bytes
+    ) -> Optional[tuple[bytes, bytes]]:
+        """Applies the bytes changed by an update, returns the full (before, after) images.
+
+        None when the image of the row is unknown, or is stale because the bytes it has at `offset`
+        are not the logged ones.
+        """
+
+        slots = self._pages.get(page_id)
+        image = slots.get(slot_id) if slots else None
+        if image is None:
+            return None
+
+        if image[offset : offset + len(before)] != before:
+            self.forget(page_id, slot_id)
+            return None
+
+        patched = image[:offset] + after + image[offset + len(before) :]
+        self._page(page_id)[slot_id] = patched
+        return image, patched
+
+    def forget(self, page_id: str, slot_id: int) -> None:
+        """Drops the image of a row, e.g. when it changed in a way that can't be followed."""
+
+        slots = self._pages.get(page_id)
+        if slots and slots.pop(slot_id, None) is not None:
+            self._rows -= 1
+
+    def clear(self) -> None:
+        self._pages.clear()
+        self._rows = 0
+
+    def _page(self, page_id: str) -> dict[int, bytes]:
+        slots = self._pages.get(page_id)
+        if slots is None:
+            slots = self._pages[page_id] = {}
+        else:
+            self._pages.move_to_end(page_id)
+
+        return slots
+
+    def _replace(self, page_id: str, slots: dict[int, bytes]) -> None:
+        self._pages[page_id] = slots
+        self._pages.move_to_end(page_id)
+
+    def _evict(self) -> None:
+        while self._rows > self.max_rows and self._pages:
+            _, slots = self._pages.popitem(last=False)
+            self._rows -= len(slots)
@@ -0,0 +1,270 @@
+import json
+import os
+import re
+import typing
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional
+
+from platformdirs import user_cache_dir
+from pymssql import Cursor
+
+from .column_schema import ColumnSchema
+from .decoder import VARIABLE_LENGTH_TYPES
+
+# (schema name, table name)
+TableKey = tuple[str, str]
+
+CACHE_VERSION = 3
+
+
+class SchemaCache:
+    """Column metadata of every user table of a database, persisted to disk between sessions."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        """Creates a cache stored at `path`, or only kept in memory if there is no path."""
+
+        self.path = path
+        self.tables: dict[TableKey, list[ColumnSchema]] = {}
+        self.object_ids: dict[TableKey, int] = {}
+
+        # Primary key columns in key order, and the identity column, of the tables that have them
+        self.primary_keys: dict[TableKey, list[str]] = {}
+        self.identity_columns: dict[TableKey, str] = {}
+
+        # Computed and rowversion columns, which SQL Server fills in and can't be written
+        self.generated_columns: dict[TableKey, list[str]] = {}
+
+        # Last modification of every table, the cache is only reloaded when one of them changes
+        self.modify_dates: dict[TableKey, str] = {}
+
+    @classmethod
+    def for_database(cls, database: str, server: Optional[str] = None) -> "SchemaCache":
+        """Returns the cache of a database in the user cache directory, of `server` when given,
+        as databases of different servers can have the same name."""
+
+        name = re.sub(r"[^\w.-]", "_", f"{server}_{database}") if server else database
+        return cls(Path(user_cache_dir("mssql-watcher")) / "schema" / f"{name}.json")
+
+    def load(
+        self, cursor: Cursor, on_write_error: Optional[typing.Callable[[OSError], None]] = None
+    ) -> dict[TableKey, list[ColumnSchema]]:
+        """Returns the schema of every table, touching the catalog only if a table has changed.
+
+        `on_write_error` is told when the reloaded schema can't be saved, it is still returned.
+        """
+
+        if not self.tables:
+            self._read()
+
+        cursor.execute(
+            """SELECT s.name, t.name, t.object_id, CONVERT(VARCHAR(33), t.modify_date, 126)
+FROM sys.tables t
+JOIN sys.schemas s ON s.schema_id = t.schema_id;"""
+        )
+        modify_dates: dict[TableKey, str] = {}
+        object_ids: dict[TableKey, int] = {}
+        for schema_name, table_name, object_id, modify_date in cursor.fetchall():
+            modify_dates[(schema_name, table_name)] = modify_date
+            object_ids[(schema_name, table_name)] = object_id
+
+        if modify_dates != self.modify_dates or object_ids != self.object_ids:
+            self.tables = self._fetch_columns(cursor)
+            (
+                self.primary_keys,
+                self.identity_columns,
+                self.generated_columns,
+            ) = self._fetch_keys(cursor)
+            self.modify_dates = modify_dates
+            self.object_ids = object_ids
+            try:
+                self._write()
+            except OSError as e:
+                if on_write_error is not None:
+                    on_write_error(e)
+
+        return self.tables
+
+    def load_allocation_units(self, cursor: Cursor) -> tuple[dict[int, TableKey], set[int]]:
+        """Maps the allocation units of the rows of every table to the table, and returns the other
+        allocation units of the tables apart.
+
+        Only the in-row data of the heap or the clustered index has rows in the layout the decoders
+        read. The records of nonclustered indexes, LOB and row-overflow pages are skipped.
+        """
+
+        # In-row and LOB data belong to a hobt, row-overflow data to a partition
+        cursor.execute(
+            """SELECT au.allocation_unit_id, s.name, t.name,
+    CASE WHEN au.type = 1 AND p.index_id IN (0, 1) THEN 1 ELSE 0 END -- Filas del heap o índice clúster
+FROM sys.allocation_units au
+JOIN sys.partitions p
+    ON (au.type IN (1, 3) AND au.container_id = p.hobt_id)
+    OR (au.type = 2 AND au.container_id = p.partition_id)
+JOIN sys.tables t ON t.object_id = p.object_id
+JOIN sys.schemas s ON s.schema_id = t.schema_id;"""
+        )
+
+        tables: dict[int, TableKey] = {}
+        skipped: set[int] = set()
+        for alloc_unit_id, schema_name, table_name, has_rows in cursor.fetchall():
+            if has_rows:
+                tables[alloc_unit_id] = (schema_name, table_name)
+            else:
+                skipped.add(alloc_unit_id)
+
+        return tables, skipped
+
+    def _fetch_columns(self, cursor: Cursor) -> dict[TableKey, list[ColumnSchema]]:
+        """Loads the columns of every table with a single query."""
+
+        cursor.execute(
+            """SELECT c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE, c.CHARACTER_MAXIMUM_LENGTH, c.NUMERIC_PRECISION,
+    c.DATETIME_PRECISION, c.NUMERIC_SCALE, c.CHARACTER_OCTET_LENGTH, c.ORDINAL_POSITION
+FROM INFORMATION_SCHEMA.COLUMNS c
+JOIN sys.tables t ON t.object_id = OBJECT_ID(QUOTENAME(c.TABLE_SCHEMA) + '.' + QUOTENAME(c.TABLE_NAME))
+ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION;"""
+        )
+
+        columns: dict[TableKey, list[ColumnSchema]] = {}
+        while rows := cursor.fetchmany(5000):
+            for row in rows:
+                (
+                    schema_name,
+                    table_name,
+                    column_name,
+                    data_type,
+                    char_max_length,
+                    numeric_precision,
+                    datetime_precision,
+                    numeric_scale,
+                    char_octet_length,
+                    ordinal_position,
+                ) = row
+
+                if data_type == "decimal":
+                    data_type = f"decimal({numeric_precision},{numeric_scale})"
+
+                columns.setdefault((schema_name, table_name), []).append(
+                    ColumnSchema(
+                        COLUMN_NAME=column_name,
+                        DATA_TYPE=data_type,
+                        NUMERIC_PRECISION=numeric_precision,
+                        DATETIME_PRECISION=datetime_precision,
+                        NUMERIC_SCALE=numeric_scale,
+                        CHARACTER_MAXIMUM_LENGTH=char_max_length,
+                        CHARACTER_OCTET_LENGTH=char_octet_length,
+                        ORDINAL_POSITION=ordinal_position,
+                    )
+                )
+
+        return {key: _log_order(table_columns) for key, table_columns in columns.items()}
+
+    def _fetch_keys(
+        self, cursor: Cursor
+    ) -> tuple[dict[TableKey, list[str]], dict[TableKey, str], dict[TableKey, list[str]]]:
+        """Loads the primary key, the identity column and the generated columns of every table."""
+
+        cursor.execute(
+            """SELECT s.name, t.name, c.name
+FROM sys.indexes i
+JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+JOIN sys.tables t ON t.object_id = i.object_id
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+WHERE i.is_primary_key = 1
+ORDER BY s.name, t.name, ic.key_ordinal;"""
+        )
+        primary_keys: dict[TableKey, list[str]] = {}
+        for schema_name, table_name, column_name in cursor.fetchall():
+            primary_keys.setdefault((schema_name, table_name), []).append(column_name)
+
+        cursor.execute(
+            """SELECT s.name, t.name, c.name
+FROM sys.identity_columns c
+JOIN sys.tables t ON t.object_id = c.object_id
+JOIN sys.schemas s ON s.schema_id = t.schema_id;"""
+        )
+        identity_columns = {
+            (schema_name, table_name): column_name
+            for schema_name, table_name, column_name in cursor.fetchall()
+        }
+
+        cursor.execute(
+            """SELECT s.name, t.name, c.name
+FROM sys.columns c
+JOIN sys.tables t ON t.object_id = c.object_id
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+WHERE c.is_computed = 1 OR TYPE_NAME(c.system_type_id) = 'timestamp'
+ORDER BY s.name, t.name, c.column_id;"""
+        )
+        generated_columns: dict[TableKey, list[str]] = {}
+        for schema_name, table_name, column_name in cursor.fetchall():
+            generated_columns.setdefault((schema_name, table_name), []).append(column_name)
+
+        return primary_keys, identity_columns, generated_columns
+
+    def _read(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if cached.get("version") != CACHE_VERSION:
+            return
+
+        for table in cached["tables"]:
+            key = (table["schema"], table["table"])
+            self.tables[key] = [ColumnSchema(**column) for column in table["columns"]]
+            self.object_ids[key] = table["object_id"]
+            self.modify_dates[key] = table["modify_date"]
+            if table["primary_key"]:
+                self.primary_keys[key] = table["primary_key"]
+            if table["identity_column"]:
+                self.identity_columns[key] = table["identity_column"]
+            if table["generated_columns"]:
+                self.generated_columns[key] = table["generated_columns"]
+
+    def _write(self) -> None:
+        if not self.path:
+            return
+
+        cached = {
+            "version": CACHE_VERSION,
+            "tables": [
+                {
+                    "schema": key[0],
+                    "table": key[1],
+                    "object_id": self.object_ids.get(key),
+                    "modify_date": self.modify_dates.get(key),
+                    "primary_key": self.primary_keys.get(key, []),
+                    "identity_column": self.identity_columns.get(key),
+                    "generated_columns": self.generated_columns.get(key, []),
+                    "columns": [asdict(column) for column in table_columns],
+                }
+                for key, table_columns in self.tables.items()
+            ],
+        }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so a crash never leaves a half written cache
+        temporary_path = self.path.with_suffix(".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(cached, f)
+        os.replace(temporary_path, self.path)
+
+
+def _log_order(table_columns: list[ColumnSchema]) -> list[ColumnSchema]:
+    """Sorts the columns in how they are expected to be in the transaction log."""
+
+    # Types that are put to the end of the RowLog because of their variable size.
+    return [
+        column
+        for column in table_columns
+        if column.DATA_TYPE not in VARIABLE_LENGTH_TYPES
+    ] + [column for column in table_columns if column.DATA_TYPE in VARIABLE_LENGTH_TYPES]
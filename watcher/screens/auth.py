@@ -1,3 +1,6 @@
+import typing
+from dataclasses import dataclass
+from functools import partial
 from typing import Optional
 
 import pymssql
@@ -17,14 +20,52 @@ from textual.widgets import (
 )
 from textual.worker import Worker, WorkerState
 
+from ..backup import BackupSource
+from ..decoder import DecoderCache
+from ..log_filter import LogFilter
+from ..parallel import ParallelDecoder
 from ..parser import Parser
+from ..pool import DEFAULT_POOL_SIZE, ConnectionPool
+from ..schema_cache import SchemaCache
+from ..stats import DISABLED, PipelineStats
+from ..store import ChangeStore
 from .dashboard import Dashboard
 
 
+@dataclass
+class Source:
+    """A database to watch and the pool of connections to it."""
+
+    # Shown in the Source column, the database, followed by @server when it is not the main one
+    name: str
+    server: str
+    database: str
+    pool: Optional[ConnectionPool] = None
+
+
+def parse_sources(databases: str, server: str) -> list[Source]:
+    """Databases of a comma separated list, each one `database` on `server` or `database@host:port`."""
+
+    sources: dict[str, Source] = {}
+    for entry in databases.split(","):
+        database, _, other_server = (part.strip() for part in entry.partition("@"))
+        if not database:
+            continue
+
+        if other_server and other_server != server:
+            name = f"{database}@{other_server}"
+            sources.setdefault(name, Source(name, other_server, database))
+        else:
+            sources.setdefault(database, Source(database, server, database))
+
+    return list(sources.values())
+
+
 class AuthScreen(Screen):
     CSS_PATH = "css/auth.tcss"
-    CURSOR: Optional[pymssql.Cursor] = None
-    DATABASE: Optional[str] = None
+    SOURCES: list[Source] = []
+    LOG_FILTER: Optional[LogFilter] = None
+    BACKUP_FILES: list[str] = []
 
     def compose(self) -> ComposeResult:
         self.app.sub_title = "Auth Screen"
@@ -48,8 +89,8 @@ class AuthScreen(Screen):
             yield Label("Password")
             yield Input(id="password-input", password=True)
 
-            yield Label("Database", id="database-label")
-            yield Input(id="database-input", placeholder="master")
+            yield Label("Databases", id="database-label")
+            yield Input(id="database-input", placeholder="ventas, compras@otro-servidor:1433")
 
             with Center():
                 with RadioSet(id="auth-radio"):
@@ -58,12 +99,21 @@ class AuthScreen(Screen):
                     )
                     yield RadioButton("Backup File", name="backup-file", value=False)
 
+            yield Label("Backups", id="backup-files-label")
+            yield Input(
+                placeholder="C:\\backups\\log1.trn, C:\\backups\\log2.trn",
+                id="backup-files-input",
+            )
+
             with Horizontal():
                 yield Label("Desde")
-                yield Input("2024-12-31", id="from-date")
+                yield Input(placeholder="YYYY-MM-DD", id="from-date")
 
                 yield Label("Hasta", id="to-label")
-                yield Input("2025-12-31", id="to-date")
+                yield Input(placeholder="YYYY-MM-DD", id="to-date")
+
+            yield Label("Tablas", id="tables-label")
+            yield Input(placeholder="dbo.Clientes, sales", id="tables-input")
 
             yield Button("Conectar", id="connect-button", variant="primary")
 
@@ -75,6 +125,11 @@ class AuthScreen(Screen):
         username_input = self.query_one("#username-input", expect_type=Input)
         password_input = self.query_one("#password-input", expect_type=Input)
         database_input = self.query_one("#database-input", expect_type=Input)
+        from_date_input = self.query_one("#from-date", expect_type=Input)
+        to_date_input = self.query_one("#to-date", expect_type=Input)
+        tables_input = self.query_one("#tables-input", expect_type=Input)
+        radio_set = self.query_one("#auth-radio", expect_type=RadioSet)
+        backup_files_input = self.query_one("#backup-files-input", expect_type=Input)
 
         server_data = server_data_input.value
         auth = auth_input.value
@@ -82,64 +137,161 @@ class AuthScreen(Screen):
         password = password_input.value
         database = database_input.value
 
-        # TODO: Implement Date logic and Windows Auth
+        # TODO: Implement Windows Auth
+
+        try:
+            self.LOG_FILTER = LogFilter.from_inputs(
+                from_date_input.value, to_date_input.value, tables_input.value
+            )
+        except ValueError:
+            self.notify("Las fechas deben tener el formato YYYY-MM-DD", severity="error")
+            return
+
+        self.BACKUP_FILES = []
+        if radio_set.pressed_button and radio_set.pressed_button.name == "backup-file":
+            self.BACKUP_FILES = [
+                file.strip()
+                for file in backup_files_input.value.split(",")
+                if file.strip()
+            ]
+
+            if not self.BACKUP_FILES:
+                self.notify("Ingrese al menos un archivo de backup", severity="error")
+                return
+
+        host, _, port = (part.strip() for part in server_data.partition(","))
 
-        host = server_data.split(",")[0]
-        port = server_data.split(",")[1]
+        sources = parse_sources(database, host)
+        if not sources:
+            self.notify("Ingrese al menos una base de datos", severity="error")
+            return
+
+        if self.BACKUP_FILES and len(sources) > 1:
+            self.notify("Los backups se leen de una sola base de datos", severity="error")
+            return
 
         main_container = self.query_one("#main", expect_type=Center)
         main_container.loading = True
 
+        # pymssql.connect blocks, so it runs in a thread to keep the UI responsive
         self.run_worker(
-            self.try_connect(
-                host, port, username, password, database, windows_auth=(auth == "win")
+            partial(
+                self.try_connect,
+                host,
+                port or "1433",
+                username,
+                password,
+                sources,
+                windows_auth=(auth == "win"),
             ),
             exclusive=True,
+            thread=True,
         )
 
-    async def try_connect(
+    def try_connect(
         self,
         host: str,
         port: str,
         username: str,
         password: str,
-        database: str,
+        sources: list[Source],
         windows_auth: bool = True,
     ) -> None:
+        """Opens a pool of connections to every source, with the same login."""
+
+        self.SOURCES = []
+        pools: list[ConnectionPool] = []
         try:
-            self.DATABASE = database
-            conn = None
-
-            if windows_auth:
-                conn = pymssql.connect(server=host, autocommit=True)
-            else:
-
-                conn = pymssql.connect(
-                    server=host,
-                    port=port,
-                    user=username,
-                    password=password,
+            for source in sources:
+                # The port of another server is part of its name, e.g. host:1433
+                login: dict[str, typing.Any] = {"server": source.server}
+                if not windows_auth:
+                    login.update(user=username, password=password)
+                    if source.server == host:
+                        login["port"] = port
+
+                # Connected to the database, the parser doesn't switch to it. The pool opens more
+                # connections with it later, e.g. one per backup file
+                connect = partial(
+                    pymssql.connect, database=source.database, autocommit=True, **login
+                )
+
+                pool = ConnectionPool(
+                    connect, size=getattr(self.app, "pool_size", DEFAULT_POOL_SIZE)
                 )
+                pools.append(pool)
 
-            self.CURSOR = conn.cursor()
+                # Opens the first connection, so a wrong login or database fails here
+                try:
+                    with pool.connection():
+                        pass
+                except Exception as e:
+                    raise RuntimeError(f"{source.name}: {e}") from e
+
+                source.pool = pool
         except Exception as e:
+            for pool in pools:
+                pool.close()
             self.notify(f"Error: {e}")
+            return
+
+        # The app owns the pools, a new login replaces the connections of the previous one
+        for previous in getattr(self.app, "pools", []):
+            previous.close()
+        self.app.pools = pools
+        self.SOURCES = sources
 
     def on_worker_state_changed(self, event: Worker.StateChanged) -> None:
         """Worker state changed event handler."""
 
-        if event.state == WorkerState.SUCCESS:
-            if not self.CURSOR or not self.DATABASE:
-                return
-
+        if event.state in (WorkerState.SUCCESS, WorkerState.ERROR):
             main_container = self.query_one("#main", expect_type=Center)
             main_container.loading = False
 
+        if event.state == WorkerState.SUCCESS:
+            if not self.SOURCES:
+                return
+
             self.notify("Connected!")
 
-            p = Parser(self.CURSOR, database=self.DATABASE)
-            self.app.push_screen(
-                Dashboard(
-                    parsed_data=p.parse_online_transaction_log(),
-                )
+            # The sources are read concurrently, into the same stats and with the same compiled plans
+            stats = PipelineStats() if getattr(self.app, "collect_stats", False) else DISABLED
+            decoders = DecoderCache(on_error=stats.decode_error)
+            decode_workers = getattr(self.app, "decode_workers", 0)
+            parallel_decoder = (
+                ParallelDecoder(decode_workers, stats) if decode_workers > 1 else None
             )
+
+            parsers: dict[Optional[str], Parser] = {}
+            for source in self.SOURCES:
+                pool = typing.cast(ConnectionPool, source.pool)
+                parsers[source.name] = Parser(
+                    None,
+                    database=source.database,
+                    schema_cache=SchemaCache.for_database(source.database, source.server),
+                    log_filter=self.LOG_FILTER,
+                    log_source=(
+                        # The parser holds a connection during the scan, the files are read with the rest
+                        BackupSource(
+                            self.BACKUP_FILES,
+                            pool.connection,
+                            workers=max(1, pool.size - 1),
+                        )
+                        if self.BACKUP_FILES
+                        else None
+                    ),
+                    # Backups are read whole every time, only the online log is resumed
+                    store=(
+                        None
+                        if self.BACKUP_FILES
+                        else ChangeStore.for_database(source.server, source.database)
+                    ),
+                    pool=pool,
+                    stats=stats,
+                    source=source.name,
+                    decoders=decoders,
+                    parallel_decoder=parallel_decoder,
+                )
+
+            # The Dashboard opens right away and parses the logs in the background
+            self.app.push_screen(Dashboard(parsers=parsers, parallel_decoder=parallel_decoder))
@@ -1,25 +1,113 @@
+import time
 import typing
+from functools import partial
+from typing import Optional
 
+from textual import on, work
 from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.cache import LRUCache
 from textual.containers import Center, Container, Vertical
 from textual.screen import Screen
-from textual.widgets import DataTable, Footer, Header, Label, Switch, Tabs, Tab, Log
+from textual.timer import Timer
+from textual.widgets import Footer, Header, Label, Switch, Tabs, Tab, Log
+from textual.worker import get_current_worker
+
+from ..change import Change, format_value
+from ..change_index import ChangeIndex
+from ..history import RowHistory
+from ..log_filter import ACTIONS
+from ..parallel import ParallelDecoder
+from ..parser import Parser
+from ..scripts import ScriptGenerator, script_path, select_changes, write_script
+from ..stats import DISABLED, stats_path
+from ..transactions import Transaction
+from ..widgets import ChangeTable
+
+# Texts of the tabs recently shown, kept per (tab, change id)
+TAB_CACHE_SIZE = 256
+
+# Changes listed in the Transaction Information tab, the script of the transaction has all of them
+TRANSACTION_CHANGES_SHOWN = 1000
 
 
 class Dashboard(Screen):
     CSS_PATH = "css/dashboard.tcss"
-    LAST_CELL_EVENT = None
+    BINDINGS = [
+        Binding("u", "export_script('undo', 'transaction')", "Deshacer transacción"),
+        Binding("r", "export_script('redo', 'transaction')", "Rehacer transacción"),
+        Binding("U", "export_script('undo', 'table')", "Deshacer tabla"),
+        Binding("R", "export_script('redo', 'table')", "Rehacer tabla"),
+        Binding("a", "export_script('undo', 'after')", "Deshacer desde aquí"),
+        Binding("s", "export_stats", "Exportar estadísticas"),
+    ]
+    SELECTED_CHANGE_ID: Optional[int] = None
     CURRENT_TAB = ""
 
     def __init__(
-        self, parsed_data: dict[str, typing.Any], result_transactions: typing.Any = None
+        self,
+        parsed_data: Optional[dict[str, typing.Any]] = None,
+        result_transactions: typing.Any = None,
+        parser: Optional[Parser] = None,
+        follow_interval: float = 2.0,
+        parsers: Optional[dict[Optional[str], Parser]] = None,
+        parallel_decoder: Optional[ParallelDecoder] = None,
     ):
+        """Shows `parsed_data`, or when there is none, parses the log with `parser` in the background.
+
+        To watch several databases at once, `parsers` has the parser of every source, keyed by the
+        `source` it stamps on its changes. Their logs are read concurrently into the same table.
+        The parsers, and the `parallel_decoder` they share, are closed with the Dashboard.
+        """
+
         super().__init__()
         self.app.sub_title = "Dashboard"
-        self.parsed_data = parsed_data
+
+        # Parsers kept open to tail the logs in follow mode
+        self.parsers: dict[Optional[str], Parser] = dict(parsers or {})
+        if parser is not None:
+            self.parsers.setdefault(parser.source, parser)
+
+        self.parallel_decoder = parallel_decoder
+
+        self.loading_log = parsed_data is None and bool(self.parsers)
         self.result_transactions = result_transactions
 
-        print(self.parsed_data)
+        # Every change by id and by LSN, the only copy kept, shared by the table and the tabs
+        self.changes = ChangeIndex()
+        self.changes.extend(
+            sorted(
+                (
+                    row
+                    for tables in (parsed_data or {}).values()
+                    for rows in tables.values()
+                    for row in rows
+                ),
+                key=lambda row: row.lsn,
+            )
+        )
+        self._tab_cache: LRUCache[tuple[str, int], str] = LRUCache(TAB_CACHE_SIZE)
+
+        # Timers and counters of the parse, shared by the parsers, the table and the tabs add their own stages
+        first = next(iter(self.parsers.values()), None)
+        self.stats = first.stats if first else DISABLED
+
+        # Changes of every row by primary key, for the Row History tab
+        self.history = RowHistory(
+            self.changes,
+            schema_caches={source: parser.schema_cache for source, parser in self.parsers.items()},
+        )
+
+        # Ids of the changes of every (source, transaction), to browse and script whole transactions
+        self.transaction_ids: dict[tuple[Optional[str], str], list[int]] = {}
+
+        self.follow_interval = follow_interval
+        self._follow_timer: Optional[Timer] = None
+        self._progress_timer: Optional[Timer] = None
+
+        # Sources still being read, and sources whose last poll hasn't finished yet
+        self._loading: set[Optional[str]] = set()
+        self._polling: set[Optional[str]] = set()
 
     def compose(self) -> ComposeResult:
         yield Header()
@@ -36,8 +124,18 @@ class Dashboard(Screen):
                 yield Label("DELETE", id="delete-switch-label")
                 yield Switch(value=True, id="delete-switch")
 
-        # Operation, Schema, Object, User, Begin Time, End Time, Transaction ID, LSN
-        yield DataTable(id="transaction-table", zebra_stripes=True)
+                yield Label("FOLLOW", id="follow-switch-label")
+                # The log can't be tailed until it has been read
+                yield Switch(
+                    value=False,
+                    id="follow-switch",
+                    disabled=not self.parsers or self.loading_log,
+                )
+
+                yield Label("", id="progress-label")
+
+        # Source, Operation, Schema, Object, User, Begin Time, End Time, Transaction ID, LSN
+        yield ChangeTable(self.changes, stats=self.stats, id="transaction-table")
 
         yield Tabs(
             "Operation Details",
@@ -45,95 +143,217 @@ class Dashboard(Screen):
             "Undo Script",
             "Redo Script",
             "Transaction Information",
+            "Pipeline Stats",
         )
         with Container(id="operation-details-container"):
             yield Log(highlight=True, id="sql-log")
 
-        # Tabs: Operation Details, Row History, Undo Script, Redo Script, Transaction Information
+        # Tabs: Operation Details, Row History, Undo Script, Redo Script, Transaction Information,
+        # Pipeline Stats
 
         # Operation Details: Field, Type, Old Value, New Value
         # Row History: Operation, Date, Username, LSN, [...Rows]
         # Undo Script: SQL Script
         # Redo Script: SQL Script
 
-    def on_switch_change(self, event: Switch.Changed) -> None:
+    @on(Switch.Changed, "#follow-switch")
+    def on_follow_switch_changed(self, event: Switch.Changed) -> None:
+        """Starts or stops tailing the log."""
+
+        if self._follow_timer is None:
+            self._follow_timer = self.set_interval(self.follow_interval, self.poll_log)
+
+        if event.value:
+            self._follow_timer.resume()
+        else:
+            self._follow_timer.pause()
+
+    @on(Switch.Changed, "#insert-switch, #update-switch, #delete-switch")
+    def on_operation_switch_changed(self, event: Switch.Changed) -> None:
+        """Filters the table. The log is still read whole, so the changes made while a switch is
+        off are shown when it is turned back on."""
+
         self.populate_table()
 
+    def enabled_actions(self) -> list[str]:
+        """Actions whose switch is on."""
+
+        return [
+            action
+            for action in ("INSERT", "UPDATE", "DELETE")
+            if self.query_one(f"#{action.lower()}-switch", expect_type=Switch).value
+        ]
+
+    def poll_log(self) -> None:
+        """Fetches the records written since the last poll of every source, each in its own thread."""
+
+        for source, parser in self.parsers.items():
+            # A source whose previous poll is still reading is skipped until the next one
+            if source in self._polling:
+                continue
+
+            self._polling.add(source)
+            self.run_worker(partial(self._poll_source, source, parser), thread=True, group="follow")
+
+    def _poll_source(self, source: Optional[str], parser: Parser) -> None:
+        """Appends the changes written to the log of a source since its last poll."""
+
+        worker = get_current_worker()
+        try:
+            changes = parser.poll()
+            if changes and not worker.is_cancelled:
+                self.app.call_from_thread(self.append_changes, changes)
+        except Exception as e:
+            # Once cancelled the parser may be closed under the poll, that is not an error
+            if not worker.is_cancelled:
+                self.app.call_from_thread(self.notify, self._error(source, e), severity="error")
+        finally:
+            if not worker.is_cancelled:
+                self.app.call_from_thread(self._finish_polling, source)
+
+    def _finish_polling(self, source: Optional[str]) -> None:
+        self._polling.discard(source)
+
     def on_mount(self) -> None:
+        table = self.query_one("#transaction-table", expect_type=ChangeTable)
+        with self.stats.timer("table", len(self.changes.ids)):
+            table.add_rows(self.changes.ids)
+        self.history.add(self.changes.ids)
+        self.index_transactions(self.changes.ids)
+
         self.populate_table()
         self.update_info()
 
-    def populate_table(self) -> None:
-        log = self.query_one("#sql-log", expect_type=Log)
+        if self.loading_log:
+            self._progress_timer = self.set_interval(0.5, self.show_progress)
+            self.load_log()
+
+    def on_unmount(self) -> None:
+        """Stops the workers, then closes the parsers with their connections, stores and decoding
+        processes."""
+
+        # The threads stop at their next batch, and leave the parsers alone from then on
+        for group in ("load", "follow", "script"):
+            self.workers.cancel_group(self, group)
+
+        for parser in self.parsers.values():
+            parser.close()
+
+        if self.parallel_decoder is not None:
+            self.parallel_decoder.close()
+
+    def load_log(self) -> None:
+        """Parses the log of every source in its own thread, the table is filled batch by batch."""
+
+        for source, parser in self.parsers.items():
+            self._loading.add(source)
+            self.run_worker(partial(self._load_source, source, parser), thread=True, group="load")
+
+    def _load_source(self, source: Optional[str], parser: Parser) -> None:
+        worker = get_current_worker()
+        try:
+            for changes in parser.iter_parsed_batches():
+                if worker.is_cancelled:
+                    break
+                self.app.call_from_thread(self.append_changes, changes)
+        except Exception as e:
+            if not worker.is_cancelled:
+                self.app.call_from_thread(self.notify, self._error(source, e), severity="error")
+        finally:
+            if not worker.is_cancelled:
+                self.app.call_from_thread(self.finish_loading, source)
+
+    @staticmethod
+    def _error(source: Optional[str], error: Exception) -> str:
+        return f"Error en {source}: {error}" if source else f"Error: {error}"
+
+    def show_progress(self) -> None:
+        """Shows the records read and decoded so far, added up over every source."""
+
+        if not self.parsers:
+            return
 
-        table = self.query_one("#transaction-table", expect_type=DataTable)
-        table.add_columns(
-            "Operation",
-            "Schema",
-            "Object",
-            "User",
-            "Begin Time",
-            "End Time",
-            "Transaction ID",
-            "LSN",
+        progress = [parser.progress for parser in self.parsers.values()]
+        finished = sum(1 for source in progress if source.finished)
+        sources = f" ({finished}/{len(progress)} bases)" if len(progress) > 1 else ""
+        self.query_one("#progress-label", expect_type=Label).update(
+            f"{'Listo' if finished == len(progress) else 'Leyendo'}{sources}: "
+            f"{sum(source.fetched for source in progress):,} registros, "
+            f"{sum(source.decoded for source in progress):,} cambios "
+            f"({sum(source.rows_per_second for source in progress):,.0f} filas/s)"
         )
 
-        inserts_enabled = self.query_one("#insert-switch", expect_type=Switch).value
-        updates_enabled = self.query_one("#update-switch", expect_type=Switch).value
-        deletes_enabled = self.query_one("#delete-switch", expect_type=Switch).value
+        if self.CURRENT_TAB == "tab-6":
+            self.update_info()
+
+    def finish_loading(self, source: Optional[str] = None) -> None:
+        """Called as the log of a source is read, the follow mode is enabled once every one is."""
+
+        self._loading.discard(source)
+        if self._loading:
+            self.show_progress()
+            return
 
-        log.write(
-            self.gen_undo_sql(
-                self.parsed_data["LOP_INSERT_ROWS"]["Usuarios"][0],
-                "Usuarios",
-                action="INSERT",
+        self.loading_log = False
+        if self._progress_timer is not None:
+            self._progress_timer.stop()
+            self._progress_timer = None
+
+        self.show_progress()
+        self.query_one("#follow-switch", expect_type=Switch).disabled = not self.parsers
+
+    def append_changes(self, changes: dict[str, typing.Any]) -> None:
+        """Adds newly decoded changes to the index and to the transaction table."""
+
+        table = self.query_one("#transaction-table", expect_type=ChangeTable)
+
+        added = False
+        for tables in changes.values():
+            for rows in tables.values():
+                new_ids = self.changes.extend(rows)
+                if not new_ids:
+                    continue
+
+                with self.stats.timer("table", len(new_ids)):
+                    table.add_rows(new_ids)
+                self.history.add(new_ids)
+                self.index_transactions(new_ids)
+                added = True
+
+        if added:
+            # The history of the rows changed again, and the transactions read in parts, are out of date
+            for key in [key for key in self._tab_cache.keys() if key[0] in ("tab-2", "tab-5")]:
+                self._tab_cache.discard(key)
+
+            if self.CURRENT_TAB in ("tab-2", "tab-5", "tab-6"):
+                self.update_info()
+
+    def index_transactions(self, change_ids: typing.Iterable[int]) -> None:
+        for change_id in change_ids:
+            change = self.changes[change_id]
+            self.transaction_ids.setdefault((change.source, change.transaction_id), []).append(
+                change_id
             )
+
+    def transaction_changes(
+        self, transaction_id: str, source: Optional[str] = None
+    ) -> list[Change]:
+        """Changes of a transaction of a source in LSN order."""
+
+        return sorted(
+            (
+                self.changes[change_id]
+                for change_id in self.transaction_ids.get((source, transaction_id), [])
+            ),
+            key=lambda change: change.lsn,
         )
 
-        # Format:
-        # parsed_data -> Operation (CRUD) -> Table -> {schema, data (parsed data), transaction_id}
-        if inserts_enabled:
-
-            for table_name, operation_data in self.parsed_data[
-                "LOP_INSERT_ROWS"
-            ].items():
-
-                idx = 0
-                for row in operation_data:
-                    print("idx", idx)
-                    table.add_row(
-                        "INSERT",
-                        row["table"],
-                        table_name,
-                        row["username"],
-                        row["begin_time"],
-                        row["end_time"],
-                        row["transaction_id"],
-                        row["lsn"],
-                        key=f"insert-{row['table']}-{idx}",
-                    )
-                    idx += 1
-
-        if deletes_enabled:
-            for table_name, operation_data in self.parsed_data[
-                "LOP_DELETE_ROWS"
-            ].items():
-
-                idx = 0
-                for row in operation_data:
-                    table.add_row(
-                        "DELETE",
-                        row["table"],
-                        table_name,
-                        row["username"],
-                        row["begin_time"],
-                        row["end_time"],
-                        row["transaction_id"],
-                        row["lsn"],
-                        key=f"delete-{row['table']}-{idx}",
-                    )
-
-                    idx += 1
+    def populate_table(self) -> None:
+        """Shows the changes of the enabled operations, the table only swaps its filtered view."""
+
+        table = self.query_one("#transaction-table", expect_type=ChangeTable)
+        with self.stats.timer("table"):
+            table.set_actions(self.enabled_actions())
 
     def on_tabs_tab_activated(self, event: Tabs.TabActivated) -> None:
         self.CURRENT_TAB = event.tab.id
@@ -142,153 +362,263 @@ class Dashboard(Screen):
     def update_info(self) -> None:
         log = self.query_one("#sql-log", expect_type=Log)
 
-        if not self.LAST_CELL_EVENT or not self.CURRENT_TAB:
+        # The stats don't depend on the selected change, and change while the log is read
+        if self.CURRENT_TAB == "tab-6":
+            log.clear()
+            log.write(self.stats.summary())
             return
 
-        print("================ Tab")
-        print(self.CURRENT_TAB)
+        if self.SELECTED_CHANGE_ID is None or not self.CURRENT_TAB:
+            return
 
         log.clear()
-        if self.CURRENT_TAB == "tab-3":
-            table = self.query_one("#transaction-table", expect_type=DataTable)
-            row_key = self.LAST_CELL_EVENT.cell_key.row_key.value
+        log.write(self.tab_text(self.CURRENT_TAB, self.SELECTED_CHANGE_ID))
+
+    def tab_text(self, tab: str, change_id: int) -> str:
+        """Text of a tab for a change, built once and kept while it is recently used."""
+
+        key = (tab, change_id)
+        text = self._tab_cache.get(key)
+        if text is not None:
+            return text
+
+        started = time.perf_counter()
+        change = self.changes[change_id]
+        action = ACTIONS[change.operation]
+
+        if tab == "tab-1":
+            text = self.gen_operation_details(change, action)
+        elif tab == "tab-2":
+            text = self.gen_row_history(change_id)
+        elif tab == "tab-5":
+            text = self.gen_transaction_info(change)
+        elif tab == "tab-3":
+            text = self.gen_undo_sql(change)
+        elif tab == "tab-4":
+            text = self.gen_redo_sql(change)
+        else:
+            text = ""
+
+        self.stats.add("tab", time.perf_counter() - started, 1)
+        self._tab_cache[key] = text
+        return text
+
+    def gen_operation_details(
+        self, change: Change, action: typing.Literal["INSERT", "UPDATE", "DELETE"]
+    ) -> str:
+        """Field, type, old value and new value of every column of a change."""
 
-            if not row_key:
-                return
+        data = change.data
+        if action == "UPDATE":
+            old_values, new_values = data.get("old", {}), data.get("new", {})
+        elif action == "DELETE":
+            old_values, new_values = data, {}
+        else:
+            old_values, new_values = {}, data
+
+        column_types: dict[str, str] = {}
+        parser = self.parsers.get(change.source)
+        if parser:
+            column_types = {
+                column.COLUMN_NAME: column.DATA_TYPE
+                for column in parser.schema_cache.tables.get((change.schema, change.table), [])
+            }
+
+        def show(values: dict[str, typing.Any], column: str) -> str:
+            if column not in values:
+                return ""
+
+            return "NULL" if values[column] is None else format_value(values[column])
+
+        rows = [("Field", "Type", "Old Value", "New Value")] + [
+            (column, column_types.get(column, ""), show(old_values, column), show(new_values, column))
+            for column in dict.fromkeys([*old_values, *new_values])
+        ]
+        widths = [max(len(row[idx]) for row in rows) for idx in range(4)]
+
+        return "\n".join(
+            "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+            for row in rows
+        )
 
-            operation = row_key.split("-")[0]
-            idx = row_key.split("-")[2]
+    def gen_row_history(self, change_id: int) -> str:
+        """Every change of the row changed by a change, the row after each of them."""
+
+        history = [self.changes[history_id] for history_id in self.history.history(change_id)]
+        selected = self.changes[change_id]
+
+        def image(change: Change) -> dict[str, typing.Any]:
+            if ACTIONS[change.operation] == "UPDATE":
+                return {**change.data.get("old", {}), **change.data.get("new", {})}
+
+            return change.data
+
+        images = [image(change) for change in history]
+        columns = list(dict.fromkeys(column for values in images for column in values))
+
+        rows = [("", "Operation", "Date", "Username", "LSN", *columns)] + [
+            (
+                ">" if change is selected else "",
+                ACTIONS[change.operation],
+                change.begin_time or "",
+                change.username or "",
+                str(change.lsn),
+                *(
+                    ("NULL" if values[column] is None else format_value(values[column]))
+                    if column in values
+                    else ""
+                    for column in columns
+                ),
+            )
+            for change, values in zip(history, images)
+        ]
+        widths = [max(len(row[idx]) for row in rows) for idx in range(len(rows[0]))]
 
-            table_name = table.get_row(row_key)[2]
-            operation_dict = self.parsed_data["LOP_INSERT_ROWS"][table_name][int(idx)]
+        return "\n".join(
+            "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+            for row in rows
+        )
 
-            log.write(
-                self.gen_undo_sql(
-                    operation_dict, operation_dict["table"], operation.upper()
-                )
+    def gen_transaction_info(self, change: Change) -> str:
+        """Summary of the transaction of a change and the list of its changes."""
+
+        changes = self.transaction_changes(change.transaction_id, change.source)
+
+        # The parser knows the status of the transactions it read, the stored ones are summarized from their changes
+        parser = self.parsers.get(change.source)
+        transaction = (
+            parser.transactions.get(change.transaction_id) if parser else None
+        ) or Transaction.from_changes(change.transaction_id, changes)
+
+        summary = [
+            ("Source", change.source or ""),
+            ("Transaction ID", transaction.transaction_id),
+            ("Status", transaction.status or "OPEN"),
+            ("Begin Time", transaction.begin_time or ""),
+            ("End Time", transaction.end_time or ""),
+            ("User", transaction.username or ""),
+            ("LSN", f"{transaction.begin_lsn or ''} - {transaction.end_lsn or ''}"),
+            (
+                "Rows",
+                ", ".join(f"{action} {count:,}" for action, count in transaction.rows.items()),
+            ),
+            (
+                "Tables",
+                ", ".join(f"{table} ({count:,})" for table, count in transaction.tables.items()),
+            ),
+        ]
+        width = max(len(label) for label, _ in summary)
+
+        rows = [("", "Operation", "Object", "LSN")] + [
+            (
+                ">" if other is change else "",
+                ACTIONS.get(other.operation, other.operation),
+                f"{other.schema}.{other.table}",
+                str(other.lsn),
             )
+            for other in changes[:TRANSACTION_CHANGES_SHOWN]
+        ]
+        widths = [max(len(row[idx]) for row in rows) for idx in range(4)]
+
+        lines = [f"{label.ljust(width)}  {value}".rstrip() for label, value in summary]
+        lines.append("")
+        lines.extend(
+            "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+            for row in rows
+        )
+        if len(changes) > TRANSACTION_CHANGES_SHOWN:
+            lines.append(f"... {len(changes) - TRANSACTION_CHANGES_SHOWN:,} más")
 
-        if self.CURRENT_TAB == "tab-4":
-
-            table = self.query_one("#transaction-table", expect_type=DataTable)
-            row_key = self.LAST_CELL_EVENT.cell_key.row_key.value
+        return "\n".join(lines)
 
-            if not row_key:
-                return
+    def gen_undo_sql(self, change: Change) -> str:
+        """SQL that reverts a change."""
 
-            operation = row_key.split("-")[0]
-            idx = row_key.split("-")[2]
+        return "\n".join(self.script_generator(change.source).undo([change]))
 
-            table_name = table.get_row(row_key)[2]
-            operation_dict = self.parsed_data["LOP_INSERT_ROWS"][table_name][int(idx)]
+    def gen_redo_sql(self, change: Change) -> str:
+        """SQL that applies a change again."""
 
-            log.write(
-                self.gen_redo_sql(
-                    operation_dict, operation_dict["table"], operation.upper()
-                )
-            )
+        return "\n".join(self.script_generator(change.source).redo([change]))
 
-    # ===========================
-    # app logic funcs
-    # ===========================
+    def script_generator(self, source: Optional[str] = None) -> ScriptGenerator:
+        """Generator with the keys of the tables of a source."""
 
-    def gen_undo_sql(
-        self,
-        operation: dict[str, typing.Any],
-        table_name: str,
-        action: typing.Literal["INSERT", "UPDATE", "DELETE"],
-    ) -> str:
+        parser = self.parsers.get(source)
+        if parser:
+            return ScriptGenerator.for_schema(parser.schema_cache)
 
-        if action == "INSERT":
+        return ScriptGenerator()
 
-            where_clause = ""
-            for column, value in operation["data"].items():
-                # Determinar si el valor debe estar entre comillas simples
-                if isinstance(value, str) or not isinstance(value, (int, float, bool)):
-                    formatted_value = f"'{value}'"
-                else:
-                    formatted_value = value
+    def action_export_script(self, kind: str, scope: str) -> None:
+        """Writes the undo or redo script of the transaction or the table of the selected change,
+        or of every change from it on."""
 
-                # Agregar condición al WHERE
-                if where_clause:
-                    where_clause += " AND "
-                where_clause += f"{column} = {formatted_value}"
+        if self.SELECTED_CHANGE_ID is None:
+            self.notify("Seleccione un cambio", severity="warning")
+            return
 
-            return (
-                f"DELETE FROM {operation['schema']}.{table_name} WHERE {where_clause};"
+        # The changes are taken here, the loaders keep adding to the index while the worker writes
+        change = self.changes[self.SELECTED_CHANGE_ID]
+        # Scripts don't mix databases, the changes are those of the source of the selected one
+        if scope == "transaction":
+            changes = self.transaction_changes(change.transaction_id, change.source)
+        elif scope == "table":
+            changes = select_changes(
+                self.changes, table=(change.schema, change.table), source=change.source
             )
+        else:
+            changes = select_changes(self.changes, start_lsn=change.lsn, source=change.source)
 
-        elif action == "DELETE":
-            values_str = ", ".join(
-                [f"{column} = {value}" for column, value in operation["data"].items()]
-            )
+        self.export_script(kind, scope, changes, self.script_generator(change.source))
+
+    @work(thread=True, group="script")
+    def export_script(
+        self, kind: str, scope: str, changes: list[Change], generator: ScriptGenerator
+    ) -> None:
+        """Streams a script of the changes to a file in the user data directory."""
 
-            return (
-                f"INSERT INTO {operation["schema"]}.{table_name} VALUES ({values_str});"
+        path = script_path(kind, scope)
+        try:
+            write_script(
+                path, generator.undo(changes) if kind == "undo" else generator.redo(changes)
             )
+        except OSError as e:
+            self.app.call_from_thread(self.notify, f"Error: {e}", severity="error")
+            return
 
-        return ""
+        if get_current_worker().is_cancelled:
+            return
 
-    def gen_redo_sql(
-        self,
-        operation: dict[str, typing.Any],
-        table_name: str,
-        action: typing.Literal["INSERT", "UPDATE", "DELETE"],
-    ) -> str:
-        if action == "INSERT":
-            # Generar el SQL para volver a insertar
-            columns = ", ".join(operation["data"].keys())
-            values = ", ".join(
-                [
-                    (
-                        f"'{value}'"
-                        if isinstance(value, str)
-                        or not isinstance(value, (int, float, bool))
-                        else str(value)
-                    )
-                    for value in operation["data"].values()
-                ]
+        self.app.call_from_thread(
+            self.notify, f"Script de {len(changes):,} cambios guardado en {path}"
+        )
+        if generator.unscripted:
+            self.app.call_from_thread(
+                self.notify,
+                f"Script parcial: {generator.unscripted:,} cambios sin imagen de la fila quedaron "
+                "como comentarios",
+                severity="warning",
             )
-            return f"INSERT INTO {operation['schema']}.{table_name} ({columns}) VALUES ({values});"
 
-        elif action == "DELETE":
-            # Generar el SQL para volver a eliminar
-            where_clause = ""
-            for column, value in operation["data"].items():
-                # Determinar si el valor debe estar entre comillas simples
-                if isinstance(value, str) or not isinstance(value, (int, float, bool)):
-                    formatted_value = f"'{value}'"
-                else:
-                    formatted_value = value
-
-                # Agregar condición al WHERE
-                if where_clause:
-                    where_clause += " AND "
-                where_clause += f"{column} = {formatted_value}"
-
-            return (
-                f"DELETE FROM {operation['schema']}.{table_name} WHERE {where_clause};"
-            )
+    def action_export_stats(self) -> None:
+        """Writes the stats of the parse as JSON to the user data directory."""
 
-        elif action == "UPDATE":
-            # Generar el SQL para rehacer un update
-            set_clause = ", ".join(
-                [
-                    f"{column} = {'NULL' if value is None else (f"'{value}'" if isinstance(value, str) or not isinstance(value, (int, float, bool)) else value)}"
-                    for column, value in operation["data"]["new"].items()
-                ]
-            )
-            where_clause = " AND ".join(
-                [
-                    f"{column} = {'NULL' if value is None else (f"'{value}'" if isinstance(value, str) or not isinstance(value, (int, float, bool)) else value)}"
-                    for column, value in operation["data"]["old"].items()
-                ]
-            )
-            return f"UPDATE {operation['schema']}.{table_name} SET {set_clause} WHERE {where_clause};"
+        if not self.stats.enabled:
+            self.notify(self.stats.summary(), severity="warning")
+            return
+
+        databases = [parser.database for parser in self.parsers.values()]
+        path = stats_path(databases[0] if len(databases) == 1 else None)
+        try:
+            self.stats.save(path)
+        except OSError as e:
+            self.notify(f"Error: {e}", severity="error")
+            return
 
-        return ""
+        self.notify(f"Estadísticas guardadas en {path}")
 
-    def on_data_table_cell_selected(self, event: DataTable.CellSelected):
+    def on_change_table_change_selected(self, event: ChangeTable.ChangeSelected):
 
-        self.LAST_CELL_EVENT = event
+        self.SELECTED_CHANGE_ID = event.change_id
         self.update_info()
@@ -0,0 +1,295 @@
+import typing
+from datetime import date, datetime, time
+from decimal import Decimal
+from itertools import groupby, islice
+from pathlib import Path
+from typing import Iterator, Optional
+
+from platformdirs import user_data_dir
+
+from .change import Change
+from .change_index import ChangeIndex
+from .log_filter import ACTIONS
+from .lsn import LSN
+from .schema_cache import SchemaCache, TableKey
+
+# SQL Server accepts up to 1000 rows in a VALUES list, the IN lists are kept the same size
+BATCH_SIZE = 1000
+
+# Statement each action is reverted with
+UNDO_STATEMENTS = {"INSERT": "DELETE", "DELETE": "INSERT", "UPDATE": "UPDATE"}
+
+
+class ScriptGenerator:
+    """Builds set-based scripts that undo or redo many changes.
+
+    Consecutive changes of the same table that need the same statement are batched: rows to insert
+    go in multi-row INSERT ... VALUES, rows to delete in a DELETE by primary key. Computed and
+    rowversion columns are never written, SQL Server fills them in. Statements are yielded one by
+    one, so a script of any size can be streamed to a file.
+    """
+
+    def __init__(
+        self,
+        primary_keys: Optional[dict[TableKey, list[str]]] = None,
+        identity_columns: Optional[dict[TableKey, str]] = None,
+        generated_columns: Optional[dict[TableKey, list[str]]] = None,
+        batch_size: int = BATCH_SIZE,
+    ) -> None:
+        """Creates a generator. Rows of tables without a primary key are matched by every column."""
+
+        self.primary_keys = primary_keys or {}
+        self.identity_columns = identity_columns or {}
+
+        # Changes left out of the scripts because their row image is unknown, see `_updates`
+        self.unscripted = 0
+        self.generated_columns = {
+            key: set(columns) for key, columns in (generated_columns or {}).items()
+        }
+        self.batch_size = batch_size
+
+    @classmethod
+    def for_schema(cls, schema_cache: SchemaCache) -> "ScriptGenerator":
+        """Returns a generator that uses the keys of the tables in a schema cache."""
+
+        return cls(
+            schema_cache.primary_keys,
+            schema_cache.identity_columns,
+            schema_cache.generated_columns,
+        )
+
+    def undo(self, changes: typing.Sequence[Change]) -> Iterator[str]:
+        """Statements that revert `changes`, given in LSN order, from the newest to the oldest."""
+
+        return self.undo_newest_first(reversed(changes))
+
+    def undo_newest_first(self, changes: typing.Iterable[Change]) -> Iterator[str]:
+        """Statements that revert `changes`, given from the newest to the oldest."""
+
+        return self._statements(changes, undo=True)
+
+    def redo(self, changes: typing.Iterable[Change]) -> Iterator[str]:
+        """Statements that apply `changes` again, given in LSN order."""
+
+        return self._statements(changes, undo=False)
+
+    def _statements(self, changes: typing.Iterable[Change], undo: bool) -> Iterator[str]:
+        def statement(change: Change) -> tuple[str, str, str, tuple[str, ...]]:
+            action = ACTIONS[change.operation]
+            return (
+                UNDO_STATEMENTS[action] if undo else action,
+                change.schema,
+                change.table,
+                change.columns,
+            )
+
+        scripted = (change for change in changes if change.operation in ACTIONS)
+        for (kind, schema, table, _), run in groupby(scripted, key=statement):
+            key = (schema, table)
+            if kind == "INSERT":
+                yield from self._inserts(key, run)
+            elif kind == "DELETE":
+                yield from self._deletes(key, run)
+            else:
+                yield from self._updates(key, run, undo)
+
+    def _inserts(self, key: TableKey, changes: typing.Iterable[Change]) -> Iterator[str]:
+        changes = iter(changes)
+        first = next(changes)
+        columns = first.columns
+        table = _table_name(key)
+
+        identity = self.identity_columns.get(key)
+        identity_insert = identity is not None and identity in columns
+        if identity_insert:
+            yield f"SET IDENTITY_INSERT {table} ON;"
+
+        generated = self.generated_columns.get(key, set())
+        positions = [position for position, column in enumerate(columns) if column not in generated]
+
+        column_list = ", ".join(_quote(columns[position]) for position in positions)
+        for batch in _batches([first], changes, self.batch_size):
+            rows = ",\n    ".join(
+                f"({', '.join(sql_literal(change.values[position]) for position in positions)})"
+                for change in batch
+            )
+            yield f"INSERT INTO {table} ({column_list}) VALUES\n    {rows};"
+
+        if identity_insert:
+            yield f"SET IDENTITY_INSERT {table} OFF;"
+
+    def _deletes(self, key: TableKey, changes: typing.Iterable[Change]) -> Iterator[str]:
+        changes = iter(changes)
+        first = next(changes)
+        table = _table_name(key)
+
+        primary_key = self.primary_keys.get(key)
+        if not primary_key or not set(primary_key) <= set(first.columns):
+            # Without a key, every row is deleted on its own, and only once if there are duplicates
+            yield f"DELETE TOP (1) FROM {table} WHERE {_match(first.data)};"
+            for change in changes:
+                yield f"DELETE TOP (1) FROM {table} WHERE {_match(change.data)};"
+            return
+
+        positions = [first.columns.index(column) for column in primary_key]
+        for batch in _batches([first], changes, self.batch_size):
+            keys = [tuple(change.values[position] for position in positions) for change in batch]
+
+            if len(primary_key) == 1:
+                values = ", ".join(sql_literal(key_values[0]) for key_values in keys)
+                yield f"DELETE FROM {table} WHERE {_quote(primary_key[0])} IN ({values});"
+                continue
+
+            rows = ",\n    ".join(
+                f"({', '.join(sql_literal(value) for value in key_values)})" for key_values in keys
+            )
+            key_columns = ", ".join(_quote(column) for column in primary_key)
+            join = " AND ".join(
+                f"target.{_quote(column)} = k.{_quote(column)}" for column in primary_key
+            )
+            yield (
+                f"DELETE target FROM {table} AS target\n"
+                f"JOIN (VALUES\n    {rows}\n) AS k ({key_columns}) ON {join};"
+            )
+
+    def _updates(
+        self, key: TableKey, changes: typing.Iterable[Change], undo: bool
+    ) -> Iterator[str]:
+        table = _table_name(key)
+        primary_key = self.primary_keys.get(key) or []
+        generated = self.generated_columns.get(key, set())
+        identity = self.identity_columns.get(key)
+
+        for change in changes:
+            data = change.data
+            old_values, new_values = data.get("old", {}), data.get("new", {})
+
+            # The row is found by its image after the change being applied or reverted
+            values, current = (old_values, new_values) if undo else (new_values, old_values)
+            if not values or not current:
+                # E.g. a LOP_MODIFY_COLUMNS, or a LOP_MODIFY_ROW of a row never seen whole, the script
+                # says it is partial instead of skipping the row silently
+                self.unscripted += 1
+                yield (
+                    f"-- No se puede {'deshacer' if undo else 'rehacer'} el cambio de {table} "
+                    f"en el LSN {change.lsn}: falta la imagen de la fila"
+                )
+                continue
+
+            where = {column: current[column] for column in primary_key if column in current}
+            if not where or len(where) < len(primary_key):
+                where = current
+
+            # Only the columns the change wrote, the key is kept in the images to find the row. An
+            # identity column can't be updated, and SQL Server updates the generated ones on its own
+            written = {
+                column: value
+                for column, value in values.items()
+                if column not in generated
+                and column != identity
+                and (column not in current or current[column] != value)
+            }
+            if not written:
+                continue
+
+            assignments = ", ".join(
+                f"{_quote(column)} = {sql_literal(value)}" for column, value in written.items()
+            )
+            yield f"UPDATE {table} SET {assignments} WHERE {_match(where)};"
+
+
+def select_changes(
+    changes: ChangeIndex,
+    *,
+    transaction_id: Optional[str] = None,
+    table: Optional[TableKey] = None,
+    start_lsn: Optional[LSN] = None,
+    end_lsn: Optional[LSN] = None,
+    source: Optional[str] = None,
+) -> list[Change]:
+    """Changes of a transaction, a table and/or the LSN range [start_lsn, end_lsn), in LSN order.
+
+    With a `source` only the changes read from it, the LSNs of different sources are unrelated.
+    """
+
+    return [
+        change
+        for change in changes.range(start_lsn, end_lsn)
+        if change.operation in ACTIONS
+        and (source is None or change.source == source)
+        and (transaction_id is None or change.transaction_id == transaction_id)
+        and (table is None or (change.schema, change.table) == table)
+    ]
+
+
+def write_script(path: Path, statements: typing.Iterable[str]) -> int:
+    """Writes the statements to `path` inside a single transaction, returns how many were written."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        return stream_script(f, statements)
+
+
+def stream_script(f: typing.TextIO, statements: typing.Iterable[str]) -> int:
+    """Writes the statements to an open file inside a single transaction, returns how many were written."""
+
+    count = 0
+
+    # Any error rolls the whole script back
+    f.write("SET XACT_ABORT ON;\nBEGIN TRANSACTION;\n\n")
+    for statement in statements:
+        f.write(statement)
+        f.write("\n")
+        count += 1
+    f.write("\nCOMMIT TRANSACTION;\n")
+
+    return count
+
+
+def script_path(kind: str, name: str) -> Path:
+    """Path of a new script in the user data directory, e.g. undo-transaction-20250101-120000.sql."""
+
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return Path(user_data_dir("mssql-watcher")) / "scripts" / f"{kind}-{name}-{timestamp}.sql"
+
+
+def sql_literal(value: typing.Any) -> str:
+    """Formats a decoded value as a T-SQL literal."""
+
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"0x{bytes(value).hex().upper()}"
+    if isinstance(value, (datetime, date, time)):
+        return f"'{value.isoformat()}'"
+
+    return "N'" + str(value).replace("'", "''") + "'"
+
+
+def _quote(name: str) -> str:
+    return "[" + name.replace("]", "]]") + "]"
+
+
+def _table_name(key: TableKey) -> str:
+    return f"{_quote(key[0])}.{_quote(key[1])}"
+
+
+def _match(values: dict[str, typing.Any]) -> str:
+    return " AND ".join(
+        f"{_quote(column)} IS NULL" if value is None else f"{_quote(column)} = {sql_literal(value)}"
+        for column, value in values.items()
+    )
+
+
+def _batches(
+    head: list[Change], rest: typing.Iterable[Change], size: int
+) -> Iterator[list[Change]]:
+    batch = head + list(islice(rest, size - len(head)))
+    while batch:
+        yield batch
+        batch = list(islice(rest, size))
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+import typing
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from platformdirs import user_data_dir
+
+# Stages of a parse in pipeline order, the ones not listed are shown after them
+STAGES = ("schema", "query", "fetch", "assemble", "decode", "table", "render", "tab")
+
+
+@dataclass(slots=True)
+class StageStats:
+    """Time spent in a stage, and the items (records, rows, lines) and bytes it went through."""
+
+    calls: int = 0
+    seconds: float = 0.0
+    items: int = 0
+    bytes: int = 0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+
+class PipelineStats:
+    """Timers and counters of every stage of a parse, from the log query to the rendering of the table.
+
+    The stages are timed per batch, not per record. `DISABLED`, the default of the parser and the
+    widgets, ignores everything, so the instrumentation costs nothing unless it is turned on. The
+    parsers of several databases can add to the same stats from their threads.
+    """
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: dict[str, StageStats] = {}
+
+        # Values that failed to decode by data type, "row" for images that failed as a whole
+        self.decode_errors: Counter[str] = Counter()
+
+        # Other events, e.g. records of unknown allocation units
+        self.counters: Counter[str] = Counter()
+
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, items: int = 0, size: int = 0) -> None:
+        """Adds a timed call of a stage."""
+
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.items += items
+            stats.bytes += size
+
+    @contextmanager
+    def timer(self, stage: str, items: int = 0) -> Iterator[None]:
+        """Times the block as a call of `stage`."""
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started, items)
+
+    def decode_error(self, data_type: str) -> None:
+        with self._lock:
+            self.decode_errors[data_type] += 1
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def merge_errors(self, errors: dict[str, int]) -> None:
+        """Adds the decode errors counted elsewhere, e.g. in a worker process."""
+
+        with self._lock:
+            self.decode_errors.update(errors)
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return {
+            "elapsed_seconds": time.perf_counter() - self.started,
+            "stages": {
+                stage: {
+                    "calls": stats.calls,
+                    "seconds": stats.seconds,
+                    "items": stats.items,
+                    "bytes": stats.bytes,
+                    "items_per_second": stats.items_per_second,
+                }
+                for stage, stats in self._ordered_stages()
+            },
+            **self._counts(),
+        }
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self) -> str:
+        """Table of the stages and the errors, as shown in the Dashboard."""
+
+        if not self.enabled:
+            return "Estadísticas desactivadas, inicie con WATCHER_STATS=1"
+
+        rows = [("Stage", "Calls", "Seconds", "Items", "Items/s", "MiB")] + [
+            (
+                stage,
+                f"{stats.calls:,}",
+                f"{stats.seconds:,.3f}",
+                f"{stats.items:,}",
+                f"{stats.items_per_second:,.0f}",
+                f"{stats.bytes / 2**20:,.1f}",
+            )
+            for stage, stats in self._ordered_stages()
+        ]
+        widths = [max(len(row[idx]) for row in rows) for idx in range(len(rows[0]))]
+
+        lines = [
+            "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+            for row in rows
+        ]
+        lines.append("")
+        counts = self._counts()
+        errors = ", ".join(
+            f"{data_type} {count:,}"
+            for data_type, count in Counter(counts["decode_errors"]).most_common()
+        )
+        lines.append(f"Decode errors: {errors or 'none'}")
+        for name, count in sorted(counts["counters"].items()):
+            lines.append(f"{name}: {count:,}")
+
+        return "\n".join(lines)
+
+    def _ordered_stages(self) -> list[tuple[str, StageStats]]:
+        order = {stage: idx for idx, stage in enumerate(STAGES)}
+        with self._lock:
+            stages = list(self.stages.items())
+
+        return sorted(stages, key=lambda item: order.get(item[0], len(order)))
+
+    def _counts(self) -> dict[str, dict[str, int]]:
+        """Copies of the decode errors and the counters, which other threads may be adding to."""
+
+        with self._lock:
+            return {"decode_errors": dict(self.decode_errors), "counters": dict(self.counters)}
+
+
+class _DisabledStats(PipelineStats):
+    """Stats that ignore every call."""
+
+    enabled = False
+
+    def add(self, stage: str, seconds: float, items: int = 0, size: int = 0) -> None:
+        pass
+
+    def timer(self, stage: str, items: int = 0) -> typing.ContextManager[None]:
+        return nullcontext()
+
+    def decode_error(self, data_type: str) -> None:
+        pass
+
+    def count(self, name: str, amount: int = 1) -> None:
+        pass
+
+    def merge_errors(self, errors: dict[str, int]) -> None:
+        pass
+
+
+DISABLED: PipelineStats = _DisabledStats()
+
+
+def stats_path(name: Optional[str] = None) -> Path:
+    """Path of a new stats export in the user data directory, e.g. stats-20250101-120000.json."""
+
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    prefix = f"stats-{name}" if name else "stats"
+    return Path(user_data_dir("mssql-watcher")) / "stats" / f"{prefix}-{timestamp}.json"
@@ -0,0 +1,198 @@
+import json
+import re
+import sqlite3
+import threading
+import typing
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterator, Optional
+
+from platformdirs import user_data_dir
+
+from .change import Change, intern
+from .lsn import LSN, parse_lsn
+
+# (operation, schema.table, change)
+StoredChange = tuple[str, str, Change]
+
+
+class ChangeStore:
+    """Append-only SQLite store of decoded changes keyed by LSN, with the last processed LSN checkpointed per filter."""
+
+    def __init__(self, path: Path) -> None:
+        """Opens (or creates) the store at `path`."""
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+
+        # Written from the poll workers and read from the UI thread, every access goes through the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+
+            CREATE TABLE IF NOT EXISTS changes (
+                lsn TEXT PRIMARY KEY,
+                operation TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                schema_name TEXT NOT NULL,
+                object_name TEXT NOT NULL,
+                transaction_id TEXT,
+                begin_time TEXT,
+                end_time TEXT,
+                username TEXT,
+                data TEXT NOT NULL
+            ) WITHOUT ROWID;
+
+            CREATE INDEX IF NOT EXISTS changes_table ON changes (table_name);
+            CREATE INDEX IF NOT EXISTS changes_transaction ON changes (transaction_id);
+            CREATE INDEX IF NOT EXISTS changes_begin_time ON changes (begin_time);
+
+            -- Every filter has its own checkpoint, a filtered scan never reads the records it leaves out
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                filter TEXT PRIMARY KEY,
+                lsn TEXT NOT NULL
+            ) WITHOUT ROWID;
+            """
+        )
+
+    @classmethod
+    def for_database(cls, server: str, database: str) -> "ChangeStore":
+        """Returns the store of a database in the user data directory."""
+
+        name = re.sub(r"[^\w.-]", "_", f"{server}_{database}")
+        return cls(Path(user_data_dir("mssql-watcher")) / "changes" / f"{name}.sqlite")
+
+    def checkpoint(self, key: str = "") -> Optional[LSN]:
+        """LSN up to which the log has been processed with the filter of `key`, see `LogFilter.key`."""
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lsn FROM checkpoints WHERE filter = ?", (key,)
+            ).fetchone()
+
+        return parse_lsn(row[0]) if row else None
+
+    def append(
+        self, changes: list[StoredChange], checkpoint: Optional[LSN], key: str = ""
+    ) -> None:
+        """Writes a batch of changes and moves the checkpoint of `key` in the same transaction."""
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """INSERT OR IGNORE INTO changes
+                (lsn, operation, table_name, schema_name, object_name, transaction_id, begin_time, end_time, username, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (
+                        str(change.lsn),
+                        operation,
+                        table_name,
+                        change.schema,
+                        change.table,
+                        change.transaction_id,
+                        change.begin_time,
+                        change.end_time,
+                        change.username,
+                        json.dumps(change.data, default=_to_json),
+                    )
+                    for operation, table_name, change in changes
+                ],
+            )
+
+            if checkpoint:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (filter, lsn) VALUES (?, ?)",
+                    (key, str(checkpoint)),
+                )
+
+    def lsns_after(self, lsn: Optional[LSN]) -> set[LSN]:
+        """LSNs of the stored changes after `lsn`, used to skip records that are read again."""
+
+        # LSNs are stored in their fixed width hex form, which sorts like the packed number
+        after = str(lsn) if lsn is not None else None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT lsn FROM changes WHERE ? IS NULL OR lsn > ?", (after, after)
+            ).fetchall()
+
+        return set(LSN.parse_many(row[0] for row in rows))
+
+    def iter_changes(
+        self, batch_size: int = 5000, source: Optional[str] = None
+    ) -> Iterator[StoredChange]:
+        """Yields every stored change in LSN order, read from `source`."""
+
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT lsn, operation, table_name, schema_name, object_name, transaction_id, begin_time, end_time,
+                username, data FROM changes ORDER BY lsn"""
+            )
+
+        # Changes of a table share a single tuple of column names
+        columns: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+        while True:
+            # The lock is not held while the caller consumes a batch
+            with self._lock:
+                batch = rows.fetchmany(batch_size)
+
+            if not batch:
+                return
+
+            for (
+                lsn,
+                operation,
+                table_name,
+                schema_name,
+                object_name,
+                transaction_id,
+                begin_time,
+                end_time,
+                username,
+                data,
+            ) in batch:
+                values = json.loads(data, object_hook=_from_json)
+                names = tuple(values)
+
+                yield intern(operation), intern(table_name), Change(
+                    operation=intern(operation),
+                    schema=intern(schema_name),
+                    table=intern(object_name),
+                    transaction_id=intern(transaction_id),
+                    begin_time=begin_time,
+                    end_time=end_time,
+                    username=intern(username),
+                    lsn=LSN.parse(lsn),
+                    columns=columns.setdefault(names, names),
+                    values=tuple(values.values()),
+                    source=source,
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _to_json(value: typing.Any) -> typing.Any:
+    """Binary and decimal values are tagged, so the scripts of the changes read back quote them right."""
+
+    if isinstance(value, bytes):
+        return {"$binary": value.hex()}
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+
+    return str(value)
+
+
+def _from_json(value: dict[str, typing.Any]) -> typing.Any:
+    if len(value) == 1:
+        if "$binary" in value:
+            return bytes.fromhex(value["$binary"])
+        if "$decimal" in value:
+            return Decimal(value["$decimal"])
+
+    return value
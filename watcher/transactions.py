@@ -0,0 +1,219 @@
+import pickle
+import tempfile
+import typing
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import IO, Iterator, Optional
+
+from .change import Change
+from .log_filter import ACTIONS
+from .log_record import LogRecord
+from .lsn import LSN
+
+# Records of an open transaction kept in memory, the rest are spilled to a temporary file
+SPILL_THRESHOLD = 10_000
+
+# Finished transactions whose summary is kept, the oldest are dropped first
+MAX_COMPLETED = 100_000
+
+
+@dataclass(slots=True)
+class Transaction:
+    """Summary of a transaction of the log."""
+
+    transaction_id: str
+    begin_time: Optional[str] = None
+    end_time: Optional[str] = None
+
+    # COMMIT or ABORT, None while the transaction is open
+    status: Optional[str] = None
+
+    begin_lsn: Optional[LSN] = None
+    end_lsn: Optional[LSN] = None
+    username: Optional[str] = None
+
+    # Changed rows by action (INSERT, UPDATE, DELETE) and by schema.table
+    rows: dict[str, int] = field(default_factory=dict)
+    tables: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def row_count(self) -> int:
+        return sum(self.rows.values())
+
+    @classmethod
+    def from_changes(
+        cls, transaction_id: str, changes: typing.Iterable[Change]
+    ) -> "Transaction":
+        """Summary built from the decoded changes of a transaction, e.g. the ones read from the store."""
+
+        transaction = cls(transaction_id)
+        for change in changes:
+            if transaction.begin_lsn is None:
+                transaction.begin_time = change.begin_time
+                transaction.username = change.username
+                transaction.begin_lsn = change.lsn
+
+            transaction.end_lsn = change.lsn
+            transaction.end_time = change.end_time
+            transaction.add_row(ACTIONS.get(change.operation), f"{change.schema}.{change.table}")
+
+        # Only the changes of finished transactions have an end time
+        if transaction.end_time:
+            transaction.status = "COMMIT"
+
+        return transaction
+
+    def add_row(self, action: Optional[str], table: str) -> None:
+        """Counts a changed row of an action and a table, other operations are not counted."""
+
+        if action is None:
+            return
+
+        self.rows[action] = self.rows.get(action, 0) + 1
+        self.tables[table] = self.tables.get(table, 0) + 1
+
+
+class _OpenTransaction:
+    __slots__ = ("transaction", "records", "spill")
+
+    def __init__(self, transaction: Transaction) -> None:
+        self.transaction = transaction
+        self.records: list[LogRecord] = []
+        self.spill: Optional[IO[bytes]] = None
+
+
+class TransactionAssembler:
+    """Groups the records of the log by transaction, and releases them when the transaction ends.
+
+    Only the transactions in flight are held. The records of a long transaction are spilled to a
+    temporary file every `spill_threshold` records, so the memory used is bounded by the number of
+    open transactions. The summaries of the last `max_completed` finished transactions are kept.
+    """
+
+    def __init__(
+        self, spill_threshold: int = SPILL_THRESHOLD, max_completed: int = MAX_COMPLETED
+    ) -> None:
+        self.spill_threshold = spill_threshold
+        self.max_completed = max_completed
+
+        self._open: dict[str, _OpenTransaction] = {}
+        self.completed: OrderedDict[str, Transaction] = OrderedDict()
+
+        # LSN read right before every open transaction started, the checkpoint can't move past them
+        self.open_since: dict[str, Optional[LSN]] = {}
+
+    def __len__(self) -> int:
+        """Transactions in flight."""
+
+        return len(self._open)
+
+    def get(self, transaction_id: str) -> Optional[Transaction]:
+        """Summary of a finished or open transaction."""
+
+        transaction = self.completed.get(transaction_id)
+        if transaction is None and transaction_id in self._open:
+            transaction = self._open[transaction_id].transaction
+
+        return transaction
+
+    def begin_time(self, transaction_id: str) -> Optional[str]:
+        opened = self._open.get(transaction_id)
+        return opened.transaction.begin_time if opened else None
+
+    def begin(
+        self,
+        transaction_id: str,
+        begin_time: Optional[str],
+        lsn: LSN,
+        previous_lsn: Optional[LSN],
+    ) -> None:
+        """Opens a transaction at its LOP_BEGIN_XACT record."""
+
+        self.open_since.setdefault(transaction_id, previous_lsn)
+        opened = self._opened(transaction_id)
+        opened.transaction.begin_time = begin_time
+        opened.transaction.begin_lsn = lsn
+
+    def add(self, record: LogRecord, table: str, previous_lsn: Optional[LSN]) -> None:
+        """Holds a record until its transaction ends. `table` is the schema.table it changes."""
+
+        transaction_id = record.transaction_id
+        self.open_since.setdefault(transaction_id, previous_lsn)
+
+        opened = self._opened(transaction_id)
+        transaction = opened.transaction
+        if transaction.begin_lsn is None:
+            # Started before the first record read
+            transaction.begin_lsn = record.current_lsn
+        if transaction.username is None:
+            transaction.username = record.username
+        transaction.add_row(ACTIONS.get(record.operation), table)
+
+        opened.records.append(record)
+        if len(opened.records) >= self.spill_threshold:
+            if opened.spill is None:
+                opened.spill = tempfile.TemporaryFile()
+            pickle.dump(opened.records, opened.spill, protocol=pickle.HIGHEST_PROTOCOL)
+            opened.records = []
+
+    def end(
+        self, transaction_id: str, end_time: Optional[str], status: str, lsn: LSN
+    ) -> Iterator[LogRecord]:
+        """Closes a transaction at its commit or abort, yields its records with the end time set."""
+
+        self.open_since.pop(transaction_id, None)
+        opened = self._open.pop(transaction_id, None)
+        if opened is None:
+            return iter(())
+
+        transaction = opened.transaction
+        transaction.end_time = end_time
+        transaction.status = status
+        transaction.end_lsn = lsn
+
+        # Transactions that changed no rows, e.g. the ones of the engine itself, are not kept
+        if transaction.row_count:
+            self.completed[transaction_id] = transaction
+            self.completed.move_to_end(transaction_id)
+            while len(self.completed) > self.max_completed:
+                self.completed.popitem(last=False)
+
+        return self._released(opened, end_time)
+
+    def flush(self) -> list[LogRecord]:
+        """Releases the records of every open transaction in LSN order, they are no longer held."""
+
+        unfinished = [record for opened in self._open.values() for record in self._records(opened)]
+        unfinished.sort(key=lambda record: record.current_lsn)
+
+        self._open.clear()
+        self.open_since.clear()
+
+        return unfinished
+
+    def _opened(self, transaction_id: str) -> _OpenTransaction:
+        opened = self._open.get(transaction_id)
+        if opened is None:
+            opened = self._open[transaction_id] = _OpenTransaction(Transaction(transaction_id))
+
+        return opened
+
+    def _released(self, opened: _OpenTransaction, end_time: Optional[str]) -> Iterator[LogRecord]:
+        for record in self._records(opened):
+            # The commit record comes after the changes, so the end time is attached now
+            record.end_operation = end_time
+            yield record
+
+    def _records(self, opened: _OpenTransaction) -> Iterator[LogRecord]:
+        if opened.spill is not None:
+            with opened.spill:
+                opened.spill.seek(0)
+                while True:
+                    try:
+                        yield from pickle.load(opened.spill)
+                    except EOFError:
+                        break
+
+            opened.spill = None
+
+        yield from opened.records
@@ -0,0 +1,3 @@
+from .change_table import ChangeTable
+
+__all__ = ["ChangeTable"]
@@ -0,0 +1,278 @@
+import time
+import typing
+from typing import Optional
+
+from rich.cells import set_cell_size
+from rich.segment import Segment
+from textual import events
+from textual.binding import Binding
+from textual.cache import LRUCache
+from textual.geometry import Size
+from textual.message import Message
+from textual.reactive import reactive
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+from ..change import Change
+from ..change_index import ChangeIndex
+from ..log_filter import ACTIONS, OPERATIONS
+from ..stats import DISABLED, PipelineStats
+
+# (title, width, field of the change)
+COLUMNS: tuple[tuple[str, int, str], ...] = (
+    ("Source", 16, "source"),
+    ("Operation", 10, "operation"),
+    ("Schema", 12, "schema"),
+    ("Object", 24, "table"),
+    ("User", 16, "username"),
+    ("Begin Time", 25, "begin_time"),
+    ("End Time", 25, "end_time"),
+    ("Transaction ID", 16, "transaction_id"),
+    ("LSN", 23, "lsn"),
+)
+
+
+class ChangeTable(ScrollView, can_focus=True):
+    """Table of changes that only renders the rows in view.
+
+    The rows are the ids of the changes in a `ChangeIndex`. The rows shown are a list of ids kept per
+    combination of enabled actions, so filtering by action swaps the list instead of rebuilding the
+    table, and new changes are appended to the lists already built.
+    """
+
+    COMPONENT_CLASSES = {
+        "change-table--header",
+        "change-table--cursor",
+        "change-table--even-row",
+    }
+
+    DEFAULT_CSS = """
+    ChangeTable {
+        height: 1fr;
+    }
+    ChangeTable > .change-table--header {
+        text-style: bold;
+        background: $panel;
+    }
+    ChangeTable > .change-table--cursor {
+        background: $accent;
+        color: $text;
+    }
+    ChangeTable > .change-table--even-row {
+        background: $primary 10%;
+    }
+    """
+
+    BINDINGS = [
+        Binding("up", "cursor_up", "Up", show=False),
+        Binding("down", "cursor_down", "Down", show=False),
+        Binding("pageup", "page_up", "Page Up", show=False),
+        Binding("pagedown", "page_down", "Page Down", show=False),
+        Binding("home", "cursor_home", "First", show=False),
+        Binding("end", "cursor_end", "Last", show=False),
+        Binding("enter", "select", "Select", show=False),
+    ]
+
+    cursor_row: reactive[int] = reactive(0, always_update=True)
+
+    class ChangeSelected(Message):
+        """Posted when a row is clicked or selected with enter."""
+
+        def __init__(self, change_id: int, change: Change) -> None:
+            super().__init__()
+            self.change_id = change_id
+            self.change = change
+
+    def __init__(
+        self,
+        changes: ChangeIndex,
+        *,
+        stats: PipelineStats = DISABLED,
+        name: Optional[str] = None,
+        id: Optional[str] = None,
+    ) -> None:
+        super().__init__(name=name, id=id)
+
+        self.changes = changes
+
+        # The lines rendered are timed as the "render" stage
+        self.stats = stats
+
+        # Ids of the changes of every action, in the order they were added
+        self._ids_by_action: dict[str, list[int]] = {action: [] for action in OPERATIONS}
+
+        # Ids shown for every combination of actions that has been enabled
+        self._views: dict[frozenset[str], list[int]] = {}
+
+        self.actions = frozenset(OPERATIONS)
+        self._view = self._build_view(self.actions)
+
+        # Rendered text of the rows that were recently in view
+        self._row_cache: LRUCache[int, str] = LRUCache(1024)
+
+        self._header = "".join(
+            set_cell_size(title, width) for title, width, _ in COLUMNS
+        )
+        self._line_width = len(self._header)
+
+    @property
+    def row_count(self) -> int:
+        """Rows shown with the current filter."""
+
+        return len(self._view)
+
+    @property
+    def cursor_change_id(self) -> Optional[int]:
+        """Id of the change under the cursor."""
+
+        if not self._view:
+            return None
+
+        return self._view[min(self.cursor_row, len(self._view) - 1)]
+
+    def add_rows(self, change_ids: typing.Iterable[int]) -> None:
+        """Appends the rows of changes already in the index, they are added to every filtered view built."""
+
+        added: list[tuple[int, str]] = []
+        for change_id in change_ids:
+            # Changes of other operations are never shown
+            action = ACTIONS.get(self.changes[change_id].operation)
+            if action is not None:
+                self._ids_by_action[action].append(change_id)
+                added.append((change_id, action))
+
+        if not added:
+            return
+
+        for actions, view in self._views.items():
+            view.extend(change_id for change_id, action in added if action in actions)
+
+        self._update_virtual_size()
+        self.refresh()
+
+    def set_actions(self, actions: typing.Iterable[str]) -> None:
+        """Only shows the changes of the given actions."""
+
+        self.actions = frozenset(actions)
+        self._view = self._build_view(self.actions)
+
+        self.cursor_row = min(self.cursor_row, max(len(self._view) - 1, 0))
+        self._update_virtual_size()
+        self.refresh()
+
+    def _build_view(self, actions: frozenset[str]) -> list[int]:
+        """Returns the ids shown for a combination of actions, merging the lists of every action once."""
+
+        view = self._views.get(actions)
+        if view is None:
+            # Each list is already sorted, so sorting them together is a linear merge of the runs
+            view = sorted(
+                change_id for action in actions for change_id in self._ids_by_action[action]
+            )
+            self._views[actions] = view
+
+        return view
+
+    def _update_virtual_size(self) -> None:
+        # The header takes the first line
+        self.virtual_size = Size(self._line_width, len(self._view) + 1)
+
+    def _row_text(self, change_id: int) -> str:
+        text = self._row_cache.get(change_id)
+        if text is None:
+            change = self.changes[change_id]
+            text = "".join(
+                set_cell_size(
+                    ACTIONS.get(change.operation, "")
+                    if field == "operation"
+                    else _format(getattr(change, field)),
+                    width,
+                )
+                for _, width, field in COLUMNS
+            )
+            self._row_cache[change_id] = text
+
+        return text
+
+    def render_line(self, y: int) -> Strip:
+        if not self.stats.enabled:
+            return self._render_line(y)
+
+        started = time.perf_counter()
+        line = self._render_line(y)
+        self.stats.add("render", time.perf_counter() - started, 1)
+        return line
+
+    def _render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        width = self.size.width
+        base_style = self.rich_style
+
+        if y == 0:
+            style = base_style + self.get_component_rich_style("change-table--header")
+            line = Strip([Segment(self._header, style)], self._line_width)
+            return line.crop_extend(scroll_x, scroll_x + width, style)
+
+        row = scroll_y + y - 1
+        if row >= len(self._view):
+            return Strip.blank(width, base_style)
+
+        if row == self.cursor_row:
+            style = base_style + self.get_component_rich_style("change-table--cursor")
+        elif row % 2:
+            style = base_style + self.get_component_rich_style("change-table--even-row")
+        else:
+            style = base_style
+
+        line = Strip([Segment(self._row_text(self._view[row]), style)], self._line_width)
+        return line.crop_extend(scroll_x, scroll_x + width, style)
+
+    def watch_cursor_row(self, cursor_row: int) -> None:
+        # Keep the cursor between the header and the bottom of the view
+        visible_rows = max(self.size.height - 1, 1)
+        scroll_y = self.scroll_offset.y
+        if cursor_row < scroll_y:
+            self.scroll_to(y=cursor_row, animate=False)
+        elif cursor_row >= scroll_y + visible_rows:
+            self.scroll_to(y=cursor_row - visible_rows + 1, animate=False)
+
+        self.refresh()
+
+    def _move_cursor(self, row: int) -> None:
+        self.cursor_row = max(0, min(row, len(self._view) - 1))
+
+    def action_cursor_up(self) -> None:
+        self._move_cursor(self.cursor_row - 1)
+
+    def action_cursor_down(self) -> None:
+        self._move_cursor(self.cursor_row + 1)
+
+    def action_page_up(self) -> None:
+        self._move_cursor(self.cursor_row - max(self.size.height - 1, 1))
+
+    def action_page_down(self) -> None:
+        self._move_cursor(self.cursor_row + max(self.size.height - 1, 1))
+
+    def action_cursor_home(self) -> None:
+        self._move_cursor(0)
+
+    def action_cursor_end(self) -> None:
+        self._move_cursor(len(self._view) - 1)
+
+    def action_select(self) -> None:
+        change_id = self.cursor_change_id
+        if change_id is not None:
+            self.post_message(self.ChangeSelected(change_id, self.changes[change_id]))
+
+    def on_click(self, event: events.Click) -> None:
+        if event.y == 0:
+            return
+
+        row = self.scroll_offset.y + event.y - 1
+        if row < len(self._view):
+            self.cursor_row = row
+            self.action_select()
+
+
+def _format(value: typing.Any) -> str:
+    return "" if value is None else str(value)